@@ -0,0 +1,57 @@
+import os,sys
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.dirname(CURRENT_DIR))
+
+import argparse
+import contextlib
+import statistics
+import time
+
+import pykka
+
+from controller import Controller
+from worker import WorkerActor
+from workload import chain_workflow
+
+
+# End-to-end latency of chains of increasing depth, from the execution start broadcast until the
+# controller has heard that the sink finished. Each operator gets its own worker.
+
+CONTROLLER = {"host": "localhost", "port": 6100, "report_port": 6101}
+
+
+def run_chain(depth):
+    workers_config = [{"host": "localhost", "port": 5600 + i} for i in range(depth)]
+    workers = [WorkerActor.start(worker["host"], worker["port"], CONTROLLER) for worker in workers_config]
+    controller = Controller.start(CONTROLLER["host"], CONTROLLER["port"], workers_config, report_port=CONTROLLER["report_port"],
+                                  placement="round_robin")
+    try:
+        execution = controller.proxy().new_execution(chain_workflow(depth, question="Hi!")).get()
+        result = controller.proxy().deploy_workflow(execution).get()
+        if not result.ok():
+            raise RuntimeError(f"Deployment failed: {result}")
+
+        start = time.perf_counter()
+        controller.proxy().start_execution(execution).get()
+        if not execution.done.wait(30):
+            raise RuntimeError(f"Chain of depth {depth} did not finish")
+        return time.perf_counter() - start
+    finally:
+        pykka.ActorRegistry.stop_all()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark end-to-end latency against chain depth")
+    parser.add_argument("--depths", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    rows = []
+    for depth in args.depths:
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            latencies = [run_chain(depth) for _ in range(args.repeat)]
+        rows.append((depth, statistics.median(latencies), max(latencies)))
+
+    print(f"{'depth':>6} {'median (ms)':>12} {'max (ms)':>10} {'per level (ms)':>15}")
+    for depth, median, worst in rows:
+        print(f"{depth:>6} {median * 1000:>12.2f} {worst * 1000:>10.2f} {median * 1000 / depth:>15.2f}")
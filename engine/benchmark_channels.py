@@ -0,0 +1,110 @@
+import os,sys
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.dirname(CURRENT_DIR))
+
+import argparse
+import threading
+import time
+from concurrent.futures import wait
+
+import zmq
+
+from channels import ChannelPool, bind_router, recv_request, send_reply
+
+
+# Compares the old per-message REQ socket path against pooled DEALER/ROUTER channels.
+# Both servers acknowledge every message the same way a worker does.
+
+def rep_echo_server(context, port, stop):
+    socket = context.socket(zmq.REP)
+    socket.setsockopt(zmq.LINGER, 0)
+    socket.bind(f"tcp://localhost:{port}")
+    poller = zmq.Poller()
+    poller.register(socket, zmq.POLLIN)
+    while not stop.is_set():
+        if poller.poll(100):
+            socket.recv()
+            socket.send_string("ack")
+    socket.close()
+
+
+def router_echo_server(context, port, stop):
+    socket = bind_router(context, "localhost", port)
+    poller = zmq.Poller()
+    poller.register(socket, zmq.POLLIN)
+    while not stop.is_set():
+        if poller.poll(100):
+            envelope, _ = recv_request(socket)
+            send_reply(socket, envelope, "ack")
+    socket.close()
+
+
+def per_message_socket(context, endpoint, payload, count):
+    latencies = []
+    for _ in range(count):
+        start = time.perf_counter()
+        socket = context.socket(zmq.REQ)
+        socket.connect(endpoint)
+        socket.send(payload)
+        socket.recv_string()
+        socket.close()
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def pooled_channel(pool, endpoint, payload, count, inflight):
+    latencies = []
+    sent = 0
+    while sent < count:
+        window = min(inflight, count - sent)
+        start = time.perf_counter()
+        futures = [pool.send(endpoint, payload) for _ in range(window)]
+        for future in futures:
+            future.add_done_callback(lambda f, start=start: latencies.append(time.perf_counter() - start))
+        wait(futures)
+        sent += window
+    return latencies
+
+
+def report(name, latencies, elapsed):
+    latencies = sorted(latencies)
+    p50 = latencies[len(latencies) // 2] * 1000
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000
+    print(f"{name:<28} {len(latencies) / elapsed:>12.0f} {p50:>10.3f} {p99:>10.3f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark per-message REQ sockets against pooled channels")
+    parser.add_argument("--messages", type=int, default=5000)
+    parser.add_argument("--payload-size", type=int, default=256)
+    parser.add_argument("--inflight", type=int, default=32, help="messages in flight for the pipelined pooled run")
+    args = parser.parse_args()
+
+    context = zmq.Context()
+    stop = threading.Event()
+    threading.Thread(target=rep_echo_server, args=(context, 7555, stop), daemon=True).start()
+    threading.Thread(target=router_echo_server, args=(context, 7556, stop), daemon=True).start()
+    time.sleep(0.2)
+
+    payload = b"x" * args.payload_size
+    #both servers are plain tcp sockets, as is the REQ path the pool is compared against
+    pool = ChannelPool(context, backend="tcp")
+
+    print(f"{'path':<28} {'msgs/sec':>12} {'p50 (ms)':>10} {'p99 (ms)':>10}")
+
+    start = time.perf_counter()
+    latencies = per_message_socket(context, "tcp://localhost:7555", payload, args.messages)
+    report("per-message REQ socket", latencies, time.perf_counter() - start)
+
+    start = time.perf_counter()
+    latencies = pooled_channel(pool, "tcp://localhost:7556", payload, args.messages, 1)
+    report("pooled channel", latencies, time.perf_counter() - start)
+
+    start = time.perf_counter()
+    latencies = pooled_channel(pool, "tcp://localhost:7556", payload, args.messages, args.inflight)
+    report(f"pooled channel ({args.inflight} inflight)", latencies, time.perf_counter() - start)
+
+    pool.close()
+    stop.set()
+    time.sleep(0.2)
+    context.term()
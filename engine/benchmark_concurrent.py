@@ -0,0 +1,92 @@
+import os,sys
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.dirname(CURRENT_DIR))
+
+import argparse
+import contextlib
+import pickle
+import statistics
+import threading
+import time
+
+import pykka
+
+from controller import Controller
+from worker import WorkerActor
+from utils import send_message_to_controller
+from workload import link, logical_plan, operator, to_workflow
+
+
+# N executions submitted at once by N clients to one controller and one worker fleet, against
+# running the same N one after another. Each execution is a MockSource -> MockMap pipeline, so
+# concurrent executions compete for the same executor slots.
+
+CONTROLLER = {"host": "localhost", "port": 6100, "report_port": 6101}
+
+
+def pipeline_workflow(rows, tuple_cost):
+    plan = logical_plan(
+        [operator("source", "MockSource", rows=rows, tupleCost=tuple_cost), operator("map", "MockMap", tupleCost=tuple_cost)],
+        [link("source", "map")],
+    )
+    plan["settings"] = {"dataTransferBatchSize": 50}
+    return to_workflow(plan, "pipeline")
+
+
+def submit(controller, workflow):
+    #the reply names the execution, "Execution <id> starts"
+    submitted_at = time.perf_counter()
+    reply = send_message_to_controller(CONTROLLER["host"], CONTROLLER["port"], pickle.dumps(workflow))
+    if not reply.endswith(" starts"):
+        raise RuntimeError(reply)
+    execution = controller.proxy().get_execution(reply.split()[1]).get()
+    if not execution.done.wait(300):
+        raise RuntimeError(f"Execution {execution.execution_id} did not finish")
+    return execution.finished_at - submitted_at
+
+
+def run(executions, workers, rows, tuple_cost, concurrent):
+    workers_config = [{"host": "localhost", "port": 5600 + i} for i in range(workers)]
+    actors = [WorkerActor.start(worker["host"], worker["port"], CONTROLLER) for worker in workers_config]
+    controller = Controller.start(CONTROLLER["host"], CONTROLLER["port"], workers_config, report_port=CONTROLLER["report_port"],
+                                  placement="round_robin")
+    try:
+        workflow = pipeline_workflow(rows, tuple_cost)
+        latencies = []
+        start = time.perf_counter()
+        if concurrent:
+            clients = [threading.Thread(target=lambda: latencies.append(submit(controller, workflow))) for _ in range(executions)]
+            for client in clients:
+                client.start()
+            for client in clients:
+                client.join()
+        else:
+            for _ in range(executions):
+                latencies.append(submit(controller, workflow))
+        elapsed = time.perf_counter() - start
+        if len(latencies) != executions:
+            raise RuntimeError(f"Only {len(latencies)} of {executions} executions finished")
+        return elapsed, statistics.median(latencies), max(latencies)
+    finally:
+        pykka.ActorRegistry.stop_all()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark concurrent executions on one controller and worker fleet")
+    parser.add_argument("--executions", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--workers", type=int, default=3)
+    parser.add_argument("--rows", type=int, default=500)
+    parser.add_argument("--tuple-cost", type=float, default=0.0005, help="seconds every operator spends on a tuple")
+    args = parser.parse_args()
+
+    rows = []
+    for executions in args.executions:
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            sequential = run(executions, args.workers, args.rows, args.tuple_cost, concurrent=False)
+            concurrent = run(executions, args.workers, args.rows, args.tuple_cost, concurrent=True)
+        rows.append((executions, sequential, concurrent))
+
+    print(f"{'executions':>10} {'mode':>11} {'total (s)':>10} {'exec/sec':>9} {'median latency (s)':>19} {'max latency (s)':>16}")
+    for executions, *modes in rows:
+        for mode, (elapsed, median, worst) in zip(("sequential", "concurrent"), modes):
+            print(f"{executions:>10} {mode:>11} {elapsed:>10.3f} {executions / elapsed:>9.2f} {median:>19.3f} {worst:>16.3f}")
@@ -0,0 +1,76 @@
+import os,sys
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.dirname(CURRENT_DIR))
+
+import argparse
+import contextlib
+import time
+import uuid
+
+import pykka
+import zmq
+
+import codec
+from channels import ChannelPool, scatter_gather
+from config import CONTROLLER_CONFIG, WORKERS_CONFIG, BROADCAST_CONFIG, STREAMING_CONFIG, FLOW_CONTROL_CONFIG
+from controller import Controller
+from messages import DeploymentManifest, WorkerAssignment
+from worker import WorkerActor
+from workload import chain_workflow
+
+
+# Deploy latency of per-worker manifests against the old scheme, where every operator's
+# assignment was broadcast to every worker (O(operators x workers) round trips).
+
+def broadcast_every_assignment(pool, workflow, placement):
+    #every assignment travels as an execution of its own, workers reject a second manifest for one execution
+    for operator in workflow.GetOperators():
+        worker = placement[operator.GetId()]
+        assignment = WorkerAssignment.from_workflow(worker, operator, workflow)
+        routing = {targetOpID: placement[targetOpID] for targetOpID in assignment.downstreams}
+        message = codec.encode(DeploymentManifest(uuid.uuid4().hex, worker, [assignment], routing, STREAMING_CONFIG["batch_size"], FLOW_CONTROL_CONFIG["credits"], "", ""))
+        result = scatter_gather(pool, WORKERS_CONFIG, message, BROADCAST_CONFIG["ack_timeout"])
+        if not result.ok():
+            raise RuntimeError(f"Broadcast failed: {result}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark workflow deployment latency")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000, 10000])
+    parser.add_argument("--legacy-max", type=int, default=10000, help="largest size to also run the per-assignment broadcast for")
+    args = parser.parse_args()
+
+    workers = [WorkerActor.start(worker["host"], worker["port"]) for worker in WORKERS_CONFIG]
+    controller = Controller.start(CONTROLLER_CONFIG["host"], CONTROLLER_CONFIG["port"], WORKERS_CONFIG)
+    context = zmq.Context()
+    pool = ChannelPool(context)
+
+    rows = []
+    for size in args.sizes:
+        workflow = chain_workflow(size, question="Hi!")
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            execution = controller.proxy().new_execution(workflow).get()
+            start = time.perf_counter()
+            result = controller.proxy().deploy_workflow(execution).get()
+            manifest_time = time.perf_counter() - start
+            if not result.ok():
+                raise RuntimeError(f"Deployment failed: {result}")
+
+            legacy_time = None
+            if size <= args.legacy_max:
+                placement = controller.proxy().assign_tasks_to_workers(workflow.GetOperators(), workflow).get()
+                start = time.perf_counter()
+                broadcast_every_assignment(pool, workflow, placement)
+                legacy_time = time.perf_counter() - start
+        rows.append((size, manifest_time, legacy_time))
+
+    print(f"{'operators':>10} {'manifests (ms)':>16} {'broadcast each (ms)':>20} {'speedup':>8}")
+    for size, manifest_time, legacy_time in rows:
+        if legacy_time is None:
+            print(f"{size:>10} {manifest_time * 1000:>16.1f} {'-':>20} {'-':>8}")
+        else:
+            print(f"{size:>10} {manifest_time * 1000:>16.1f} {legacy_time * 1000:>20.1f} {legacy_time / manifest_time:>7.1f}x")
+
+    pool.close()
+    context.term()
+    pykka.ActorRegistry.stop_all()
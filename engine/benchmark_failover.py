@@ -0,0 +1,80 @@
+import os,sys
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.dirname(CURRENT_DIR))
+
+import argparse
+import contextlib
+import tempfile
+import time
+
+import pykka
+
+from controller import Controller
+from llm import LLMBroker, MockLLMBackend, set_broker
+from worker import WorkerActor
+from workload import chain_plan, to_workflow
+
+
+# A chain of Chat operators spread over three workers, one of which is killed halfway through. The
+# controller notices the missing heartbeats and resumes the execution on the survivors from the
+# checkpointed operators. Reports how long detection and recovery took for a few heartbeat timeouts,
+# and the makespan against a run without failure.
+
+CONTROLLER = {"host": "localhost", "port": 6100, "report_port": 6101}
+
+
+def run(chain, latency, timeout, kill):
+    broker = LLMBroker(MockLLMBackend(latency))
+    set_broker(broker)
+    workers_config = [{"host": "localhost", "port": 5600 + i} for i in range(3)]
+    #heartbeats four times per timeout, so that a single late one doesn't get a live worker declared dead
+    workers = {worker["port"]: WorkerActor.start(worker["host"], worker["port"], CONTROLLER, cache_config={"enabled": False},
+                                                 heartbeat_interval=timeout / 4) for worker in workers_config}
+    controller = Controller.start(CONTROLLER["host"], CONTROLLER["port"], workers_config, report_port=CONTROLLER["report_port"],
+                                  placement="round_robin", checkpoint_store=os.path.join(tempfile.mkdtemp(), "checkpoints.sqlite"),
+                                  heartbeat_timeout=timeout)
+    try:
+        execution = controller.proxy().new_execution(to_workflow(chain_plan(chain, question="Continue the story."))).get()
+        result = controller.proxy().deploy_workflow(execution).get()
+        if not result.ok():
+            raise RuntimeError(f"Deployment failed: {result}")
+        controller.proxy().start_execution(execution).get()
+
+        if kill:
+            #kill the worker of the operator in the middle of the chain once it is running
+            victim = execution.placement[f"Chat-operator-{chain // 2}"]
+            while len(execution.remaining_operators) > chain - chain // 2:
+                time.sleep(0.005)
+            #a crash, a worker that stops cleanly deregisters and has its executions recovered right away
+            killed = workers.pop(victim["port"])
+            killed.proxy().deregister = False
+            killed.stop()
+        if not execution.done.wait(120):
+            raise RuntimeError("Workflow did not finish")
+
+        while execution.resumed_as is not None:
+            execution = execution.resumed_as
+        recoveries = execution.recoveries
+        if kill and not recoveries:
+            raise RuntimeError("The execution finished without a recovery")
+        return execution.makespan(), recoveries[0] if recoveries else None
+    finally:
+        pykka.ActorRegistry.stop_all()
+        broker.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark failure detection and recovery of an execution whose worker dies")
+    parser.add_argument("--chain", type=int, default=8, help="Chat operators in the chain")
+    parser.add_argument("--latency", type=float, default=0.2, help="seconds an LLM call takes")
+    parser.add_argument("--timeouts", type=float, nargs="+", default=[0.5, 1.0, 2.0], help="heartbeat timeouts to compare")
+    args = parser.parse_args()
+
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        baseline, _ = run(args.chain, args.latency, args.timeouts[0], False)
+        rows = [(timeout, run(args.chain, args.latency, timeout, True)) for timeout in args.timeouts]
+
+    print(f"makespan without failure: {baseline:.3f}s")
+    print(f"{'timeout (s)':>11} {'detection (s)':>14} {'recovery (s)':>13} {'makespan (s)':>13} {'overhead (s)':>13}")
+    for timeout, (makespan, recovery) in rows:
+        print(f"{timeout:>11.2f} {recovery['detection_time']:>14.3f} {recovery['recovery_time']:>13.3f} {makespan:>13.3f} {makespan - baseline:>13.3f}")
@@ -0,0 +1,73 @@
+import os,sys
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.dirname(CURRENT_DIR))
+
+import argparse
+import contextlib
+import time
+import tracemalloc
+
+import pykka
+
+from controller import Controller
+from worker import WorkerActor
+from workload import link, logical_plan, operator, to_workflow
+
+
+# A fast MockSource feeding a slow MockMap on another worker, with and without credit-based flow
+# control. Without credits every batch the source produces piles up in the map's inbox; with them
+# the inbox stays bounded by the initial credits, at the same makespan.
+
+CONTROLLER = {"host": "localhost", "port": 6100, "report_port": 6101}
+
+
+def run(credits, rows, map_cost, batch_size):
+    workers_config = [{"host": "localhost", "port": 5600 + i} for i in range(2)]
+    workers = [WorkerActor.start(worker["host"], worker["port"], CONTROLLER) for worker in workers_config]
+    controller = Controller.start(CONTROLLER["host"], CONTROLLER["port"], workers_config, report_port=CONTROLLER["report_port"],
+                                  placement="round_robin", credits=credits)
+    try:
+        plan = logical_plan(
+            [operator("source", "MockSource", rows=rows), operator("map", "MockMap", tupleCost=map_cost)],
+            [link("source", "map")],
+        )
+        plan["settings"] = {"dataTransferBatchSize": batch_size}
+        execution = controller.proxy().new_execution(to_workflow(plan)).get()
+        result = controller.proxy().deploy_workflow(execution).get()
+        if not result.ok():
+            raise RuntimeError(f"Deployment failed: {result}")
+
+        tracemalloc.start()
+        start = time.perf_counter()
+        controller.proxy().start_execution(execution).get()
+        if not execution.done.wait(300):
+            raise RuntimeError("Workflow did not finish")
+        elapsed = time.perf_counter() - start
+        _, peak_memory = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        metrics = {}
+        for worker in workers:
+            metrics.update(worker.proxy().get_flow_control_metrics(execution.execution_id).get())
+        return elapsed, metrics["map"]["peak_inbox"], peak_memory, metrics["source"]["edges"]["0->map"]["stalls"]
+    finally:
+        pykka.ActorRegistry.stop_all()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark credit-based flow control against an unbounded inbox")
+    parser.add_argument("--credits", type=int, nargs="+", default=[0, 1, 4, 16], help="0 turns flow control off")
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--map-cost", type=float, default=0.0001, help="seconds the map spends on a tuple")
+    args = parser.parse_args()
+
+    rows = []
+    for credits in args.credits:
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            rows.append((credits, *run(credits, args.rows, args.map_cost, args.batch_size)))
+
+    print(f"{'credits':>9} {'makespan (s)':>13} {'peak inbox':>11} {'peak memory (MB)':>17} {'stalls':>7}")
+    for credits, elapsed, peak_inbox, peak_memory, stalls in rows:
+        label = credits if credits else "unlimited"
+        print(f"{label:>9} {elapsed:>13.3f} {peak_inbox:>11} {peak_memory / 2**20:>17.2f} {stalls:>7}")
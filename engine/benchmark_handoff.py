@@ -0,0 +1,69 @@
+import os,sys
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.dirname(CURRENT_DIR))
+
+import argparse
+import contextlib
+import statistics
+
+import pykka
+
+from controller import Controller
+from worker import WorkerActor
+from workload import link, logical_plan, operator, to_workflow
+
+
+# A source with large rows fanning out to consumers on the other workers of this host, which talk
+# over ipc as worker processes of one host would. With shared memory off every batch is copied into
+# the socket once per consumer; with it on it is written once into a segment all consumers decode
+# from, and the sockets only carry handles.
+
+CONTROLLER = {"host": "localhost", "port": 6100, "report_port": 6101}
+
+
+def run(threshold, consumers, rows, row_bytes, batch_size):
+    workers_config = [{"host": "localhost", "port": 5600 + i} for i in range(consumers + 1)]
+    actors = [WorkerActor.start(worker["host"], worker["port"], CONTROLLER, shared_memory_threshold=threshold,
+                                cache_config={"enabled": False}, transport="ipc") for worker in workers_config]
+    controller = Controller.start(CONTROLLER["host"], CONTROLLER["port"], workers_config, report_port=CONTROLLER["report_port"],
+                                  placement="round_robin", checkpoint_store="", transport="ipc")
+    try:
+        targets = [f"consumer-{i}" for i in range(consumers)]
+        plan = logical_plan(
+            [operator("source", "MockSource", rows=rows, rowBytes=row_bytes)] + [operator(op_id, "MockMap") for op_id in targets],
+            [link("source", op_id) for op_id in targets],
+        )
+        plan["settings"] = {"dataTransferBatchSize": batch_size}
+        execution = controller.proxy().new_execution(to_workflow(plan)).get()
+        result = controller.proxy().deploy_workflow(execution).get()
+        if not result.ok():
+            raise RuntimeError(f"Deployment failed: {result}")
+        controller.proxy().start_execution(execution).get()
+        if not execution.done.wait(600):
+            raise RuntimeError("Workflow did not finish")
+        socket_bytes = sum(actor.proxy().channels.get().sent_bytes for actor in actors)
+        segments = sum(actor.proxy().get_shared_memory_metrics().get()["written_bytes"] for actor in actors)
+        return execution.makespan(), socket_bytes, segments
+    finally:
+        pykka.ActorRegistry.stop_all()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark handing large results to workers of the same host through shared memory")
+    parser.add_argument("--consumers", type=int, default=3)
+    parser.add_argument("--rows", type=int, default=2000)
+    parser.add_argument("--row-bytes", type=int, default=20000, help="characters of payload per row")
+    parser.add_argument("--batch-size", type=int, default=50)
+    parser.add_argument("--threshold", type=int, default=64 * 1024, help="bytes from which a batch goes through shared memory")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    rows = []
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        for mode, threshold in (("sockets", 0), ("shared", args.threshold)):
+            runs = [run(threshold, args.consumers, args.rows, args.row_bytes, args.batch_size) for _ in range(args.repeat)]
+            rows.append((mode, *(statistics.median(values) for values in zip(*runs))))
+
+    print(f"{'handoff':>8} {'makespan (s)':>13} {'through sockets (MB)':>21} {'written to segments (MB)':>25}")
+    for mode, makespan, socket_bytes, segment_bytes in rows:
+        print(f"{mode:>8} {makespan:>13.3f} {socket_bytes / 1e6:>21.1f} {segment_bytes / 1e6:>25.1f}")
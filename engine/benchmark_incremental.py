@@ -0,0 +1,66 @@
+import os,sys
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.dirname(CURRENT_DIR))
+
+import argparse
+import contextlib
+import tempfile
+
+import pykka
+
+from controller import Controller
+from worker import WorkerActor
+from workload import link, logical_plan, operator, to_workflow
+
+
+# A chain of slow operators standing in for LLM calls, run once, then again after editing the
+# question of its sink: once recomputing everything, once reusing the stored results of the
+# unchanged upstream operators through opsToReuseResult.
+
+CONTROLLER = {"host": "localhost", "port": 6100, "report_port": 6101}
+
+
+def chain(length, sink_question, call_cost, reuse):
+    operators = [operator("source", "MockSource", rows=1)]
+    operators += [operator(f"call-{i}", "MockMap", tupleCost=call_cost) for i in range(length - 2)]
+    operators += [operator("sink", "Chat", question=sink_question)]
+    op_ids = [op["operatorID"] for op in operators]
+    plan = logical_plan(operators, [link(op_ids[i], op_ids[i + 1]) for i in range(length - 1)])
+    plan["opsToReuseResult"] = op_ids if reuse else []
+    return to_workflow(plan, "chain")
+
+
+def run(controller, workflow):
+    execution = controller.proxy().new_execution(workflow).get()
+    result = controller.proxy().deploy_workflow(execution).get()
+    if not result.ok():
+        raise RuntimeError(f"Deployment failed: {result}")
+    controller.proxy().start_execution(execution).get()
+    if not execution.done.wait(300):
+        raise RuntimeError("Workflow did not finish")
+    return execution.makespan(), len(execution.plan.run)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark incremental re-execution after editing the sink")
+    parser.add_argument("--length", type=int, default=50)
+    parser.add_argument("--call-cost", type=float, default=0.02, help="seconds every operator spends on its tuple")
+    args = parser.parse_args()
+
+    workers_config = [{"host": "localhost", "port": 5600 + i} for i in range(3)]
+    no_cache = {"enabled": False}
+    rows = []
+    with tempfile.TemporaryDirectory() as store, open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        workers = [WorkerActor.start(worker["host"], worker["port"], CONTROLLER, cache_config=no_cache) for worker in workers_config]
+        controller = Controller.start(CONTROLLER["host"], CONTROLLER["port"], workers_config, report_port=CONTROLLER["report_port"],
+                                      result_store=store)
+        try:
+            rows.append(("first run", *run(controller, chain(args.length, "first", args.call_cost, reuse=True))))
+            rows.append(("edit, full", *run(controller, chain(args.length, "second", args.call_cost, reuse=False))))
+            rows.append(("edit, reuse", *run(controller, chain(args.length, "third", args.call_cost, reuse=True))))
+        finally:
+            pykka.ActorRegistry.stop_all()
+
+    print(f"{'run':<12} {'makespan (s)':>13} {'operators run':>14}")
+    for name, makespan, operators in rows:
+        print(f"{name:<12} {makespan:>13.3f} {operators:>14}")
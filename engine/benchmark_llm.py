@@ -0,0 +1,70 @@
+import os,sys
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.dirname(CURRENT_DIR))
+
+import argparse
+import contextlib
+import time
+
+import pykka
+
+from controller import Controller
+from llm import LLMBroker, MockLLMBackend, set_broker
+from worker import WorkerActor
+from workload import fanout_plan, to_workflow
+
+
+# One source fanning out to many Chat operators, answered by a mock backend that serves a limited
+# number of calls at once, with every prompt sent on its own against prompts batched by the broker.
+
+CONTROLLER = {"host": "localhost", "port": 6100, "report_port": 6101}
+
+
+def run(width, workers, window, max_batch, latency, per_prompt, concurrency):
+    backend = MockLLMBackend(latency, per_prompt, concurrency)
+    broker = LLMBroker(backend, window=window, max_batch=max_batch)
+    set_broker(broker)
+    workers_config = [{"host": "localhost", "port": 5600 + i} for i in range(workers)]
+    actors = [WorkerActor.start(worker["host"], worker["port"], CONTROLLER, cache_config={"enabled": False}) for worker in workers_config]
+    controller = Controller.start(CONTROLLER["host"], CONTROLLER["port"], workers_config, report_port=CONTROLLER["report_port"],
+                                  placement="round_robin")
+    try:
+        plan = fanout_plan(width, question="Hi!")
+        plan["operators"][0].update(operatorType="MockSource", rows=1)
+        execution = controller.proxy().new_execution(to_workflow(plan)).get()
+        result = controller.proxy().deploy_workflow(execution).get()
+        if not result.ok():
+            raise RuntimeError(f"Deployment failed: {result}")
+
+        start = time.perf_counter()
+        controller.proxy().start_execution(execution).get()
+        if not execution.done.wait(300):
+            raise RuntimeError("Workflow did not finish")
+        return time.perf_counter() - start, backend.calls
+    finally:
+        pykka.ActorRegistry.stop_all()
+        broker.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark batched LLM calls against one call per Chat operator")
+    parser.add_argument("--widths", type=int, nargs="+", default=[4, 16, 64])
+    parser.add_argument("--workers", type=int, default=3)
+    parser.add_argument("--window", type=float, default=0.02, help="seconds the broker waits for more prompts")
+    parser.add_argument("--max-batch", type=int, default=16)
+    parser.add_argument("--latency", type=float, default=0.2, help="seconds a backend call takes")
+    parser.add_argument("--per-prompt", type=float, default=0.005, help="extra seconds per prompt in a call")
+    parser.add_argument("--concurrency", type=int, default=2, help="backend calls served at the same time")
+    args = parser.parse_args()
+
+    backend_args = (args.latency, args.per_prompt, args.concurrency)
+    rows = []
+    for width in args.widths:
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            unbatched = run(width, args.workers, 0, 1, *backend_args)
+            batched = run(width, args.workers, args.window, args.max_batch, *backend_args)
+        rows.append((width, unbatched, batched))
+
+    print(f"{'chats':>6} {'unbatched (s)':>14} {'calls':>6} {'batched (s)':>12} {'calls':>6} {'speedup':>8}")
+    for width, (unbatched, unbatched_calls), (batched, batched_calls) in rows:
+        print(f"{width:>6} {unbatched:>14.3f} {unbatched_calls:>6} {batched:>12.3f} {batched_calls:>6} {unbatched / batched:>7.2f}x")
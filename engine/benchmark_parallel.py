@@ -0,0 +1,77 @@
+import os,sys
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.dirname(CURRENT_DIR))
+
+import argparse
+import contextlib
+import statistics
+
+import pykka
+
+from controller import Controller
+from parallel import PARTITIONINGS
+from worker import WorkerActor
+from workload import link, logical_plan, operator, to_workflow
+
+
+# Makespan of source -> heavy operator -> sink with the heavy operator running as 1 to N instances
+# on as many workers. The heavy operator is a MockMap sleeping "tupleCost" seconds per tuple, i.e.
+# waiting like a call to a remote model would, so instances overlap even though the workers share
+# this process; cpu bound work (--tuple-work) only scales across worker processes. The source emits
+# its ids in order, so range partitioning on them works through the ranges one after the other for
+# the most part, as flow control holds the source back while the instance of the current range lags.
+
+CONTROLLER = {"host": "localhost", "port": 6100, "report_port": 6101}
+
+
+def run(parallelism, workers, rows, tuple_cost, tuple_work, partitioning, batch_size):
+    workers_config = [{"host": "localhost", "port": 5600 + i} for i in range(workers)]
+    actors = [WorkerActor.start(worker["host"], worker["port"], CONTROLLER, cache_config={"enabled": False}) for worker in workers_config]
+    controller = Controller.start(CONTROLLER["host"], CONTROLLER["port"], workers_config, report_port=CONTROLLER["report_port"],
+                                  checkpoint_store="")
+    try:
+        properties = {"parallelism": parallelism, "partitioning": partitioning, "partitionAttribute": "id"}
+        if partitioning == "range":
+            properties["partitionBoundaries"] = [rows * i // parallelism for i in range(1, parallelism)]
+        plan = logical_plan(
+            [operator("source", "MockSource", rows=rows),
+             operator("heavy", "MockMap", tupleCost=tuple_cost, tupleWork=tuple_work, **properties),
+             operator("sink", "MockMap")],
+            [link("source", "heavy"), link("heavy", "sink")],
+        )
+        plan["settings"] = {"dataTransferBatchSize": batch_size}
+        execution = controller.proxy().new_execution(to_workflow(plan)).get()
+        result = controller.proxy().deploy_workflow(execution).get()
+        if not result.ok():
+            raise RuntimeError(f"Deployment failed: {result}")
+        controller.proxy().start_execution(execution).get()
+        if not execution.done.wait(600):
+            raise RuntimeError("Workflow did not finish")
+        return execution.makespan()
+    finally:
+        pykka.ActorRegistry.stop_all()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the makespan of one heavy operator run as several parallel instances")
+    parser.add_argument("--parallelism", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--partitioning", choices=list(PARTITIONINGS), default="round_robin")
+    parser.add_argument("--rows", type=int, default=400)
+    parser.add_argument("--tuple-cost", type=float, default=0.005, help="seconds the heavy operator sleeps per tuple")
+    parser.add_argument("--tuple-work", type=int, default=0, help="cpu iterations the heavy operator burns per tuple")
+    parser.add_argument("--batch-size", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    workers = max(args.parallelism)
+    makespans = {}
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        for parallelism in args.parallelism:
+            makespans[parallelism] = statistics.median(
+                run(parallelism, workers, args.rows, args.tuple_cost, args.tuple_work, args.partitioning, args.batch_size)
+                for _ in range(args.repeat))
+
+    baseline = makespans[args.parallelism[0]]
+    print(f"{'instances':>10} {'makespan (s)':>13} {'speedup':>8}")
+    for parallelism, makespan in makespans.items():
+        print(f"{parallelism:>10} {makespan:>13.3f} {baseline / makespan:>8.2f}x")
@@ -0,0 +1,84 @@
+import os,sys
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.dirname(CURRENT_DIR))
+
+import argparse
+import contextlib
+import json
+import time
+
+import pykka
+import zmq
+
+from controller import Controller
+from llm import LLMBroker, MockLLMBackend, set_broker
+from worker import WorkerActor
+from workload import fanout_plan, to_workflow
+
+
+# Chat operators answered by a mock backend that streams word by word. Measures when the first partial
+# output reaches a subscriber of the controller's events against when the whole answer is there, and
+# how many events the coalescing interval turns the streamed words into.
+
+CONTROLLER = {"host": "localhost", "port": 6100, "report_port": 6101, "event_port": 6102}
+
+
+def run(width, words, chunk_delay, interval):
+    broker = LLMBroker(MockLLMBackend(0.1, 0.0, 4, chunk_delay))
+    set_broker(broker)
+    workers_config = [{"host": "localhost", "port": 5600}]
+    actors = [WorkerActor.start(worker["host"], worker["port"], CONTROLLER, cache_config={"enabled": False},
+                                partial_output_config={"interval": interval, "max_chars": 4096}) for worker in workers_config]
+    controller = Controller.start(CONTROLLER["host"], CONTROLLER["port"], workers_config, report_port=CONTROLLER["report_port"],
+                                  event_port=CONTROLLER["event_port"])
+    context = zmq.Context()
+    events = context.socket(zmq.SUB)
+    events.setsockopt(zmq.LINGER, 0)
+    events.connect(f"tcp://{CONTROLLER['host']}:{CONTROLLER['event_port']}")
+    events.setsockopt(zmq.SUBSCRIBE, b"")
+    try:
+        plan = fanout_plan(width, question=" ".join(["word"] * words))
+        plan["operators"][0].update(operatorType="MockSource", rows=1)
+        execution = controller.proxy().new_execution(to_workflow(plan)).get()
+        result = controller.proxy().deploy_workflow(execution).get()
+        if not result.ok():
+            raise RuntimeError(f"Deployment failed: {result}")
+
+        start = time.perf_counter()
+        controller.proxy().start_execution(execution).get()
+        first_chunk = None
+        chunks = 0
+        while True:
+            if not events.poll(30000):
+                raise RuntimeError("Workflow did not finish")
+            _, payload = events.recv_multipart()
+            event = json.loads(payload)
+            if event["type"] == "ExecutionCompleted":
+                break
+            chunks += 1
+            if first_chunk is None:
+                first_chunk = time.perf_counter() - start
+        return first_chunk, time.perf_counter() - start, chunks
+    finally:
+        events.close()
+        context.term()
+        pykka.ActorRegistry.stop_all()
+        broker.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark time to first partial Chat output and the number of coalesced chunks")
+    parser.add_argument("--width", type=int, default=4, help="Chat operators answering at the same time")
+    parser.add_argument("--words", type=int, default=200, help="words in every answer")
+    parser.add_argument("--chunk-delay", type=float, default=0.005, help="seconds between two words of an answer")
+    parser.add_argument("--intervals", type=float, nargs="+", default=[0.0, 0.05, 0.2], help="coalescing intervals to compare")
+    args = parser.parse_args()
+
+    rows = []
+    for interval in args.intervals:
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            rows.append((interval, run(args.width, args.words, args.chunk_delay, interval)))
+
+    print(f"{'interval (s)':>12} {'first chunk (s)':>16} {'whole answer (s)':>17} {'chunk events':>13}")
+    for interval, (first_chunk, total, chunks) in rows:
+        print(f"{interval:>12.3f} {first_chunk:>16.3f} {total:>17.3f} {chunks:>13}")
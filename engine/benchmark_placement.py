@@ -0,0 +1,52 @@
+import os,sys
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.dirname(CURRENT_DIR))
+
+import argparse
+import random
+
+from placement import STRATEGIES, placement_metrics
+from workload import chain_plan, diamond_plan, fanout_plan, logical_plan, to_workflow
+
+
+# Cross-worker edge count and estimated makespan of every placement strategy on a few workflow shapes.
+
+def parallel_chains_plan(chains, length):
+    operators, links = [], []
+    for i in range(chains):
+        plan = chain_plan(length)
+        for operator in plan["operators"]:
+            operator["operatorID"] = f"chain-{i}-{operator['operatorID']}"
+        for link in plan["links"]:
+            link["fromOpId"] = f"chain-{i}-{link['fromOpId']}"
+            link["toOpId"] = f"chain-{i}-{link['toOpId']}"
+        operators += plan["operators"]
+        links += plan["links"]
+    return logical_plan(operators, links)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare placement strategies")
+    parser.add_argument("--workers", type=int, default=3)
+    parser.add_argument("--slots", type=int, default=4)
+    parser.add_argument("--random-costs", action="store_true", help="draw operator costs from [0.5, 5) instead of 1.0")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    workers = [{"host": "localhost", "port": 5555 + i, "slots": args.slots} for i in range(args.workers)]
+    shapes = {
+        "chain-30": chain_plan(30),
+        "fanout-30": fanout_plan(30),
+        "diamond-8": diamond_plan(8),
+        "6 chains x 5": parallel_chains_plan(6, 5),
+    }
+
+    rng = random.Random(args.seed)
+    print(f"{'workflow':<14} {'strategy':<14} {'cross edges':>12} {'est. makespan':>14}")
+    for shape, plan in shapes.items():
+        workflow = to_workflow(plan, shape)
+        costs = {op_id: rng.uniform(0.5, 5) for op_id in workflow.DAG.nodes} if args.random_costs else None
+        for name, strategy in STRATEGIES.items():
+            placement = strategy().place(workflow.DAG, workers, costs)
+            metrics = placement_metrics(workflow.DAG, placement, costs)
+            print(f"{shape:<14} {name:<14} {metrics['cross_worker_edges']:>12} {metrics['estimated_makespan']:>14.2f}")
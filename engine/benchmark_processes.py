@@ -0,0 +1,72 @@
+import os,sys
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.dirname(CURRENT_DIR))
+
+import argparse
+import contextlib
+import time
+
+import pykka
+
+from controller import Controller
+from launcher import WorkerSupervisor
+from worker import WorkerActor
+from workload import logical_plan, operator, to_workflow
+
+
+# Makespan of cpu bound work spread over an increasing number of workers, with every worker a thread
+# of this process against every worker in a process of its own. Each worker runs one MockSource
+# burning "tupleWork" cpu iterations per tuple, so threaded workers share one GIL while worker
+# processes scale with the cores of the machine.
+
+CONTROLLER = {"host": "localhost", "port": 6100, "report_port": 6101}
+
+
+def cpu_workflow(workers, rows, work):
+    operators = [operator(f"source-{i}", "MockSource", rows=rows, tupleWork=work) for i in range(workers)]
+    return to_workflow(logical_plan(operators, []), "cpu")
+
+
+def run(mode, workers, rows, work):
+    workers_config = [{"host": "localhost", "port": 5600 + i} for i in range(workers)]
+    if mode == "process":
+        supervisor = WorkerSupervisor(workers_config, CONTROLLER, output=os.devnull).start()
+    else:
+        actors = [WorkerActor.start(worker["host"], worker["port"], CONTROLLER) for worker in workers_config]
+    controller = Controller.start(CONTROLLER["host"], CONTROLLER["port"], workers_config, report_port=CONTROLLER["report_port"],
+                                  placement="round_robin")
+    try:
+        execution = controller.proxy().new_execution(cpu_workflow(workers, rows, work)).get()
+        result = controller.proxy().deploy_workflow(execution).get()
+        if not result.ok():
+            raise RuntimeError(f"Deployment failed: {result}")
+
+        start = time.perf_counter()
+        controller.proxy().start_execution(execution).get()
+        if not execution.done.wait(600):
+            raise RuntimeError("Workflow did not finish")
+        return time.perf_counter() - start
+    finally:
+        pykka.ActorRegistry.stop_all()
+        if mode == "process":
+            supervisor.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark threaded against process workers on cpu bound operators")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--rows", type=int, default=200)
+    parser.add_argument("--work", type=int, default=20000, help="cpu iterations per tuple")
+    args = parser.parse_args()
+
+    print(f"{os.cpu_count()} cores")
+    rows = []
+    for workers in args.workers:
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            threaded = run("thread", workers, args.rows, args.work)
+            processes = run("process", workers, args.rows, args.work)
+        rows.append((workers, threaded, processes))
+
+    print(f"{'workers':>8} {'threads (s)':>12} {'processes (s)':>14} {'speedup':>8}")
+    for workers, threaded, processes in rows:
+        print(f"{workers:>8} {threaded:>12.3f} {processes:>14.3f} {threaded / processes:>7.2f}x")
@@ -0,0 +1,89 @@
+import os,sys
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.dirname(CURRENT_DIR))
+
+import argparse
+import contextlib
+import random
+import statistics
+
+import pykka
+
+from controller import Controller
+from worker import WorkerActor
+from workload import branches_plan, synthetic_plan, to_workflow
+
+
+# Makespan of wide DAGs on workers with fewer slots than ready operators, with the ready queue in
+# FIFO order against longest remaining path first. Critical path ranks count operators until the
+# controller has seen operators of a type complete, then weight them with the mean cost of the type,
+# so critical_path is run on a fresh controller and again after one execution of the same workflow.
+#   branches  one source feeding chains of random length, most of them short
+#   mixed     the same, with some chains made of operators four times as expensive
+#   random    a random DAG (see workload.random_dag_plan), whose joins make it bound by the total
+#             work rather than any path, neither policy can do better there
+
+CONTROLLER = {"host": "localhost", "port": 6100, "report_port": 6101}
+
+
+def workflow_plan(name, width, depth, skew, cost, seed):
+    if name == "random":
+        return synthetic_plan("random", width * depth // 2, rows=1, tuple_cost=cost, seed=seed)
+    plan = branches_plan(width, depth, seed, skew, "MockMap", tupleCost=cost)
+    plan["operators"][0].update(operatorType="MockSource", rows=1, tupleCost=0)
+    if name == "mixed":
+        rng = random.Random(seed)
+        heavy = {branch for branch in range(width) if rng.random() < 0.5}
+        for op in plan["operators"][1:]:
+            if int(op["operatorID"].split("-")[1]) in heavy:
+                #blocking, takes its one tuple, emits one
+                op.update(operatorType="MockReduce", rows=1, tupleCost=cost * 4)
+    return plan
+
+
+def run(policy, plan, workers, slots, warm):
+    workers_config = [{"host": "localhost", "port": 5600 + i, "slots": slots} for i in range(workers)]
+    actors = [WorkerActor.start(worker["host"], worker["port"], CONTROLLER, slots=slots, scheduling_policy=policy,
+                                cache_config={"enabled": False}) for worker in workers_config]
+    controller = Controller.start(CONTROLLER["host"], CONTROLLER["port"], workers_config, report_port=CONTROLLER["report_port"],
+                                  placement="round_robin", checkpoint_store="")
+    try:
+        for _ in range(2 if warm else 1):
+            execution = controller.proxy().new_execution(to_workflow(plan)).get()
+            result = controller.proxy().deploy_workflow(execution).get()
+            if not result.ok():
+                raise RuntimeError(f"Deployment failed: {result}")
+            controller.proxy().start_execution(execution).get()
+            if not execution.done.wait(300):
+                raise RuntimeError("Workflow did not finish")
+        return execution.makespan()
+    finally:
+        pykka.ActorRegistry.stop_all()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark critical path first against FIFO ready queues on wide DAGs")
+    parser.add_argument("--workflows", nargs="+", choices=["branches", "mixed", "random"], default=["branches", "mixed", "random"])
+    parser.add_argument("--width", type=int, default=16, help="chains of the branches workflows")
+    parser.add_argument("--depth", type=int, default=32, help="longest chain of the branches workflows")
+    parser.add_argument("--skew", type=float, default=3.0, help="above 1 most chains are short and a few long")
+    parser.add_argument("--cost", type=float, default=0.02, help="seconds an operator takes")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--slots", type=int, default=4)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    modes = [("fifo", "fifo", False), ("critical_path", "critical_path", False), ("critical_path + history", "critical_path", True)]
+    rows = []
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        for name in args.workflows:
+            plan = workflow_plan(name, args.width, args.depth, args.skew, args.cost, args.seed)
+            makespans = {label: statistics.median(run(policy, plan, args.workers, args.slots, warm) for _ in range(args.repeat))
+                         for label, policy, warm in modes}
+            rows.append((name, len(plan["operators"]), makespans))
+
+    print(f"{'workflow':>9} {'operators':>10} {'policy':>24} {'makespan (s)':>13} {'vs fifo':>8}")
+    for name, size, makespans in rows:
+        for label, makespan in makespans.items():
+            print(f"{name:>9} {size:>10} {label:>24} {makespan:>13.3f} {makespans['fifo'] / makespan:>7.2f}x")
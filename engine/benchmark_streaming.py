@@ -0,0 +1,71 @@
+import os,sys
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.dirname(CURRENT_DIR))
+
+import argparse
+import contextlib
+import time
+
+import pykka
+
+from controller import Controller
+from worker import WorkerActor
+from workload import link, logical_plan, operator, to_workflow
+
+
+# Throughput of a MockSource -> MockMap -> ... pipeline spread over one worker per stage, for
+# several batch sizes. With a batch as large as the whole output nothing is pipelined, which is
+# how the engine ran before operators streamed their output.
+
+CONTROLLER = {"host": "localhost", "port": 6100, "report_port": 6101}
+
+
+def pipeline_plan(stages, rows, tuple_cost, batch_size):
+    operators = [operator("source", "MockSource", rows=rows, tupleCost=tuple_cost)]
+    operators += [operator(f"map-{i}", "MockMap", tupleCost=tuple_cost) for i in range(stages - 1)]
+    links = [link(operators[i]["operatorID"], operators[i + 1]["operatorID"]) for i in range(stages - 1)]
+    plan = logical_plan(operators, links)
+    plan["settings"] = {"dataTransferBatchSize": batch_size}
+    return plan
+
+
+def run_pipeline(stages, rows, tuple_cost, batch_size):
+    workers_config = [{"host": "localhost", "port": 5600 + i} for i in range(stages)]
+    workers = [WorkerActor.start(worker["host"], worker["port"], CONTROLLER) for worker in workers_config]
+    controller = Controller.start(CONTROLLER["host"], CONTROLLER["port"], workers_config, report_port=CONTROLLER["report_port"],
+                                  placement="round_robin")
+    try:
+        workflow = to_workflow(pipeline_plan(stages, rows, tuple_cost, batch_size))
+        execution = controller.proxy().new_execution(workflow).get()
+        result = controller.proxy().deploy_workflow(execution).get()
+        if not result.ok():
+            raise RuntimeError(f"Deployment failed: {result}")
+
+        start = time.perf_counter()
+        controller.proxy().start_execution(execution).get()
+        if not execution.done.wait(300):
+            raise RuntimeError("Pipeline did not finish")
+        return time.perf_counter() - start
+    finally:
+        pykka.ActorRegistry.stop_all()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark pipelined throughput against batch size")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 10, 100, 400])
+    parser.add_argument("--rows", type=int, default=2000)
+    parser.add_argument("--stages", type=int, default=3)
+    parser.add_argument("--tuple-cost", type=float, default=0.0005, help="seconds every stage spends on a tuple")
+    args = parser.parse_args()
+
+    rows = []
+    for batch_size in args.batch_sizes + [args.rows]:
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            elapsed = run_pipeline(args.stages, args.rows, args.tuple_cost, batch_size)
+        rows.append((batch_size, elapsed))
+
+    print(f"{'batch size':>10} {'makespan (s)':>13} {'tuples/sec':>11}")
+    for batch_size, elapsed in rows:
+        label = f"{batch_size}" if batch_size != args.rows else f"{batch_size}*"
+        print(f"{label:>10} {elapsed:>13.3f} {args.rows / elapsed:>11.0f}")
+    print("* one batch holding the whole output, no pipelining")
@@ -0,0 +1,150 @@
+import os,sys
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.dirname(CURRENT_DIR))
+
+import argparse
+import contextlib
+import json
+import multiprocessing
+import platform
+import resource
+import subprocess
+import time
+
+import pykka
+
+from controller import Controller
+from placement import STRATEGIES
+from worker import WorkerActor
+from workload import SHAPES, synthetic_plan, to_workflow
+
+
+# Regression harness: synthetic workflows of every shape in workload.SHAPES (chain, wide fan-out,
+# tree, diamond, random DAG) and size, run against a local controller and workers with mock
+# operators of configurable cost. Reports deploy time, makespan, messages sent and peak memory of
+# every run and writes them as JSON, which --baseline compares a later run against.
+#
+# Every run gets a fresh process, so that peak memory (ru_maxrss) is the run's own and not the
+# largest run's so far. Messages are those the controller and workers put on their channels,
+# heartbeats and statistics reports included.
+
+CONTROLLER = {"host": "localhost", "port": 6100, "report_port": 6101, "event_port": 6102}
+#ru_maxrss is in bytes on macOS and in kilobytes on linux
+MAXRSS_PER_MB = 1024 * 1024 if sys.platform == "darwin" else 1024
+
+
+def run_case(shape, size, config, results):
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        workers_config = [{"host": "localhost", "port": 5600 + i} for i in range(config["workers"])]
+        workers = [WorkerActor.start(worker["host"], worker["port"], CONTROLLER, cache_config={"enabled": False})
+                   for worker in workers_config]
+        controller = Controller.start(CONTROLLER["host"], CONTROLLER["port"], workers_config, report_port=CONTROLLER["report_port"],
+                                      event_port=CONTROLLER["event_port"], placement=config["placement"], checkpoint_store="")
+        try:
+            plan = synthetic_plan(shape, size, config["rows"], config["tuple_cost"], config["tuple_work"], config["seed"])
+            plan["settings"] = {"dataTransferBatchSize": config["batch_size"]}
+            workflow = to_workflow(plan, f"{shape}-{size}")
+            actors = [controller] + workers
+
+            execution = controller.proxy().new_execution(workflow).get()
+            start = time.perf_counter()
+            result = controller.proxy().deploy_workflow(execution).get()
+            deploy_time = time.perf_counter() - start
+            if not result.ok():
+                raise RuntimeError(f"Deployment failed: {result}")
+            deploy_messages = sum(actor.proxy().channels.get().sent for actor in actors)
+
+            controller.proxy().start_execution(execution).get()
+            if not execution.done.wait(config["timeout"]):
+                raise RuntimeError(f"Workflow did not finish within {config['timeout']}s")
+            channels = [actor.proxy().channels.get() for actor in actors]
+            results.put({
+                "shape": shape,
+                "operators": size,
+                "links": len(plan["links"]),
+                "deploy_time": deploy_time,
+                "makespan": execution.makespan(),
+                "deploy_messages": deploy_messages,
+                "messages": sum(pool.sent for pool in channels),
+                "bytes": sum(pool.sent_bytes for pool in channels),
+                "peak_memory_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / MAXRSS_PER_MB,
+            })
+        except Exception as e:
+            results.put({"shape": shape, "operators": size, "error": str(e)})
+        finally:
+            pykka.ActorRegistry.stop_all()
+
+
+def run(shape, size, config):
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    process = context.Process(target=run_case, args=(shape, size, config, results))
+    process.start()
+    try:
+        #the result has to be read before join, a process doesn't exit while its queue is unflushed
+        return results.get(timeout=config["timeout"] + 60)
+    except Exception:
+        return {"shape": shape, "operators": size, "error": "benchmark process did not report back"}
+    finally:
+        process.join(10)
+        if process.is_alive():
+            process.kill()
+
+
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], cwd=CURRENT_DIR, capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = ""
+    return {"commit": commit, "python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S")}
+
+
+def compare(rows, baseline_path):
+    with open(baseline_path) as file:
+        baseline = {(row["shape"], row["operators"]): row for row in json.load(file)["results"] if "error" not in row}
+    print(f"\nagainst {baseline_path} (ratio new / baseline, above 1 is slower)")
+    print(f"{'shape':>8} {'operators':>10} {'deploy':>8} {'makespan':>9} {'messages':>9} {'memory':>8}")
+    for row in rows:
+        old = baseline.get((row["shape"], row["operators"]))
+        if old is None or "error" in row:
+            continue
+        ratios = [row[key] / old[key] if old[key] else float("nan") for key in ("deploy_time", "makespan", "messages", "peak_memory_mb")]
+        print(f"{row['shape']:>8} {row['operators']:>10} " + " ".join(f"{ratio:>{width}.2f}" for ratio, width in zip(ratios, (8, 9, 9, 8))))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark deploy time, makespan, messages and memory of synthetic workflows")
+    parser.add_argument("--shapes", nargs="+", choices=list(SHAPES), default=list(SHAPES))
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000, 10000], help="operators per workflow")
+    parser.add_argument("--workers", type=int, default=3)
+    parser.add_argument("--placement", choices=list(STRATEGIES), default="round_robin")
+    parser.add_argument("--rows", type=int, default=10, help="tuples every source emits")
+    parser.add_argument("--tuple-cost", type=float, default=0.0, help="seconds every operator sleeps per tuple")
+    parser.add_argument("--tuple-work", type=int, default=0, help="cpu iterations every operator burns per tuple")
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=0, help="seed of the random DAGs")
+    parser.add_argument("--timeout", type=float, default=600, help="seconds a single run may take")
+    parser.add_argument("--output", default=os.path.join(CURRENT_DIR, ".cache", "benchmarks", "benchmark_suite.json"))
+    parser.add_argument("--baseline", help="results file of an earlier run to compare against")
+    args = parser.parse_args()
+
+    config = {key: getattr(args, key) for key in ("workers", "placement", "rows", "tuple_cost", "tuple_work", "batch_size", "seed", "timeout")}
+    rows = []
+    print(f"{'shape':>8} {'operators':>10} {'deploy (ms)':>12} {'makespan (s)':>13} {'messages':>9} {'peak (MB)':>10}")
+    for shape in args.shapes:
+        for size in args.sizes:
+            row = run(shape, size, config)
+            rows.append(row)
+            if "error" in row:
+                print(f"{shape:>8} {size:>10} failed: {row['error']}")
+            else:
+                print(f"{shape:>8} {size:>10} {row['deploy_time'] * 1000:>12.1f} {row['makespan']:>13.3f} {row['messages']:>9} {row['peak_memory_mb']:>10.1f}")
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w") as file:
+        json.dump({"environment": environment(), "config": config, "results": rows}, file, indent=2)
+    print(f"\nresults written to {args.output}")
+
+    if args.baseline:
+        compare(rows, args.baseline)
@@ -0,0 +1,81 @@
+import os,sys
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.dirname(CURRENT_DIR))
+
+import argparse
+import collections
+import contextlib
+import statistics
+import time
+
+import pykka
+
+import tracing
+from controller import Controller
+from worker import WorkerActor
+from workload import chain_plan, to_workflow
+
+
+# Makespan of a streaming chain spread over two workers with tracing off and on, to show what tracing
+# costs, and where the time of the traced runs goes per span name. The trace of the last traced run
+# is written as Chrome trace JSON for chrome://tracing or ui.perfetto.dev.
+
+CONTROLLER = {"host": "localhost", "port": 6100, "report_port": 6101}
+
+
+def run(stages, rows, batch_size):
+    workers_config = [{"host": "localhost", "port": 5600 + i} for i in range(2)]
+    actors = [WorkerActor.start(worker["host"], worker["port"], CONTROLLER) for worker in workers_config]
+    controller = Controller.start(CONTROLLER["host"], CONTROLLER["port"], workers_config, report_port=CONTROLLER["report_port"],
+                                  placement="round_robin")
+    try:
+        plan = chain_plan(stages, "MockMap")
+        plan["operators"][0].update(operatorType="MockSource", rows=rows)
+        plan["settings"] = {"dataTransferBatchSize": batch_size}
+        start = time.perf_counter()
+        execution = controller.proxy().new_execution(to_workflow(plan)).get()
+        result = controller.proxy().deploy_workflow(execution).get()
+        if not result.ok():
+            raise RuntimeError(f"Deployment failed: {result}")
+        controller.proxy().start_execution(execution).get()
+        if not execution.done.wait(120):
+            raise RuntimeError("Workflow did not finish")
+        return time.perf_counter() - start
+    finally:
+        pykka.ActorRegistry.stop_all()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the overhead of tracing and break traced executions down by span")
+    parser.add_argument("--stages", type=int, default=4)
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", default=os.path.join(CURRENT_DIR, ".cache", "traces", "benchmark_tracing.json"))
+    args = parser.parse_args()
+
+    makespans = {}
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        for mode in ("off", "on"):
+            makespans[mode] = []
+            for _ in range(args.repeat):
+                if mode == "on":
+                    tracing.enable()
+                makespans[mode].append(run(args.stages, args.rows, args.batch_size))
+    spans = tracing.export(args.output)
+
+    off, on = statistics.median(makespans["off"]), statistics.median(makespans["on"])
+    print(f"{'tracing':>8} {'median (s)':>11} {'min (s)':>8}")
+    for mode in ("off", "on"):
+        print(f"{mode:>8} {statistics.median(makespans[mode]):>11.3f} {min(makespans[mode]):>8.3f}")
+    print(f"overhead of tracing: {(on - off) / off * 100:.1f}%")
+
+    totals = collections.defaultdict(lambda: [0, 0.0])
+    for event in tracing.chrome_trace()["traceEvents"]:
+        if event["ph"] == "X":
+            totals[event["name"]][0] += 1
+            totals[event["name"]][1] += event["dur"] / 1000
+    print(f"\n{'span':>16} {'count':>7} {'total (ms)':>11}   (last traced run)")
+    for name, (count, total) in sorted(totals.items(), key=lambda item: -item[1][1]):
+        print(f"{name:>16} {count:>7} {total:>11.1f}")
+    print(f"\n{spans} spans written to {args.output}")
@@ -0,0 +1,69 @@
+import os,sys
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.dirname(CURRENT_DIR))
+
+import argparse
+import contextlib
+import statistics
+import time
+
+import pykka
+
+from controller import Controller
+from transport import BACKENDS
+from worker import WorkerActor
+from workload import synthetic_plan, to_workflow
+
+
+# The same workflows with controller and workers in this process, talking over each transport:
+# tcp and ipc sockets with every message serialised, and direct hand-over of message objects, which
+# is what in-process actors pick by default. Operators are placed round robin so that most edges
+# cross workers, and cost nothing, so the makespan is mostly messaging.
+
+CONTROLLER = {"host": "localhost", "port": 6100, "report_port": 6101, "event_port": 6102}
+
+
+def run(backend, shape, size, rows, batch_size, workers):
+    workers_config = [{"host": "localhost", "port": 5600 + i} for i in range(workers)]
+    actors = [WorkerActor.start(worker["host"], worker["port"], CONTROLLER, cache_config={"enabled": False}, transport=backend)
+              for worker in workers_config]
+    controller = Controller.start(CONTROLLER["host"], CONTROLLER["port"], workers_config, report_port=CONTROLLER["report_port"],
+                                  event_port=CONTROLLER["event_port"], placement="round_robin", checkpoint_store="", transport=backend)
+    try:
+        plan = synthetic_plan(shape, size, rows)
+        plan["settings"] = {"dataTransferBatchSize": batch_size}
+        execution = controller.proxy().new_execution(to_workflow(plan)).get()
+        start = time.perf_counter()
+        result = controller.proxy().deploy_workflow(execution).get()
+        deploy_time = time.perf_counter() - start
+        if not result.ok():
+            raise RuntimeError(f"Deployment failed: {result}")
+        controller.proxy().start_execution(execution).get()
+        if not execution.done.wait(300):
+            raise RuntimeError("Workflow did not finish")
+        sent_bytes = sum(actor.proxy().channels.get().sent_bytes for actor in [controller] + actors)
+        return deploy_time, execution.makespan(), sent_bytes
+    finally:
+        pykka.ActorRegistry.stop_all()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the tcp, ipc and direct transports on the same workflows")
+    parser.add_argument("--workflows", nargs="+", default=["chain:16", "fanout:64", "random:200"], help="shape:operators")
+    parser.add_argument("--rows", type=int, default=5000, help="tuples every source emits")
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--workers", type=int, default=3)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    rows = []
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        for workflow in args.workflows:
+            shape, size = workflow.split(":")
+            for backend in BACKENDS:
+                runs = [run(backend, shape, int(size), args.rows, args.batch_size, args.workers) for _ in range(args.repeat)]
+                rows.append((workflow, backend, *(statistics.median(values) for values in zip(*runs))))
+
+    print(f"{'workflow':>12} {'transport':>10} {'deploy (ms)':>12} {'makespan (s)':>13} {'serialised (MB)':>16}")
+    for workflow, backend, deploy_time, makespan, sent_bytes in rows:
+        print(f"{workflow:>12} {backend:>10} {deploy_time * 1000:>12.1f} {makespan:>13.3f} {sent_bytes / 1e6:>16.2f}")
@@ -0,0 +1,166 @@
+import collections
+import hashlib
+import json
+import os
+import threading
+import time
+
+# Content-addressed cache of operator results. The key hashes the operator type, its properties and
+# the content of every input channel, so an operator whose question and upstream results are the
+# same as in an earlier run gets that run's output back without being executed again. Lookups go
+# through a small in-memory LRU first and a directory of json files second; both tiers drop entries
+# that haven't been used for longer than the TTL, the disk tier also evicts the least recently used
+# files above its size limit.
+
+
+class InputDigest:
+    """Running hash of every input channel of an operator, batches of one channel arrive in order"""
+
+    def __init__(self):
+        self.channels = {}
+
+    def update(self, channel, tuples):
+        digest = self.channels.get(channel)
+        if digest is None:
+            digest = self.channels[channel] = hashlib.sha256()
+        digest.update(json.dumps(tuples, sort_keys=True).encode())
+
+    def key(self, op_type, properties):
+        #channels are sorted, batches of different upstreams interleave differently from run to run
+        content = {
+            "type": op_type,
+            "properties": properties,
+            "inputs": sorted([list(map(str, channel)), digest.hexdigest()] for channel, digest in self.channels.items()),
+        }
+        return hashlib.sha256(json.dumps(content, sort_keys=True).encode()).hexdigest()
+
+
+class MemoryTier:
+    def __init__(self, max_entries, ttl):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        #key -> (last used, tuples), least recently used first
+        self.entries = collections.OrderedDict()
+
+    def get(self, key):
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        used_at, tuples = entry
+        now = time.time()
+        if now - used_at > self.ttl:
+            del self.entries[key]
+            return None
+        self.entries[key] = (now, tuples)
+        self.entries.move_to_end(key)
+        return tuples
+
+    def put(self, key, tuples):
+        self.entries[key] = (time.time(), tuples)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+
+class DiskTier:
+    def __init__(self, directory, max_bytes, ttl):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        os.makedirs(directory, exist_ok=True)
+        #the modification time of a file is its last use, hits touch it
+        self.size = sum(entry.stat().st_size for entry in os.scandir(directory) if entry.name.endswith(".json"))
+
+    def path(self, key):
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key):
+        path = self.path(key)
+        try:
+            stat = os.stat(path)
+            if time.time() - stat.st_mtime > self.ttl:
+                self.remove(path, stat.st_size)
+                return None
+            with open(path) as file:
+                tuples = json.load(file)
+            os.utime(path)
+        except (FileNotFoundError, ValueError):
+            return None
+        return tuples
+
+    def put(self, key, tuples):
+        path = self.path(key)
+        #write and rename, so that other worker processes on this host never read half a file
+        temporary = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temporary, "w") as file:
+            json.dump(tuples, file)
+        self.size += os.path.getsize(temporary)
+        if os.path.exists(path):
+            self.size -= os.path.getsize(path)
+        os.replace(temporary, path)
+        if self.size > self.max_bytes:
+            self.evict()
+
+    def evict(self):
+        #expired files first, then the least recently used until the tier fits its limit again
+        entries = sorted(
+            (entry.stat().st_mtime, entry.path, entry.stat().st_size)
+            for entry in os.scandir(self.directory) if entry.name.endswith(".json")
+        )
+        now = time.time()
+        self.size = sum(size for _, _, size in entries)
+        for mtime, path, size in entries:
+            if self.size <= self.max_bytes and now - mtime <= self.ttl:
+                break
+            self.remove(path, size)
+
+    def remove(self, path, size):
+        try:
+            os.remove(path)
+            self.size -= size
+        except FileNotFoundError:
+            pass
+
+
+class ResultCache:
+    """Two tier result cache shared by the executor threads of a worker"""
+
+    def __init__(self, directory, memory_entries, disk_bytes, ttl):
+        self.memory = MemoryTier(memory_entries, ttl)
+        self.disk = DiskTier(directory, disk_bytes, ttl)
+        self.lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self.lock:
+            tuples = self.memory.get(key)
+            if tuples is not None:
+                self.memory_hits += 1
+                return tuples
+            tuples = self.disk.get(key)
+            if tuples is not None:
+                self.disk_hits += 1
+                self.memory.put(key, tuples)
+                return tuples
+            self.misses += 1
+            return None
+
+    def put(self, key, tuples):
+        with self.lock:
+            self.memory.put(key, tuples)
+            self.disk.put(key, tuples)
+
+    def metrics(self):
+        with self.lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            return {
+                "lookups": lookups,
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+                "memory_entries": len(self.memory.entries),
+                "disk_bytes": self.disk.size,
+            }
@@ -0,0 +1,235 @@
+import collections
+import itertools
+import struct
+import threading
+import time
+from concurrent.futures import Future, TimeoutError
+
+import zmq
+
+import codec
+import transport
+from engine.config import TRANSPORT_CONFIG
+
+
+#replies starting with this prefix mean the peer received the message but could not handle it
+NACK_PREFIX = b"NACK "
+#messages a channel queues for a peer that doesn't take them, e.g. one that is down, sends beyond that fail
+CHANNEL_HWM = 1000
+
+
+def worker_endpoint(worker):
+    """ZMQ endpoint of a worker (or controller) config entry"""
+    return f"tcp://{worker['host']}:{worker['port']}"
+
+
+def bind_router(context, host, port):
+    """ROUTER socket serving requests sent through a ChannelPool"""
+    socket = context.socket(zmq.ROUTER)
+    socket.setsockopt(zmq.LINGER, 0)
+    socket.bind(f"tcp://{host}:{port}")
+    return socket
+
+
+def recv_request(socket):
+    """Receive one request from a ROUTER socket, returns (envelope, payload)"""
+    identity, msg_id, payload = socket.recv_multipart(copy=False)
+    return (identity.bytes, msg_id.bytes), payload.bytes
+
+
+def send_reply(socket, envelope, reply):
+    identity, msg_id = envelope
+    if isinstance(reply, str):
+        reply = reply.encode()
+    socket.send_multipart([identity, msg_id, reply])
+
+
+class ChannelPool:
+    """
+    Long-lived DEALER channels, one per peer endpoint, shared by every message an actor sends.
+
+    ZMQ sockets are not thread safe, so all of them are owned by a single io thread. Callers hand
+    messages over through an outbox and get a Future back, which is resolved when the reply
+    carrying the same message id comes back on the channel. Peers in this process get the message
+    handed over directly instead, see transport.select for how a peer is reached.
+    """
+
+    _pool_ids = itertools.count()
+
+    def __init__(self, context, backend=TRANSPORT_CONFIG["backend"]):
+        self.context = context
+        self.backend = backend
+        self._ids = itertools.count()
+        self._outbox = collections.deque()
+        self._pending = {}
+        self._channels = {}
+        self._running = True
+        #messages and payload bytes sent so far, for benchmarks
+        self.sent = 0
+        self.sent_bytes = 0
+
+        #inproc pair used to wake the io thread up when the outbox has new messages
+        wake_address = f"inproc://channel-pool-{next(ChannelPool._pool_ids)}"
+        self._wake_recv = self.context.socket(zmq.PAIR)
+        self._wake_recv.bind(wake_address)
+        self._wake_send = self.context.socket(zmq.PAIR)
+        self._wake_send.connect(wake_address)
+        self._wake_lock = threading.Lock()
+
+        self._thread = threading.Thread(target=self._io_loop, daemon=True)
+        self._thread.start()
+
+    def route(self, endpoint):
+        """Transport a message to endpoint takes, senders skip serialising for "direct" ones"""
+        return transport.select(endpoint, self.backend)[0]
+
+    def send(self, endpoint, message):
+        """
+        Send message, encoded bytes or a message object, to the peer at endpoint.
+        Returns a Future resolved with the reply bytes. Objects are only encoded if they leave the process.
+        """
+        future = Future()
+        future.msg_id = struct.pack(">Q", next(self._ids))
+        route, address = transport.select(endpoint, self.backend)
+        if route == "direct":
+            with self._wake_lock:
+                self.sent += 1
+            address.tell(future, message)
+            return future
+        payload = message if isinstance(message, bytes) else codec.encode(message)
+        self._pending[future.msg_id] = future
+        self._outbox.append((address, future.msg_id, payload))
+        with self._wake_lock:
+            self.sent += 1
+            self.sent_bytes += len(payload)
+            self._wake_send.send(b"")
+        return future
+
+    def request(self, endpoint, message, timeout=None):
+        """Send message to endpoint and block until its reply arrives"""
+        future = self.send(endpoint, message)
+        try:
+            return future.result(timeout)
+        finally:
+            self.forget(future)
+
+    def forget(self, future):
+        #late replies for a forgotten message are dropped by the io thread
+        self._pending.pop(future.msg_id, None)
+
+    def close(self):
+        if not self._running:
+            return
+        self._running = False
+        self._wake()
+        self._thread.join()
+        self._wake_send.close()
+
+    def _wake(self):
+        with self._wake_lock:
+            self._wake_send.send(b"")
+
+    def _channel(self, endpoint, poller):
+        socket = self._channels.get(endpoint)
+        if socket is None:
+            socket = self.context.socket(zmq.DEALER)
+            socket.setsockopt(zmq.LINGER, 0)
+            socket.setsockopt(zmq.SNDHWM, CHANNEL_HWM)
+            socket.connect(endpoint)
+            poller.register(socket, zmq.POLLIN)
+            self._channels[endpoint] = socket
+        return socket
+
+    def _io_loop(self):
+        poller = zmq.Poller()
+        poller.register(self._wake_recv, zmq.POLLIN)
+        while self._running:
+            events = dict(poller.poll())
+
+            if self._wake_recv in events:
+                while True:
+                    try:
+                        self._wake_recv.recv(zmq.NOBLOCK)
+                    except zmq.Again:
+                        break
+                while self._outbox:
+                    endpoint, msg_id, payload = self._outbox.popleft()
+                    #never blocks, this thread serves every channel and one unreachable peer must not stall the others
+                    try:
+                        self._channel(endpoint, poller).send_multipart([msg_id, payload], zmq.NOBLOCK)
+                    except zmq.Again:
+                        future = self._pending.pop(msg_id, None)
+                        if future is not None:
+                            future.set_exception(ConnectionError(f"{endpoint} doesn't take messages, {CHANNEL_HWM} are queued for it already"))
+                    except zmq.ZMQError as e:
+                        future = self._pending.pop(msg_id, None)
+                        if future is not None:
+                            future.set_exception(e)
+
+            for socket in self._channels.values():
+                if socket in events:
+                    msg_id, reply = socket.recv_multipart()
+                    future = self._pending.pop(msg_id, None)
+                    if future is not None and not future.done():
+                        future.set_result(reply)
+
+        for socket in self._channels.values():
+            socket.close()
+        self._wake_recv.close()
+        for future in list(self._pending.values()):
+            future.cancel()
+        self._pending.clear()
+
+
+class ScatterGatherResult:
+    """Outcome of a scatter_gather call, grouped by what each target did"""
+
+    def __init__(self):
+        self.acked = []      # (target, reply)
+        self.timed_out = []  # target
+        self.failed = []     # (target, error)
+
+    def ok(self):
+        return not self.timed_out and not self.failed
+
+    def __str__(self):
+        return (f"acked={[target['port'] for target, _ in self.acked]}, "
+                f"timed_out={[target['port'] for target in self.timed_out]}, "
+                f"failed={[(target['port'], str(error)) for target, error in self.failed]}")
+
+
+def scatter_gather(pool, targets, message, timeout):
+    """
+    Send a message to every target at once and collect their replies.
+
+    message is either what ChannelPool.send takes, bytes or a message object, or a callable building it for a target.
+    Each target gets its own deadline, taken from its "ack_timeout" entry or the given timeout,
+    so one slow or dead target can't hold up the others.
+    """
+    start = time.monotonic()
+    result = ScatterGatherResult()
+
+    futures = []
+    for target in targets:
+        try:
+            payload = message(target) if callable(message) else message
+            futures.append((target, pool.send(worker_endpoint(target), payload)))
+        except Exception as e:
+            result.failed.append((target, e))
+
+    for target, future in futures:
+        deadline = start + target.get("ack_timeout", timeout)
+        try:
+            reply = future.result(max(0.0, deadline - time.monotonic()))
+        except TimeoutError:
+            result.timed_out.append(target)
+        except Exception as e:
+            result.failed.append((target, e))
+        else:
+            if reply.startswith(NACK_PREFIX):
+                result.failed.append((target, reply[len(NACK_PREFIX):].decode()))
+            else:
+                result.acked.append((target, reply.decode()))
+        finally:
+            pool.forget(future)
+    return result
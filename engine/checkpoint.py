@@ -0,0 +1,95 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+# Durable checkpoints of operator output, so that an execution whose worker died resumes from the
+# operators that had already completed instead of starting over (see Controller.resume_execution).
+# A worker writes the output of an operator here batch by batch as the operator produces it, and
+# marks the operator completed with its last batch before it reports it completed; only operators
+# with that mark count as checkpointed. Batches are keyed by execution, operator id and their
+# sequence number, so no operator output is ever held or written whole. The store is one sqlite
+# file that every worker of a host and the controller open; sqlite serialises writers of different
+# processes, WAL keeps readers off their backs. Checkpoints are dropped once their execution completes.
+
+
+class CheckpointStore:
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.connection = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        #one connection per store object, shared by the executor threads of a worker
+        self.lock = threading.Lock()
+        with self.lock:
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute("PRAGMA synchronous=NORMAL")
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS checkpoint_batches ("
+                "execution_id TEXT NOT NULL, op_id TEXT NOT NULL, seq INTEGER NOT NULL, output TEXT NOT NULL, "
+                "PRIMARY KEY (execution_id, op_id, seq))"
+            )
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS checkpoint_completions ("
+                "execution_id TEXT NOT NULL, op_id TEXT NOT NULL, batches INTEGER NOT NULL, created_at REAL NOT NULL, "
+                "PRIMARY KEY (execution_id, op_id))"
+            )
+
+    def append(self, execution_id, op_id, seq, tuples):
+        """Write batch seq of the output of an operator that is still running"""
+        with self.lock:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO checkpoint_batches VALUES (?, ?, ?, ?)",
+                (execution_id, op_id, seq, json.dumps(tuples)),
+            )
+
+    def complete(self, execution_id, op_id, seq, tuples):
+        """Write the last batch, seq, of the output of an operator and mark it completed, both or neither"""
+        with self.lock:
+            self.connection.execute("BEGIN")
+            try:
+                if tuples:
+                    self.connection.execute(
+                        "INSERT OR REPLACE INTO checkpoint_batches VALUES (?, ?, ?, ?)",
+                        (execution_id, op_id, seq, json.dumps(tuples)),
+                    )
+                self.connection.execute(
+                    "INSERT OR REPLACE INTO checkpoint_completions VALUES (?, ?, ?, ?)",
+                    (execution_id, op_id, seq + 1 if tuples else seq, time.time()),
+                )
+            except BaseException:
+                self.connection.execute("ROLLBACK")
+                raise
+            self.connection.execute("COMMIT")
+
+    def read(self, execution_id, op_id):
+        """Yields the checkpointed output of a completed operator, one batch in memory at a time"""
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT batches FROM checkpoint_completions WHERE execution_id = ? AND op_id = ?", (execution_id, op_id)
+            ).fetchone()
+        if row is None:
+            raise KeyError(f"No checkpoint of {op_id} in execution {execution_id}")
+        for seq in range(row[0]):
+            with self.lock:
+                batch = self.connection.execute(
+                    "SELECT output FROM checkpoint_batches WHERE execution_id = ? AND op_id = ? AND seq = ?", (execution_id, op_id, seq)
+                ).fetchone()
+            if batch is None:
+                raise KeyError(f"Batch {seq} of the checkpoint of {op_id} in execution {execution_id} is missing")
+            yield from json.loads(batch[0])
+
+    def completed(self, execution_id):
+        """Ids of the operators of an execution that have a checkpoint"""
+        with self.lock:
+            rows = self.connection.execute("SELECT op_id FROM checkpoint_completions WHERE execution_id = ?", (execution_id,)).fetchall()
+        return {op_id for op_id, in rows}
+
+    def delete(self, execution_ids):
+        with self.lock:
+            for table in ("checkpoint_batches", "checkpoint_completions"):
+                self.connection.executemany(f"DELETE FROM {table} WHERE execution_id = ?", [(id,) for id in execution_ids])
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
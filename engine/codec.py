@@ -0,0 +1,194 @@
+import json
+import struct
+
+# Binary wire format for messages sent to worker sockets, used instead of pickle so that a worker
+# never runs pickle.loads on bytes it receives from the network.
+#
+# message := header field*
+# header  := MAGIC(2s) FORMAT_VERSION(B) type id(H) schema version(H)
+#
+# Fields are written in the order of the schema registered for the message class. A message class
+# is rebuilt on decode with its schema fields as keyword arguments.
+
+MAGIC = b"GC"
+FORMAT_VERSION = 1
+
+_HEADER = struct.Struct(">2sBHH")
+_U32 = struct.Struct(">I")
+_I64 = struct.Struct(">q")
+_F64 = struct.Struct(">d")
+
+# field kinds
+STR = "str"
+INT = "int"
+FLOAT = "float"
+BOOL = "bool"
+BYTES = "bytes"
+JSON = "json"            # any json serializable value, e.g. operator properties or result rows
+STR_LIST = "str_list"
+WORKER = "worker"        # {"host": str, "port": int}
+WORKER_MAP = "worker_map"  # {str: worker}
+MESSAGE_LIST = "message_list"  # list of registered messages
+
+_types_by_id = {}
+_types_by_class = {}
+
+
+def register(type_id, cls, schema, version=1):
+    """Register a message class with its wire type id and [(field name, field kind)] schema"""
+    if type_id in _types_by_id:
+        raise ValueError(f"Wire type id {type_id} is already used by {_types_by_id[type_id][0].__name__}")
+    _types_by_id[type_id] = (cls, schema, version)
+    _types_by_class[cls] = (type_id, schema, version)
+
+
+def encode(message):
+    parts = []
+    _write_message(parts, message)
+    return b"".join(parts)
+
+
+def decode(data):
+    try:
+        message, offset = _read_message(memoryview(data), 0)
+    except (struct.error, IndexError, UnicodeDecodeError) as e:
+        raise ValueError(f"Malformed wire message: {e}")
+    if offset != len(data):
+        raise ValueError(f"{len(data) - offset} trailing bytes after {type(message).__name__}")
+    return message
+
+
+def _write_message(parts, message):
+    entry = _types_by_class.get(type(message))
+    if entry is None:
+        raise TypeError(f"{type(message).__name__} is not a registered wire message")
+    type_id, schema, version = entry
+    parts.append(_HEADER.pack(MAGIC, FORMAT_VERSION, type_id, version))
+    for name, kind in schema:
+        _write_field(parts, kind, getattr(message, name))
+
+
+def _read_message(buffer, offset):
+    if len(buffer) - offset < _HEADER.size:
+        raise ValueError("Truncated message header")
+    magic, format_version, type_id, version = _HEADER.unpack_from(buffer, offset)
+    offset += _HEADER.size
+    if magic != MAGIC:
+        raise ValueError("Not a wire message")
+    if format_version != FORMAT_VERSION:
+        raise ValueError(f"Unsupported wire format version {format_version}")
+    entry = _types_by_id.get(type_id)
+    if entry is None:
+        raise ValueError(f"Unknown wire type id {type_id}")
+    cls, schema, expected_version = entry
+    if version != expected_version:
+        raise ValueError(f"Unsupported {cls.__name__} version {version}, expected {expected_version}")
+
+    fields = {}
+    for name, kind in schema:
+        fields[name], offset = _read_field(buffer, offset, kind)
+    return cls(**fields), offset
+
+
+def _write_str(parts, value):
+    data = value.encode()
+    parts.append(_U32.pack(len(data)))
+    parts.append(data)
+
+
+def _read_str(buffer, offset):
+    #decoded straight from the buffer, e.g. a shared memory segment, without copying the field out first
+    data, offset = _field_view(buffer, offset)
+    return str(data, "utf-8"), offset
+
+
+def _read_bytes(buffer, offset):
+    data, offset = _field_view(buffer, offset)
+    return bytes(data), offset
+
+
+def _field_view(buffer, offset):
+    (length,) = _U32.unpack_from(buffer, offset)
+    offset += _U32.size
+    if offset + length > len(buffer):
+        raise ValueError("Truncated field")
+    return buffer[offset:offset + length], offset + length
+
+
+def _write_field(parts, kind, value):
+    if kind == STR:
+        _write_str(parts, value)
+    elif kind == INT:
+        parts.append(_I64.pack(value))
+    elif kind == FLOAT:
+        parts.append(_F64.pack(value))
+    elif kind == BOOL:
+        parts.append(b"\x01" if value else b"\x00")
+    elif kind == BYTES:
+        parts.append(_U32.pack(len(value)))
+        parts.append(bytes(value))
+    elif kind == JSON:
+        _write_str(parts, json.dumps(value, separators=(",", ":")))
+    elif kind == STR_LIST:
+        parts.append(_U32.pack(len(value)))
+        for item in value:
+            _write_str(parts, item)
+    elif kind == WORKER:
+        _write_str(parts, value["host"])
+        parts.append(_U32.pack(value["port"]))
+    elif kind == WORKER_MAP:
+        parts.append(_U32.pack(len(value)))
+        for key, worker in value.items():
+            _write_str(parts, key)
+            _write_field(parts, WORKER, worker)
+    elif kind == MESSAGE_LIST:
+        parts.append(_U32.pack(len(value)))
+        for item in value:
+            _write_message(parts, item)
+    else:
+        raise TypeError(f"Unknown field kind {kind}")
+
+
+def _read_field(buffer, offset, kind):
+    if kind == STR:
+        return _read_str(buffer, offset)
+    elif kind == INT:
+        return _I64.unpack_from(buffer, offset)[0], offset + _I64.size
+    elif kind == FLOAT:
+        return _F64.unpack_from(buffer, offset)[0], offset + _F64.size
+    elif kind == BOOL:
+        return buffer[offset] != 0, offset + 1
+    elif kind == BYTES:
+        return _read_bytes(buffer, offset)
+    elif kind == JSON:
+        text, offset = _read_str(buffer, offset)
+        return json.loads(text), offset
+    elif kind == STR_LIST:
+        (count,) = _U32.unpack_from(buffer, offset)
+        offset += _U32.size
+        items = []
+        for _ in range(count):
+            item, offset = _read_str(buffer, offset)
+            items.append(item)
+        return items, offset
+    elif kind == WORKER:
+        host, offset = _read_str(buffer, offset)
+        (port,) = _U32.unpack_from(buffer, offset)
+        return {"host": host, "port": port}, offset + _U32.size
+    elif kind == WORKER_MAP:
+        (count,) = _U32.unpack_from(buffer, offset)
+        offset += _U32.size
+        mapping = {}
+        for _ in range(count):
+            key, offset = _read_str(buffer, offset)
+            mapping[key], offset = _read_field(buffer, offset, WORKER)
+        return mapping, offset
+    elif kind == MESSAGE_LIST:
+        (count,) = _U32.unpack_from(buffer, offset)
+        offset += _U32.size
+        items = []
+        for _ in range(count):
+            item, offset = _read_message(buffer, offset)
+            items.append(item)
+        return items, offset
+    raise TypeError(f"Unknown field kind {kind}")
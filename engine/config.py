@@ -1,14 +1,161 @@
 # config.py
+import os
+import tempfile
 
 # Controller Configuration
 CONTROLLER_CONFIG = {
     "host": "localhost",
-    "port": 6000
+    "port": 6000,
+    "report_port": 6001,  # workers report operator progress to the controller here
+    "event_port": 6002,  # the controller publishes partial operator output here, web sessions subscribe to it
+    "heartbeat_port": 6003  # workers send heartbeats here, apart from reports so that they don't wait behind them
 }
 
 # Worker Configuration
+# workers the controller knows from the start, any other worker joins by registering with the controller when it starts
 WORKERS_CONFIG = [
     {"host": "localhost", "port": 5555},
     {"host": "localhost", "port": 5556},
     {"host": "localhost", "port": 5557}
-]
\ No newline at end of file
+]
+
+# Transport Configuration
+# every peer is reached the most local way the deployment allows: direct hand-over of message objects
+# between actors of one process, ipc between processes of one host, tcp otherwise
+# backend caps that choice to "direct", "ipc" or "tcp", ipc sockets are created in ipc_directory
+TRANSPORT_CONFIG = {
+    "backend": "direct",
+    "ipc_directory": tempfile.gettempdir()
+}
+
+# Broadcast Configuration
+# seconds a worker has to acknowledge a controller message, a worker entry can override it with "ack_timeout"
+BROADCAST_CONFIG = {
+    "ack_timeout": 5.0
+}
+
+# Heartbeat Configuration
+# workers send a heartbeat to the controller every interval seconds, 0 turns them off
+# the controller declares a worker dead after timeout seconds, and at least misses of its intervals, without one and resumes its
+# executions elsewhere, 0 turns detection off; workers of the controller's own process are never declared dead while they serve
+# an execution is resumed at most max_recoveries times, it fails after that
+HEARTBEAT_CONFIG = {
+    "interval": 0.5,
+    "timeout": 2.0,
+    "misses": 3,
+    "max_recoveries": 3
+}
+
+# Statistics Configuration
+# workers report the runtime statistics of their operators to the controller every interval seconds, 0 turns periodic reports off
+# the controller publishes the statistics of an execution, aggregated over workers, at most every publish_interval seconds
+STATISTICS_CONFIG = {
+    "interval": 0.5,
+    "publish_interval": 0.5
+}
+
+# Tracing Configuration
+# record spans of deploy, send, receive, (de)serialise, queueing, waiting for inputs and execution (see tracing.py)
+# controllers and worker processes write their trace to directory when they stop, at most max_events spans are kept
+TRACING_CONFIG = {
+    "enabled": False,
+    "directory": os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "traces"),
+    "max_events": 1000000
+}
+
+# Worker Executor Configuration
+# number of operators a worker runs at the same time, the rest wait in its ready queue
+# policy orders the ready queue: "critical_path" runs the operator with the longest remaining path to a sink first, "fifo" the one ready first
+EXECUTOR_CONFIG = {
+    "slots": 4,
+    "policy": "critical_path"
+}
+
+# Placement Configuration
+# strategy is one of "round_robin", "locality" or "load_balanced" (see placement.py)
+# transfer_cost is the estimated cost of a cross-worker edge, in the same unit as operator costs
+# memory_per_slot is the memory an operator running on a worker is expected to hold, a worker that advertises
+# less than slots times that much counts as having fewer slots when placing operators, 0 ignores memory
+PLACEMENT_CONFIG = {
+    "strategy": "locality",
+    "transfer_cost": 0.1,
+    "memory_per_slot": 1024 * 1024 * 1024
+}
+
+# Parallelism Configuration
+# instances a parallelizable operator (e.g. MockMap, Chat with perRow) runs as when it has no "parallelism" property, 1 turns it off
+# partitioning splits the input among them when the operator has no "partitioning" property: "round_robin", "hash" or "range" (see parallel.py)
+PARALLELISM_CONFIG = {
+    "default": 1,
+    "partitioning": "round_robin"
+}
+
+# Streaming Configuration
+# tuples per batch sent between operators, used when the workflow settings carry no dataTransferBatchSize
+STREAMING_CONFIG = {
+    "batch_size": 400
+}
+
+# Flow Control Configuration
+# batches a producer may send over an edge before its consumer grants more credits, 0 turns flow control off
+FLOW_CONTROL_CONFIG = {
+    "credits": 4
+}
+
+# Shared Memory Configuration
+# encoded results at least this large go to workers on the same host through shared memory, 0 turns it off
+# off by default: it saves copying results through sockets, but decoding dominates and benchmark_handoff.py shows no faster
+# makespan on one host, turn it on where socket bandwidth or the memory of copies is what limits a deployment
+# they are written once for all of those workers, into a memory mapped file in spill_directory when /dev/shm lacks the room
+# a worker keeps up to pool_size segments its readers released mapped, to write later results into
+SHARED_MEMORY_CONFIG = {
+    "min_bytes": 0,
+    "spill_directory": os.path.join(tempfile.gettempdir(), "engine-spill"),
+    "pool_size": 8
+}
+
+# Partial Output Configuration
+# chunks of partial output an operator streams (Chat answers) are sent to the controller at most every interval seconds,
+# or as soon as max_chars characters are waiting
+PARTIAL_OUTPUT_CONFIG = {
+    "interval": 0.05,
+    "max_chars": 4096
+}
+
+# Result Cache Configuration
+# results of cacheable operators (Chat) are reused when type, properties and inputs match an earlier run
+# entries unused for ttl seconds expire, the disk tier keeps at most disk_bytes in directory
+CACHE_CONFIG = {
+    "enabled": True,
+    "memory_entries": 1024,
+    "directory": os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "results"),
+    "disk_bytes": 256 * 1024 * 1024,
+    "ttl": 7 * 24 * 3600
+}
+
+# Result Store Configuration
+# results of operators in opsToReuseResult or opsToViewResult are stored here for later executions to reuse
+# every worker reads and writes it, so workers on other hosts need it on a shared file system
+RESULT_STORE_CONFIG = {
+    "directory": os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "stored_results")
+}
+
+# Checkpoint Configuration
+# workers checkpoint the output of every operator batch by batch in this sqlite file, so that a failed execution resumes
+# from its completed operators; the controller reads it too, and as it is in WAL mode, which doesn't work over network file
+# systems, every process using it must run on one host, turn checkpointing off for workers on other hosts
+CHECKPOINT_CONFIG = {
+    "enabled": True,
+    "path": os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "checkpoints.sqlite")
+}
+
+# LLM Configuration
+# Chat prompts submitted within window seconds of each other go to the backend as one call of at most max_batch prompts
+# max_in_flight batched calls may be outstanding at the same time, backend_options are passed to the backend class (see llm.py)
+LLM_CONFIG = {
+    "backend": "mock",
+    "backend_options": {},
+    "window": 0.01,
+    "max_batch": 16,
+    "max_in_flight": 8
+}
@@ -1,86 +1,671 @@
 import pykka
 import zmq
 import threading
+import os
+import collections
 import pickle
+import json
+import uuid
 from messages import *
+import codec
+import tracing
+from channels import ChannelPool, NACK_PREFIX, bind_router, recv_request, send_reply, scatter_gather, worker_endpoint
+from transport import Server, is_served_here
+from placement import critical_path_ranks, get_strategy, placement_metrics, spread_instances
+from incremental import IncrementalPlan
+from parallel import parallelize
+from result_store import ResultStore
+from checkpoint import CheckpointStore
+from operator_statistics import COMPLETED, aggregate
 import time
 from model.texera.TexeraWorkflow import TexeraWorkflow
 
-from engine.config import CONTROLLER_CONFIG, WORKERS_CONFIG
+from engine.config import CONTROLLER_CONFIG, WORKERS_CONFIG, BROADCAST_CONFIG, PLACEMENT_CONFIG, STREAMING_CONFIG, FLOW_CONTROL_CONFIG, RESULT_STORE_CONFIG, CHECKPOINT_CONFIG, HEARTBEAT_CONFIG, STATISTICS_CONFIG, TRACING_CONFIG, TRANSPORT_CONFIG, PARALLELISM_CONFIG
+
+#completed executions the controller keeps around, so that they can still be looked up
+COMPLETED_EXECUTIONS_KEPT = 256
+#trace lane of the controller
+LANE = "Controller"
+
+
+class Execution():
+    """One run of a workflow, the controller tracks any number of them at once"""
+    def __init__(self, workflow, plan, instances=None):
+        self.execution_id = uuid.uuid4().hex
+        self.workflow = workflow
+        #what actually runs, dirty operators, their downstream closure and the reused results they consume
+        self.plan = plan
+        #operator id -> ids of its instances, for the operators of plan that run in parallel
+        self.instances = instances or {}
+        #operators that haven't reported completion yet
+        self.remaining_operators = {operator.GetId() for operator in plan.workflow.GetOperators()}
+        self.operator_types = {operator.GetId(): operator.GetType() for operator in plan.workflow.GetOperators()}
+        #workers the execution is deployed on, and operator id -> worker hosting it
+        self.workers = []
+        self.placement = {}
+        #ids of every attempt of this execution, the failed ones first, their checkpoints go once it completes
+        self.attempts = [self.execution_id]
+        #the attempt that took over after this one failed
+        self.resumed_as = None
+        #worker failures this execution recovered from, with their detection and recovery times
+        self.recoveries = []
+        #operator id -> texts of the partial output chunks it streamed so far, in order
+        self.partial_output = {}
+        #operator id -> worker endpoint -> latest runtime statistics of the operator on that worker
+        self.statistics = {}
+        self.statistics_changed = False
+        self.statistics_published_at = 0.0
+        self.done = threading.Event()
+        self.started_at = None
+        self.finished_at = None
+        #why the controller gave up on the execution, None unless it did
+        self.error = None
+
+    def makespan(self):
+        return self.finished_at - self.started_at
+
+    def get_partial_output(self):
+        """operator id -> the output streamed by that operator so far"""
+        return {op_id: "".join(texts) for op_id, texts in self.partial_output.items()}
+
+    def aggregated_statistics(self):
+        """operator id -> OperatorAggregatedMetrics of the operator over every worker running it"""
+        snapshots = {op_id: list(workers.values()) for op_id, workers in self.statistics.items()}
+        #a parallel operator is the sum of its instances, the merge behind them is internal
+        for op_id, instance_ids in self.instances.items():
+            snapshots[op_id] = [snapshot for instance_id in instance_ids for snapshot in snapshots.pop(instance_id, [])]
+        return {op_id: aggregate(workers) for op_id, workers in snapshots.items() if workers}
 
 
 class Controller(pykka.ThreadingActor):
-    def __init__(self, host, port, workers_config):
+    def __init__(self, host, port, workers_config, ack_timeout=BROADCAST_CONFIG["ack_timeout"], report_port=CONTROLLER_CONFIG["report_port"],
+                 placement=PLACEMENT_CONFIG["strategy"], credits=FLOW_CONTROL_CONFIG["credits"],
+                 result_store=RESULT_STORE_CONFIG["directory"], event_port=CONTROLLER_CONFIG["event_port"],
+                 checkpoint_store=CHECKPOINT_CONFIG["path"] if CHECKPOINT_CONFIG["enabled"] else "",
+                 heartbeat_timeout=HEARTBEAT_CONFIG["timeout"], statistics_interval=STATISTICS_CONFIG["publish_interval"],
+                 transport=TRANSPORT_CONFIG["backend"], parallelism=PARALLELISM_CONFIG["default"],
+                 heartbeat_port=CONTROLLER_CONFIG["heartbeat_port"], heartbeat_misses=HEARTBEAT_CONFIG["misses"],
+                 max_recoveries=HEARTBEAT_CONFIG["max_recoveries"]):
         super().__init__()
         self.host = host
         self.port = port
-        self.workers_config = workers_config
+        self.report_port = report_port
+        self.ack_timeout = ack_timeout
+        self.placement_strategy = get_strategy(placement)
+        self.credits = credits
+        #instances a parallelizable operator without a parallelism property runs as
+        self.parallelism = parallelism
+        self.result_store = ResultStore(result_store)
+        #where workers checkpoint completed operators, empty if they don't
+        self.checkpoint_path = checkpoint_store
+        self.checkpoints = CheckpointStore(checkpoint_store) if checkpoint_store else None
         self.context = zmq.Context()
 
-        # REP socket to receive messages (Controller as Server)
-        self.server_socket = self.context.socket(zmq.REP)
-        self.server_socket.bind(f"tcp://{self.host}:{self.port}")
+        # ROUTER socket to receive messages (Controller as Server), REQ clients are answered out of order
+        self.server_socket = bind_router(self.context, self.host, self.port)
+        #replies of submissions handled on their own threads, sent by the listener which owns the socket
+        self.replies = collections.deque()
+        self.reply_wake_recv = self.context.socket(zmq.PAIR)
+        self.reply_wake_recv.bind(f"inproc://controller-replies-{self.port}")
+        self.reply_wake_send = self.context.socket(zmq.PAIR)
+        self.reply_wake_send.connect(f"inproc://controller-replies-{self.port}")
+        self.reply_lock = threading.Lock()
+
+        # progress reports from workers, in-process workers hand them over directly
+        self.report_server = Server(self.context, self.host, self.report_port)
+        # heartbeats from workers, served by a thread of their own so that a busy report listener doesn't hold them up
+        self.heartbeat_server = Server(self.context, self.host, heartbeat_port)
+
+        # PUB socket publishing partial output and completions, the topic of an event is its execution id
+        self.event_port = event_port
+        self.event_socket = self.context.socket(zmq.PUB)
+        self.event_socket.setsockopt(zmq.LINGER, 0)
+        self.event_socket.bind(f"tcp://{self.host}:{self.event_port}")
+        self.event_lock = threading.Lock()
+
+        # long-lived channels to every worker, reused across assignments and execution starts
+        self.channels = ChannelPool(self.context, transport)
+
+        #membership registry, worker endpoint -> {"host", "port", "slots", "memory"} of every worker placement may use
+        #workers_config lists workers known up front, any other worker joins by registering and leaves by deregistering
+        self.members = {worker_endpoint(worker): dict(worker) for worker in workers_config}
+        #worker endpoint -> when its last heartbeat arrived, workers get a full timeout from the controller's start or their registration
+        #dead workers (endpoint -> when they were declared dead) get no new operators until they send heartbeats again
+        self.heartbeat_timeout = heartbeat_timeout
+        #a worker is only declared dead once it missed this many of its heartbeats, however short the timeout
+        self.heartbeat_misses = heartbeat_misses
+        #resumptions of an execution after worker failures, it fails after that many
+        self.max_recoveries = max_recoveries
+        self.statistics_interval = statistics_interval
+        self.last_heartbeat = {endpoint: time.monotonic() for endpoint in self.members}
+        self.dead_workers = {}
+        self.liveness_lock = threading.Lock()
+        self.stopped = threading.Event()
+
+        #execution id is key, executions move to completed_executions once every operator reported completion
+        self.executions = {}
+        self.completed_executions = collections.OrderedDict()
+        self.executions_lock = threading.Lock()
+        #operator type -> [seconds of data processing, completed operators] over all executions, guarded by executions_lock
+        #ready operators are ranked by the longest path to a sink, weighted with these costs (see estimate_costs)
+        self.type_costs = {}
 
     def on_start(self):
-        threading.Thread(target=self.listen_for_requests, daemon=True).start()
+        self.running = True
+        self.listener = threading.Thread(target=self.listen_for_requests, daemon=True)
+        self.listener.start()
+        self.report_listener = threading.Thread(target=self.listen_for_reports, daemon=True)
+        self.report_listener.start()
+        self.heartbeat_listener = threading.Thread(target=self.listen_for_heartbeats, daemon=True)
+        self.heartbeat_listener.start()
+        self.failure_detector = threading.Thread(target=self.detect_failures, daemon=True)
+        if self.heartbeat_timeout:
+            self.failure_detector.start()
 
     def listen_for_requests(self):
-        while True:
-            message = self.server_socket.recv()
-            deserialized_msg = pickle.loads(message)
+        poller = zmq.Poller()
+        poller.register(self.server_socket, zmq.POLLIN)
+        poller.register(self.reply_wake_recv, zmq.POLLIN)
+        while self.running:
+            #poll so that the loop notices shutdown, the sockets are only touched by this thread
+            events = dict(poller.poll(100))
+            if self.reply_wake_recv in events:
+                self.reply_wake_recv.recv()
+            while self.replies:
+                envelope, reply = self.replies.popleft()
+                send_reply(self.server_socket, envelope, reply)
+            if self.server_socket not in events:
+                continue
+
+            envelope, message = recv_request(self.server_socket)
+            with tracing.span("deserialise", LANE, bytes=len(message)):
+                deserialized_msg = pickle.loads(message)
             if isinstance(deserialized_msg, TexeraWorkflow):
                 workflow = deserialized_msg
                 print(f"Controller received workflow with WID {workflow.wid}")
-
-                #Assign operators to nodes
-                operators = workflow.GetOperators()
-                for assignment in self.assign_tasks_to_workers(operators, workflow):
-                    message = pickle.dumps(assignment)
-                    self.broadcast_to_workers(message)
-
-                #Workers should start execution
-                start = WorkerExecutionStart()
-                message = pickle.dumps(start)
-                self.broadcast_to_workers(message)
-
-                self.server_socket.send_string(f"Execution starts")
+                #deploy on a thread of its own, so that the next submission doesn't wait for this one
+                threading.Thread(target=self.submit_workflow, args=(workflow, envelope), daemon=True).start()
 
             elif isinstance(deserialized_msg, ControllerTermination):
                 #shut down controller
-                self.server_socket.send_string("Controller stopping")
+                send_reply(self.server_socket, envelope, "Controller stopping")
                 self.on_stop()
                 break
             else:
-                self.server_socket.send_string(f"Controller couldn't recognize message {deserialized_msg}")
+                send_reply(self.server_socket, envelope, f"Controller couldn't recognize message {deserialized_msg}")
 
-    def broadcast_to_workers(self, message):
-        responses = []
-        for worker in self.workers_config:
+    def submit_workflow(self, workflow, envelope):
+        #the client waits for a reply whatever happens, and a failed execution must not stay behind on any worker
+        execution = None
+        try:
+            execution = self.new_execution(workflow)
+            result = self.deploy_workflow(execution)
+            if not result.ok():
+                self.abandon_execution(execution)
+                self.reply(envelope, f"Deployment of execution {execution.execution_id} failed: {result}")
+                return
+
+            result = self.start_execution(execution)
+            if result.ok():
+                self.reply(envelope, f"Execution {execution.execution_id} starts")
+            else:
+                self.abandon_execution(execution)
+                self.reply(envelope, f"Execution {execution.execution_id} start failed: {result}")
+        except Exception as e:
+            print(f"Controller failed to submit workflow {workflow.wid}: {e}")
+            if execution is not None:
+                self.abandon_execution(execution)
+            self.reply(envelope, f"Submission of workflow {workflow.wid} failed: {e}")
+
+    def reply(self, envelope, reply):
+        self.replies.append((envelope, reply))
+        with self.reply_lock:
+            self.reply_wake_send.send(b"")
+
+    def listen_for_reports(self):
+        while self.running:
+            self.publish_due_statistics()
+            if not self.report_server.poll(100):
+                continue
+            envelope, report = self.report_server.recv()
             try:
-                socket = self.context.socket(zmq.REQ)
-                socket.connect(f"tcp://{worker['host']}:{worker['port']}")
-                socket.send(message)
+                if isinstance(report, bytes):
+                    with tracing.span("deserialise", LANE, bytes=len(report)):
+                        report = codec.decode(report)
+                if not isinstance(report, (OperatorCompleted, OperatorFailed, OperatorStatisticsReport, OperatorOutputChunk, WorkerRegistration, WorkerDeregistration)):
+                    raise ValueError(f"Controller couldn't recognize report {report}")
+            except Exception as e:
+                self.report_server.reply(envelope, NACK_PREFIX + str(e).encode())
+                continue
+            self.report_server.reply(envelope, "Controller received report")
+            if isinstance(report, OperatorOutputChunk):
+                self.read_chunk(report)
+                continue
+            if isinstance(report, WorkerRegistration):
+                self.register_worker(report)
+                continue
+            if isinstance(report, WorkerDeregistration):
+                self.deregister_worker(report)
+                continue
+            if isinstance(report, OperatorStatisticsReport):
+                self.read_statistics(report.execution_id, report.host, report.port, report.statistics)
+                continue
+            if isinstance(report, OperatorFailed):
+                with self.executions_lock:
+                    execution = self.executions.get(report.execution_id)
+                if execution is not None:
+                    self.fail_execution(execution, f"{report.op_id} failed on Worker {report.port}: {report.error}")
+                continue
 
-                response = socket.recv_string()
-                print(f"Controller received from Worker {worker['port']}: {response}")
-                responses.append(response)
+            print(f"Controller received completion of {report.op_id} from Worker {report.port}")
+            self.read_statistics(report.execution_id, report.host, report.port, {report.op_id: report.statistics})
+            with self.executions_lock:
+                execution = self.executions.get(report.execution_id)
+                if execution is None:
+                    continue
+                execution.remaining_operators.discard(report.op_id)
+            self.complete_if_done(execution)
+        self.report_server.close()
 
-                socket.close()
+    def listen_for_heartbeats(self):
+        while self.running:
+            if not self.heartbeat_server.poll(100):
+                continue
+            envelope, heartbeat = self.heartbeat_server.recv()
+            try:
+                if isinstance(heartbeat, bytes):
+                    heartbeat = codec.decode(heartbeat)
+                if not isinstance(heartbeat, Heartbeat):
+                    raise ValueError(f"Controller expected a heartbeat, got {heartbeat}")
+                #the worker registers again on this
+                if worker_endpoint({"host": heartbeat.host, "port": heartbeat.port}) not in self.members:
+                    raise ValueError(f"Worker {heartbeat.port} is not registered")
             except Exception as e:
-                print(f"Error communicating with Worker {worker['port']}: {e}")
-                responses.append(f"Failed to reach Worker {worker['port']}")
-        return responses
+                self.heartbeat_server.reply(envelope, NACK_PREFIX + str(e).encode())
+                continue
+            self.heartbeat_server.reply(envelope, "Controller received heartbeat")
+            self.read_heartbeat(heartbeat)
+        self.heartbeat_server.close()
+
+    def read_heartbeat(self, heartbeat):
+        endpoint = worker_endpoint({"host": heartbeat.host, "port": heartbeat.port})
+        with self.liveness_lock:
+            self.last_heartbeat[endpoint] = time.monotonic()
+            revived = self.dead_workers.pop(endpoint, None) is not None
+        if revived:
+            print(f"Controller receives heartbeats from Worker {heartbeat.port} again, it gets operators again")
+
+    def register_worker(self, registration):
+        worker = {"host": registration.host, "port": registration.port, "slots": registration.slots, "memory": registration.memory,
+                  "heartbeat_interval": registration.heartbeat_interval}
+        endpoint = worker_endpoint(worker)
+        with self.liveness_lock:
+            known = endpoint in self.members
+            self.members[endpoint] = worker
+            self.last_heartbeat[endpoint] = time.monotonic()
+            self.dead_workers.pop(endpoint, None)
+        if not known:
+            print(f"Controller registered Worker {registration.port} with {registration.slots} slots and {registration.memory / 2**30:.1f} GiB of memory")
+
+    def deregister_worker(self, deregistration):
+        endpoint = worker_endpoint({"host": deregistration.host, "port": deregistration.port})
+        with self.liveness_lock:
+            worker = self.members.pop(endpoint, None)
+            self.last_heartbeat.pop(endpoint, None)
+            self.dead_workers.pop(endpoint, None)
+        if worker is None:
+            return
+        print(f"Controller deregistered Worker {deregistration.port}")
+        #a worker leaving with operators still running fails their executions, like a dead one
+        if self.heartbeat_timeout:
+            now = time.monotonic()
+            self.recover_executions_of(worker, {"worker": worker["port"], "detection_time": 0.0, "declared_at": now})
+
+    def get_members(self):
+        """Registered workers, each with whether it is alive"""
+        with self.liveness_lock:
+            return [{**worker, "alive": endpoint not in self.dead_workers} for endpoint, worker in self.members.items()]
+
+    def live_workers(self):
+        with self.liveness_lock:
+            return [worker for endpoint, worker in self.members.items() if endpoint not in self.dead_workers]
+
+    def silence_allowed(self, worker):
+        #heartbeat_timeout, but never less than heartbeat_misses intervals of the worker, workers from the configuration use the default one
+        interval = worker.get("heartbeat_interval") or HEARTBEAT_CONFIG["interval"]
+        return max(self.heartbeat_timeout, self.heartbeat_misses * interval)
+
+    def detect_failures(self):
+        #a worker is dead once its last heartbeat is older than it is allowed to be
+        while not self.stopped.wait(self.heartbeat_timeout / 4):
+            now = time.monotonic()
+            with self.liveness_lock:
+                for endpoint in self.members:
+                    #a worker of this process lives as long as it serves, it only fails to answer when the process is busy
+                    if is_served_here(endpoint):
+                        self.last_heartbeat[endpoint] = now
+                failed = [
+                    (worker, now - self.last_heartbeat[endpoint]) for endpoint, worker in self.members.items()
+                    if endpoint not in self.dead_workers and now - self.last_heartbeat[endpoint] > self.silence_allowed(worker)
+                ]
+                for worker, _ in failed:
+                    self.dead_workers[worker_endpoint(worker)] = now
+            for worker, silence in failed:
+                self.handle_worker_failure(worker, silence, now)
+
+    def handle_worker_failure(self, worker, silence, declared_at):
+        print(f"Controller declared Worker {worker['port']} dead, no heartbeat for {silence:.3f}s")
+        self.recover_executions_of(worker, {"worker": worker["port"], "detection_time": silence, "declared_at": declared_at})
+
+    def recover_executions_of(self, worker, failure):
+        #every running execution with an unfinished operator on the worker is resumed on the live workers
+        endpoint = worker_endpoint(worker)
+        with self.executions_lock:
+            affected = [
+                execution for execution in self.executions.values()
+                if any(worker_endpoint(execution.placement[op_id]) == endpoint for op_id in execution.remaining_operators if op_id in execution.placement)
+            ]
+        for execution in affected:
+            #resuming waits for acks of the live workers, one thread per execution keeps the detector going
+            threading.Thread(target=self.recover_execution, args=(execution.execution_id, failure), daemon=True).start()
+
+    def recover_execution(self, execution_id, failure):
+        with self.executions_lock:
+            execution = self.executions.get(execution_id)
+        if execution is None:
+            return
+        #an execution that keeps losing workers is given up on instead of being resumed forever
+        if len(execution.attempts) > self.max_recoveries:
+            self.fail_execution(execution, f"Worker {failure['worker']} failed and the execution already ran {len(execution.attempts)} times, giving up")
+            return
+        try:
+            execution = self.resume_execution(execution_id, failure=failure)
+        except Exception as e:
+            print(f"Controller failed to recover execution {execution_id} from the failure of Worker {failure['worker']}: {e}")
+            return
+        recovery = execution.recoveries[-1]
+        print(f"Controller recovered execution {execution_id} from the failure of Worker {failure['worker']}: "
+              f"detected after {recovery['detection_time']:.3f}s, running again {recovery['recovery_time']:.3f}s later")
+
+    def read_statistics(self, execution_id, host, port, statistics):
+        worker = worker_endpoint({"host": host, "port": port})
+        with self.executions_lock:
+            execution = self.executions.get(execution_id)
+            if execution is None:
+                return
+            for op_id, snapshot in statistics.items():
+                workers = execution.statistics.setdefault(op_id, {})
+                #a periodic report taken before the completion may arrive after it
+                if workers.get(worker, {}).get("state") != COMPLETED:
+                    workers[worker] = snapshot
+                    if snapshot["state"] == COMPLETED and op_id in execution.operator_types:
+                        cost = self.type_costs.setdefault(execution.operator_types[op_id], [0.0, 0])
+                        cost[0] += snapshot["dataProcessingTime"] / 1e9
+                        cost[1] += 1
+            execution.statistics_changed = True
+
+    def estimate_costs(self, workflow):
+        """
+        Operator id -> mean seconds of data processing of its type in earlier executions, types never
+        seen get the mean over all types. None without any history, every operator costs the same then.
+        """
+        with self.executions_lock:
+            means = {op_type: total / count for op_type, (total, count) in self.type_costs.items()}
+        if not means:
+            return None
+        default = sum(means.values()) / len(means)
+        return {operator.GetId(): means.get(operator.GetType(), default) for operator in workflow.GetOperators()}
+
+    def publish_due_statistics(self):
+        #throttled, the statistics of an execution go out at most every statistics_interval seconds
+        now = time.monotonic()
+        with self.executions_lock:
+            due = [
+                execution for execution in self.executions.values()
+                if execution.statistics_changed and now - execution.statistics_published_at >= self.statistics_interval
+            ]
+        for execution in due:
+            self.publish_statistics(execution)
+
+    def publish_statistics(self, execution):
+        with self.executions_lock:
+            execution.statistics_changed = False
+            execution.statistics_published_at = time.monotonic()
+            statistics = execution.aggregated_statistics()
+        self.publish(execution, {"type": "OperatorStatisticsUpdate", "operatorStatistics": statistics})
+
+    def get_operator_statistics(self, execution_id):
+        """Runtime statistics of every operator of a running or recently completed execution, aggregated over workers"""
+        execution = self.get_execution(execution_id)
+        if execution is None:
+            return {}
+        with self.executions_lock:
+            return execution.aggregated_statistics()
+
+    def read_chunk(self, chunk):
+        #chunks of one operator come over one channel, so they arrive in order and before its completion
+        with self.executions_lock:
+            execution = self.executions.get(chunk.execution_id)
+            if execution is None:
+                return
+            execution.partial_output.setdefault(chunk.op_id, []).append(chunk.text)
+        self.publish(execution, {
+            "type": "OperatorOutputChunk",
+            "operatorId": chunk.op_id,
+            "seq": chunk.seq,
+            "chunk": chunk.text,
+            "final": chunk.final,
+        })
+
+    def publish(self, execution, event):
+        #events are published from the report listener and from submission threads
+        #under the id of the first attempt, the one the client got, so that sessions follow resumed attempts too
+        with self.event_lock:
+            self.event_socket.send_multipart([execution.attempts[0].encode(), json.dumps(event).encode()])
+
+    def complete_if_done(self, execution):
+        with self.executions_lock:
+            if execution.remaining_operators or execution.execution_id not in self.executions:
+                return
+            del self.executions[execution.execution_id]
+            self.completed_executions[execution.execution_id] = execution
+            if len(self.completed_executions) > COMPLETED_EXECUTIONS_KEPT:
+                self.completed_executions.popitem(last=False)
+        execution.finished_at = time.perf_counter()
+        print(f"Controller completed execution {execution.execution_id} in {execution.makespan():.3f}s")
+        if self.checkpoints is not None:
+            self.checkpoints.delete(execution.attempts)
+        #the final statistics go out right away, whatever the throttle says
+        self.publish_statistics(execution)
+        self.publish(execution, {"type": "ExecutionCompleted"})
+        execution.done.set()
+
+    def new_execution(self, workflow, checkpoints=None):
+        #checkpoints maps operators completed by an earlier attempt to the id of that attempt
+        plan = IncrementalPlan(workflow, self.result_store, checkpoints, self.checkpoint_path)
+        #operators with a parallelism above 1 run as instances, each on a partition of the input, and a merge of their outputs
+        plan.workflow, instances = parallelize(plan.workflow, self.parallelism)
+        execution = Execution(workflow, plan, instances)
+        if instances:
+            print(f"Controller runs {', '.join(f'{op_id} as {len(ids)} instances' for op_id, ids in instances.items())}")
+        if execution.plan.reused:
+            print(f"Controller reuses the results of {len(execution.plan.reused)} operators, "
+                  f"{len(execution.plan.run)} operators run again")
+        with self.executions_lock:
+            self.executions[execution.execution_id] = execution
+        return execution
+
+    def get_execution(self, execution_id):
+        """A running or recently completed execution, None if the controller doesn't know it (anymore)"""
+        with self.executions_lock:
+            return self.executions.get(execution_id) or self.completed_executions.get(execution_id)
+
+    def fail_execution(self, execution, error):
+        """
+        Give up on a running execution, its workers drop it and whoever waits for it learns why: its done
+        event is set with error, and an ExecutionFailed event goes to the sessions following it.
+        """
+        with self.executions_lock:
+            if self.executions.pop(execution.execution_id, None) is None:
+                return
+            self.completed_executions[execution.execution_id] = execution
+            if len(self.completed_executions) > COMPLETED_EXECUTIONS_KEPT:
+                self.completed_executions.popitem(last=False)
+        self.cancel_on_workers(execution)
+        #nothing resumes from the checkpoints of a failed execution anymore
+        if self.checkpoints is not None:
+            self.checkpoints.delete(execution.attempts)
+        execution.error = error
+        execution.finished_at = time.perf_counter()
+        print(f"Controller failed execution {execution.execution_id}: {error}")
+        self.publish(execution, {"type": "ExecutionFailed", "error": error})
+        execution.done.set()
+
+    def abandon_execution(self, execution):
+        """Forget an execution that failed to deploy or start, its workers drop what they got of it"""
+        with self.executions_lock:
+            self.executions.pop(execution.execution_id, None)
+        self.cancel_on_workers(execution)
+        if self.checkpoints is not None:
+            self.checkpoints.delete(execution.attempts)
+
+    def cancel_on_workers(self, execution):
+        #fire and forget, workers that didn't ack may be dead and never answer
+        cancel = WorkerExecutionCancel(execution_id=execution.execution_id)
+        for worker in execution.workers:
+            self.channels.send(worker_endpoint(worker), cancel).add_done_callback(self.channels.forget)
+
+    def resume_execution(self, execution_id, workers=None, failure=None):
+        """
+        Run a failed execution again on workers (the live workers by default), starting from the operators
+        it had completed. Returns the new attempt, which also sets the done event of the failed one.
+        failure describes the worker failure that made the execution fail, when it was detected by heartbeats.
+        """
+        with self.executions_lock:
+            previous = self.executions.pop(execution_id, None)
+            if previous is None:
+                raise ValueError(f"Controller has no running execution {execution_id}")
+            self.completed_executions[execution_id] = previous
+        #whatever the failed attempt left on live workers must stop
+        self.cancel_on_workers(previous)
+
+        #operators completed by earlier attempts keep their checkpoint from back then
+        checkpoints = dict(previous.plan.checkpoints)
+        if self.checkpoints is not None:
+            checkpoints.update({op_id: execution_id for op_id in self.checkpoints.completed(execution_id)})
+        execution = self.new_execution(previous.workflow, checkpoints)
+        execution.attempts = previous.attempts + [execution.execution_id]
+        execution.done = previous.done
+        #the makespan covers every attempt
+        execution.started_at = previous.started_at
+        execution.recoveries = list(previous.recoveries)
+        previous.resumed_as = execution
+        print(f"Controller resumes execution {execution_id} as {execution.execution_id}, "
+              f"{len(execution.plan.checkpoints)} operators completed before, {len(execution.plan.run)} operators run again")
+
+        try:
+            result = self.deploy_workflow(execution, workers)
+            if not result.ok():
+                raise RuntimeError(f"Deployment of execution {execution.execution_id} failed: {result}")
+        except Exception as e:
+            #the failed attempt is gone already, there is nothing left to resume from
+            self.fail_execution(execution, str(e))
+            raise
+        if failure is not None:
+            #recovery time runs from the worker being declared dead until the execution is about to run again
+            execution.recoveries.append({
+                "worker": failure["worker"],
+                "detection_time": failure["detection_time"],
+                "recovery_time": time.monotonic() - failure["declared_at"],
+            })
+        result = self.start_execution(execution)
+        if not result.ok():
+            self.fail_execution(execution, f"Execution {execution.execution_id} start failed: {result}")
+            raise RuntimeError(execution.error)
+        return execution
+
+    def deploy_workflow(self, execution, workers=None):
+        with tracing.span("deploy", LANE, execution=execution.execution_id):
+            workflow = execution.plan.workflow
+            execution.workers = list(workers if workers is not None else self.live_workers())
+            if not execution.workers:
+                #every placement strategy needs at least one worker to place on
+                raise RuntimeError(f"No live workers to deploy execution {execution.execution_id} on")
+
+            #operator costs from earlier executions, for placement as well as for the priorities below
+            costs = self.estimate_costs(workflow)
+
+            #Assign operators to nodes
+            placement = self.assign_tasks_to_workers(workflow.GetOperators(), workflow, execution.workers, costs, execution.instances)
+            execution.placement = placement
+
+            #one manifest per worker, so deployment costs one round trip per worker
+            batch_size = workflow.workflow_dict.get("settings", {}).get("dataTransferBatchSize", STREAMING_CONFIG["batch_size"])
+            #workers run their ready operators on the longest estimated path to a sink first
+            priorities = critical_path_ranks(workflow.DAG, costs)
+            manifests = DeploymentManifest.build_all(execution.execution_id, execution.workers, workflow, placement, batch_size, self.credits,
+                                                     self.result_store.directory, self.checkpoint_path, execution.plan.store, priorities)
+            #workers of this process get their manifest as it is
+            with tracing.span("serialise", LANE, execution=execution.execution_id, message="DeploymentManifest"):
+                payloads = {
+                    endpoint: manifest if self.channels.route(endpoint) == "direct" else codec.encode(manifest)
+                    for endpoint, manifest in manifests.items()
+                }
+            with tracing.span("send", LANE, execution=execution.execution_id, message="DeploymentManifest", workers=len(execution.workers)):
+                return self.broadcast_to_workers(lambda worker: payloads[worker_endpoint(worker)], execution.workers)
+
+    def start_execution(self, execution):
+        #Workers should start execution
+        start = WorkerExecutionStart(execution_id=execution.execution_id)
+        if execution.started_at is None:
+            execution.started_at = time.perf_counter()
+        with tracing.span("send", LANE, execution=execution.execution_id, message="WorkerExecutionStart", workers=len(execution.workers)):
+            result = self.broadcast_to_workers(start, execution.workers)
+        #when every result was reused there is no completion to wait for
+        self.complete_if_done(execution)
+        return result
+
+    def broadcast_to_workers(self, message, workers=None):
+        #scatter to every worker at once, each worker has its own ack deadline
+        result = scatter_gather(self.channels, workers if workers is not None else self.live_workers(), message, self.ack_timeout)
+        for worker, response in result.acked:
+            print(f"Controller received from Worker {worker['port']}: {response}")
+        for worker in result.timed_out:
+            print(f"Worker {worker['port']} did not acknowledge within its deadline")
+        for worker, error in result.failed:
+            print(f"Error communicating with Worker {worker['port']}: {error}")
+        return result
 
     def on_stop(self):
+        self.running = False
+        self.stopped.set()
+        for listener in (self.listener, self.report_listener, self.heartbeat_listener, self.failure_detector):
+            if listener.is_alive() and listener is not threading.current_thread():
+                listener.join()
+        self.channels.close()
         self.server_socket.close()
+        self.event_socket.close()
+        if self.checkpoints is not None:
+            self.checkpoints.close()
+        if tracing.is_enabled():
+            #in-process workers record into the same tracer, their spans are part of this file
+            path = os.path.join(TRACING_CONFIG["directory"], f"controller-{os.getpid()}-{self.port}.json")
+            print(f"Controller wrote {tracing.export(path)} spans to {path}")
+        self.reply_wake_recv.close()
+        self.reply_wake_send.close()
         self.context.term()
 
-    def assign_tasks_to_workers(self, operators, workflow):
-        #Round Robin
-        i = 0
-        for operator in operators:
-            yield WorkerAssignment(self.workers_config[i%3], operator, workflow)
-            i += 1
+    def assign_tasks_to_workers(self, operators, workflow, workers=None, costs=None, instances=None):
+        #returns operator id -> worker, costs are optional per-operator cost estimates
+        #instances of a parallel operator (operator id -> instance ids) go to different workers
+        workers = workers if workers is not None else self.live_workers()
+        placement = self.placement_strategy.place(workflow.DAG, workers, costs)
+        if instances:
+            spread_instances(placement, instances, workers)
+        metrics = placement_metrics(workflow.DAG, placement, costs)
+        print(f"Controller placed {len(operators)} operators with {self.placement_strategy.name}: "
+              f"{metrics['cross_worker_edges']} cross-worker edges, estimated makespan {metrics['estimated_makespan']:.2f}")
+        return placement
 
 
 
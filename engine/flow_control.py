@@ -0,0 +1,62 @@
+import math
+import time
+
+# Credit-based flow control between a producing operator and its consumers. Credits are counted in
+# batches: a producer spends one credit of an edge for every ExecutionResult it sends over that edge,
+# and the consumer grants it back once the batch has been processed. A producer out of credits
+# pauses, so at most the initial credits worth of batches are queued per edge, however slow the
+# consumer is.
+
+
+class EdgeCredits:
+    def __init__(self, credits):
+        self.credits = credits
+        self.batches_sent = 0
+        self.stalls = 0
+        self.stalled_seconds = 0.0
+        self.stalled_since = None
+
+
+class OutputCredits:
+    """Credits of every outgoing edge of one operator, keyed by (output port, target operator id)"""
+
+    def __init__(self, output_links, initial_credits):
+        #no initial credits means flow control is off
+        credits = initial_credits if initial_credits else math.inf
+        self.edges = {
+            (port, target): EdgeCredits(credits)
+            for port, targets in output_links.items() for target in targets
+        }
+
+    def try_take(self, port, targets):
+        """Take one credit on every edge from port to targets, or none if any of them is out of credits"""
+        edges = [self.edges[(port, target)] for target in targets]
+        empty = [edge for edge in edges if edge.credits <= 0]
+        if empty:
+            for edge in empty:
+                if edge.stalled_since is None:
+                    edge.stalls += 1
+                    edge.stalled_since = time.monotonic()
+            return False
+        for edge in edges:
+            edge.credits -= 1
+            edge.batches_sent += 1
+        return True
+
+    def grant(self, port, target, credits):
+        edge = self.edges[(port, target)]
+        edge.credits += credits
+        if edge.stalled_since is not None:
+            edge.stalled_seconds += time.monotonic() - edge.stalled_since
+            edge.stalled_since = None
+
+    def metrics(self):
+        return {
+            f"{port}->{target}": {
+                "credits": edge.credits if edge.credits != math.inf else "unlimited",
+                "batches_sent": edge.batches_sent,
+                "stalls": edge.stalls,
+                "stalled_seconds": round(edge.stalled_seconds, 6),
+            }
+            for (port, target), edge in self.edges.items()
+        }
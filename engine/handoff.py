@@ -0,0 +1,217 @@
+import mmap
+import os
+import re
+import threading
+import uuid
+from multiprocessing import shared_memory
+
+from engine.config import SHARED_MEMORY_CONFIG
+
+# Shared memory handoff between workers on the same host. The sender writes an encoded message once,
+# into a shared memory segment, or into a memory mapped spill file when /dev/shm lacks the room, and
+# sends every consumer on the host only its handle. Consumers decode the message straight out of
+# the mapping, without copying it out first, and acknowledge the handle once they have. The sender
+# keeps every segment in a SegmentLedger with the number of consumers it still waits for, and
+# unlinks the segment once the last of them acknowledged (or failed to). Segments of an execution
+# that is cancelled, or of a worker that stops, are unlinked whatever their count. Handles come over
+# the network, so readers only open segments named like the ones senders create, and spill files in
+# the spill directory.
+
+SHM = "shm"
+FILE = "file"
+SHM_DIRECTORY = "/dev/shm"
+#names of the segments and spill files senders create, "gc-" and 16 hex digits
+SEGMENT_NAME = re.compile(r"gc-[0-9a-f]{16}")
+
+
+def _shm_has_room(size):
+    #writing past the end of a full tmpfs kills the writer with SIGBUS instead of raising
+    try:
+        stats = os.statvfs(SHM_DIRECTORY)
+    except OSError:
+        #no /dev/shm to run out of, e.g. on macOS
+        return True
+    return stats.f_bavail * stats.f_frsize >= 2 * size
+
+
+def write_segment(payload, spill_directory=SHARED_MEMORY_CONFIG["spill_directory"]):
+    """Copy payload into a new shared memory segment, or a spill file, returns (backend, name)"""
+    if _shm_has_room(len(payload)):
+        #stays registered with the resource tracker, so the segment goes when this process dies without unlinking it
+        segment = shared_memory.SharedMemory(name=f"gc-{uuid.uuid4().hex[:16]}", create=True, size=max(len(payload), 1))
+        try:
+            segment.buf[:len(payload)] = payload
+        finally:
+            segment.close()
+        return SHM, segment.name
+    os.makedirs(spill_directory, exist_ok=True)
+    path = os.path.join(spill_directory, f"gc-{uuid.uuid4().hex[:16]}.spill")
+    with open(path, "wb") as file:
+        file.write(payload)
+    return FILE, path
+
+
+def _check_segment(backend, name, spill_directory):
+    if backend == SHM:
+        if not SEGMENT_NAME.fullmatch(name):
+            raise ValueError(f"Refusing to read shared memory segment {name!r}, not a segment of a worker")
+    elif backend == FILE:
+        #resolved first, so that neither ".." nor a symlink leads out of the spill directory
+        path = os.path.realpath(name)
+        directory, file_name = os.path.split(path)
+        stem, extension = os.path.splitext(file_name)
+        if directory != os.path.realpath(spill_directory) or extension != ".spill" or not SEGMENT_NAME.fullmatch(stem) or not os.path.isfile(path):
+            raise ValueError(f"Refusing to read spill file {name!r}, not a spill file in {spill_directory}")
+    else:
+        raise ValueError(f"Unknown shared memory backend {backend}")
+
+
+def read_segment(backend, name, size, decode, spill_directory=SHARED_MEMORY_CONFIG["spill_directory"]):
+    """decode(memoryview of the size bytes in segment name), the segment stays for its other readers"""
+    _check_segment(backend, name, spill_directory)
+    if backend == SHM:
+        #mapped without SharedMemory, which registers every attachment with the resource tracker that the
+        #processes of a launcher share, the readers of a segment would then unregister each other's;
+        #shm_open of CPython's own module behind SharedMemory, only imported once a worker reads a segment
+        import _posixshmem
+        fd = _posixshmem.shm_open("/" + name, os.O_RDONLY, mode=0o600)
+    else:
+        fd = os.open(name, os.O_RDONLY)
+    try:
+        mapping = mmap.mmap(fd, size, access=mmap.ACCESS_READ)
+    finally:
+        os.close(fd)
+    view = memoryview(mapping)[:size]
+    try:
+        return decode(view)
+    finally:
+        try:
+            view.release()
+            mapping.close()
+        except BufferError:
+            #a view is still referenced, e.g. by the traceback of a failed decode, the mapping goes with it
+            pass
+
+
+def release_segment(backend, name):
+    """Unlink a segment, its readers that still have it mapped keep their mapping"""
+    if backend == FILE:
+        try:
+            os.unlink(name)
+        except FileNotFoundError:
+            pass
+        return
+    try:
+        #attaching and unlinking also unregisters the segment from the resource tracker write_segment registered it with
+        segment = shared_memory.SharedMemory(name=name)
+    except FileNotFoundError:
+        return
+    segment.close()
+    try:
+        segment.unlink()
+    except FileNotFoundError:
+        pass
+
+
+class SegmentLedger:
+    """
+    The segments a worker wrote, each with the number of readers it still waits for. Segments the
+    last reader released stay mapped for reuse, up to pool_size of them, so that a stream of large
+    batches doesn't create, fault in and unlink a segment for every batch.
+    """
+
+    def __init__(self, spill_directory=SHARED_MEMORY_CONFIG["spill_directory"], pool_size=SHARED_MEMORY_CONFIG["pool_size"]):
+        self.spill_directory = spill_directory
+        self.pool_size = pool_size
+        self.lock = threading.Lock()
+        #(backend, name) -> [readers left, execution id, SharedMemory of this process or None for a spill file, whether it may be reused]
+        self.segments = {}
+        #released segments, smallest first
+        self.free = []
+        self.written = 0
+        self.written_bytes = 0
+        self.reused = 0
+        self.spilled = 0
+
+    def write(self, payload, readers, execution_id):
+        """Write payload once for readers readers, returns (backend, name) of its segment"""
+        with self.lock:
+            segment = next((segment for segment in self.free if segment.size >= len(payload)), None)
+            if segment is not None:
+                self.free.remove(segment)
+        reused = segment is not None
+        if segment is None and _shm_has_room(len(payload)):
+            #sized to the next power of two so that it fits later batches of about the same size, pages are only
+            #taken as they are written; registered with the resource tracker, so it goes when this process dies
+            size = 1 << max(len(payload) - 1, 0).bit_length()
+            segment = shared_memory.SharedMemory(name=f"gc-{uuid.uuid4().hex[:16]}", create=True, size=size)
+        if segment is not None:
+            segment.buf[:len(payload)] = payload
+            key = (SHM, segment.name)
+        else:
+            key = write_segment(payload, self.spill_directory)
+        with self.lock:
+            self.segments[key] = [readers, execution_id, segment, True]
+            self.written += 1
+            self.written_bytes += len(payload)
+            self.reused += reused
+            self.spilled += key[0] == FILE
+        return key
+
+    def release(self, backend, name, reusable=True):
+        """
+        One reader is done with the segment, it is reused or unlinked after the last one. A reader that
+        didn't acknowledge it, reusable=False, may still be reading, the segment is unlinked then.
+        """
+        with self.lock:
+            entry = self.segments.get((backend, name))
+            if entry is None:
+                return
+            entry[0] -= 1
+            entry[3] = entry[3] and reusable
+            if entry[0] > 0:
+                return
+            del self.segments[(backend, name)]
+            segment = entry[2]
+            if segment is not None and entry[3] and len(self.free) < self.pool_size:
+                self.free.append(segment)
+                self.free.sort(key=lambda segment: segment.size)
+                return
+        self._unlink(backend, name, segment)
+
+    def release_execution(self, execution_id):
+        #readers of a cancelled execution may still be reading, so its segments are not reused
+        with self.lock:
+            released = [(key, entry[2]) for key, entry in self.segments.items() if entry[1] == execution_id]
+            for key, _ in released:
+                del self.segments[key]
+        for (backend, name), segment in released:
+            self._unlink(backend, name, segment)
+
+    def release_all(self):
+        with self.lock:
+            released = [(key, entry[2]) for key, entry in self.segments.items()] + [((SHM, segment.name), segment) for segment in self.free]
+            self.segments, self.free = {}, []
+        for (backend, name), segment in released:
+            self._unlink(backend, name, segment)
+
+    def _unlink(self, backend, name, segment):
+        if segment is None:
+            release_segment(backend, name)
+            return
+        segment.close()
+        try:
+            segment.unlink()
+        except FileNotFoundError:
+            pass
+
+    def metrics(self):
+        with self.lock:
+            return {
+                "written": self.written,
+                "written_bytes": self.written_bytes,
+                "reused": self.reused,
+                "spilled": self.spilled,
+                "live": len(self.segments),
+                "pooled": len(self.free),
+            }
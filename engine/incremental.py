@@ -0,0 +1,94 @@
+import os,sys
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.dirname(CURRENT_DIR))
+
+import hashlib
+import json
+
+import networkx as nx
+
+from model.texera.TexeraWorkflow import TexeraWorkflow
+
+# Incremental re-execution. Every operator gets a fingerprint hashing its type, its properties and
+# the fingerprints of its upstreams, so editing an operator changes its own fingerprint and those of
+# everything downstream of it, and nothing else. An operator the plan lists in opsToReuseResult is
+# reused when the result store holds a result for its current fingerprint; everything else is
+# dirty and runs again together with its downstream closure. Reused operators that feed an operator
+# which runs are deployed as ReplayResult operators, streaming the stored result in. A resumed
+# execution plans the same way, its operators with a checkpoint of the failed attempt count as
+# reused and are replayed from the checkpoint store.
+
+REPLAY_OPERATOR = "ReplayResult"
+REPLAY_CHECKPOINT_OPERATOR = "ReplayCheckpoint"
+
+
+def fingerprints(workflow):
+    """operator id -> fingerprint, for every operator of the workflow"""
+    operators = {operator.GetId(): operator for operator in workflow.GetOperators()}
+    result = {}
+    for op_id in nx.topological_sort(workflow.DAG):
+        inputs = sorted(
+            [edge["srcPort"], edge["targetPort"], result[source]]
+            for source, _, edge in workflow.DAG.in_edges(op_id, data=True)
+        )
+        content = {"type": operators[op_id].GetType(), "properties": operators[op_id].GetProperties(), "inputs": inputs}
+        result[op_id] = hashlib.sha256(json.dumps(content, sort_keys=True, default=str).encode()).hexdigest()
+    return result
+
+
+class IncrementalPlan:
+    """What an execution of workflow runs, replays and stores, given the results already stored"""
+
+    def __init__(self, workflow, store, checkpoints=None, checkpoint_store=""):
+        plan = workflow.workflow_dict
+        self.fingerprints = fingerprints(workflow)
+        #operators that completed in an earlier attempt, operator id -> execution id of its checkpoint
+        self.checkpoints = {op_id: execution_id for op_id, execution_id in (checkpoints or {}).items() if op_id in self.fingerprints}
+        reusable = {
+            op_id for op_id in plan.get("opsToReuseResult", [])
+            if op_id in self.fingerprints and store.has(self.fingerprints[op_id])
+        } | set(self.checkpoints)
+        dirty = set(self.fingerprints) - reusable
+        #everything downstream of a dirty operator has to run again, whatever is stored for it
+        self.run = set(dirty)
+        for op_id in dirty:
+            self.run |= nx.descendants(workflow.DAG, op_id)
+        #reused operators whose result is consumed by an operator that runs
+        self.replay = {source for source, target in workflow.DAG.edges if source not in self.run and target in self.run}
+        self.reused = set(self.fingerprints) - self.run
+        #results users asked to reuse or view are stored, so that the next execution can reuse them
+        self.store = {
+            op_id: self.fingerprints[op_id]
+            for op_id in set(plan.get("opsToReuseResult", [])) | set(plan.get("opsToViewResult", []))
+            if op_id in self.run
+        }
+
+        operators = []
+        for operator in plan.get("operators", []):
+            op_id = operator["operatorID"]
+            if op_id in self.run:
+                operators.append(operator)
+            elif op_id in self.replay and op_id in self.checkpoints:
+                operators.append({
+                    "operatorID": op_id,
+                    "operatorType": REPLAY_CHECKPOINT_OPERATOR,
+                    "executionId": self.checkpoints[op_id],
+                    "checkpointStore": checkpoint_store,
+                    "inputPorts": [],
+                    "outputPorts": operator.get("outputPorts", []),
+                })
+            elif op_id in self.replay:
+                operators.append({
+                    "operatorID": op_id,
+                    "operatorType": REPLAY_OPERATOR,
+                    "fingerprint": self.fingerprints[op_id],
+                    "resultStore": store.directory,
+                    "inputPorts": [],
+                    "outputPorts": operator.get("outputPorts", []),
+                })
+        links = [link for link in plan.get("links", []) if link["toOpId"] in self.run]
+        self.workflow = TexeraWorkflow(
+            {**plan, "operators": operators, "links": links},
+            wid=workflow.wid,
+            workflow_title=workflow.workflow_title,
+        )
@@ -0,0 +1,118 @@
+import os,sys
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.dirname(CURRENT_DIR))
+
+import multiprocessing
+import threading
+import time
+
+import pykka
+
+from engine.config import CONTROLLER_CONFIG, WORKERS_CONFIG, EXECUTOR_CONFIG, SHARED_MEMORY_CONFIG, TRACING_CONFIG
+
+
+def run_worker(worker, controller_config, slots, shared_memory_threshold, output, trace, ready, stop):
+    #entry point of a worker process, imported in the child so that the parent's zmq context is never shared
+    if output is not None:
+        sys.stdout = open(output, "a", buffering=1)
+    import tracing
+    from worker import WorkerActor
+    if trace:
+        tracing.enable()
+    WorkerActor.start(worker["host"], worker["port"], controller_config, slots, shared_memory_threshold)
+    ready.set()
+    stop.wait()
+    pykka.ActorRegistry.stop_all()
+    if trace:
+        #merge with the controller's trace (tracing.merge) to see the whole execution
+        tracing.export(os.path.join(TRACING_CONFIG["directory"], f"worker-{os.getpid()}-{worker['port']}.json"))
+
+
+class WorkerSupervisor:
+    """
+    Runs every worker in an OS process of its own, so that cpu bound operators of different workers
+    don't serialise on one GIL. Workers that die are started again; the controller notices the missing
+    heartbeats and moves their operators to the live workers, a restarted worker gets operators again
+    once its heartbeats arrive.
+    """
+
+    def __init__(self, workers_config, controller_config=CONTROLLER_CONFIG, slots=EXECUTOR_CONFIG["slots"],
+                 shared_memory_threshold=SHARED_MEMORY_CONFIG["min_bytes"], restart=True, check_interval=0.5, output=None,
+                 trace=TRACING_CONFIG["enabled"]):
+        self.workers_config = workers_config
+        self.controller_config = controller_config
+        self.slots = slots
+        self.shared_memory_threshold = shared_memory_threshold
+        self.restart = restart
+        self.check_interval = check_interval
+        #file the workers print to instead of the supervisor's stdout
+        self.output = output
+        #whether worker processes record a trace, written to TRACING_CONFIG["directory"] when they stop
+        self.trace = trace
+        #spawn instead of fork, a forked child would inherit the parent's zmq sockets
+        self.mp = multiprocessing.get_context("spawn")
+        self.stop_event = self.mp.Event()
+        #worker port -> (process, ready event)
+        self.processes = {}
+        self.running = False
+
+    def start(self, timeout=30):
+        """Start every worker process and wait until all of them listen"""
+        self.running = True
+        for worker in self.workers_config:
+            self.spawn(worker)
+        self.wait_ready(timeout)
+        self.monitor = threading.Thread(target=self.watch, daemon=True)
+        self.monitor.start()
+        return self
+
+    def spawn(self, worker):
+        ready = self.mp.Event()
+        process = self.mp.Process(
+            target=run_worker,
+            args=(worker, self.controller_config, self.slots, self.shared_memory_threshold, self.output, self.trace, ready, self.stop_event),
+            name=f"worker-{worker['port']}",
+            daemon=True,
+        )
+        process.start()
+        self.processes[worker["port"]] = (process, ready)
+        print(f"Supervisor started Worker {worker['port']} in process {process.pid}")
+
+    def wait_ready(self, timeout):
+        deadline = time.monotonic() + timeout
+        for port, (process, ready) in list(self.processes.items()):
+            if not ready.wait(max(deadline - time.monotonic(), 0)):
+                raise RuntimeError(f"Worker {port} did not start within {timeout}s")
+
+    def watch(self):
+        while self.running:
+            time.sleep(self.check_interval)
+            for worker in self.workers_config:
+                process, _ = self.processes[worker["port"]]
+                if self.running and not process.is_alive():
+                    print(f"Supervisor noticed Worker {worker['port']} exited with code {process.exitcode}")
+                    if self.restart:
+                        self.spawn(worker)
+
+    def stop(self, timeout=5):
+        self.running = False
+        self.stop_event.set()
+        for process, _ in self.processes.values():
+            process.join(timeout)
+            if process.is_alive():
+                process.terminate()
+                process.join()
+
+
+# ---------------------- Main Execution Block ---------------------- #
+
+if __name__ == "__main__":
+    print(f"Starting {len(WORKERS_CONFIG)} workers in their own processes")
+    supervisor = WorkerSupervisor(WORKERS_CONFIG).start()
+
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        print("\nShutting down the workers...")
+        supervisor.stop()
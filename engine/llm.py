@@ -0,0 +1,218 @@
+import os,sys
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.dirname(CURRENT_DIR))
+
+import hashlib
+import re
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from engine.config import LLM_CONFIG
+
+# Batching broker in front of the LLM backend. Chat operators submit their prompt and get a Future
+# back; the broker collects the prompts submitted within a short window after the first one (or until
+# the batch is full) and sends them to the backend as one call, then resolves every Future with its
+# own answer. Operators that fan out from one source become ready together and end up in one call.
+# Backends stream their answers in chunks, an answer is the concatenation of its chunks and a prompt
+# submitted with on_chunk sees every chunk of its answer before its Future is resolved.
+
+
+class LLMBackend:
+    """Answers a batch of prompts in one call, answers are in prompt order"""
+    name = "backend"
+
+    def complete_batch(self, prompts):
+        raise NotImplementedError
+
+    def stream_batch(self, prompts):
+        """Yields (prompt index, chunk), backends that can't stream yield every answer as one chunk"""
+        yield from enumerate(self.complete_batch(prompts))
+
+
+#characters of the prompt a mock answer repeats
+PROMPT_PREFIX = 48
+
+
+class MockLLMBackend(LLMBackend):
+    """Offline backend, a call takes latency seconds plus per_prompt seconds for every prompt in it,
+    and at most concurrency calls are served at the same time, like a rate limited API
+    answers are streamed word by word, with chunk_delay seconds between the words of an answer
+    an answer names the start and a hash of its prompt, so that it stays short however long the prompt is"""
+    name = "mock"
+
+    def __init__(self, latency=0.0, per_prompt=0.0, concurrency=4, chunk_delay=0.0):
+        self.latency = latency
+        self.per_prompt = per_prompt
+        self.chunk_delay = chunk_delay
+        self.slots = threading.Semaphore(concurrency)
+        self.calls = 0
+
+    def complete_batch(self, prompts):
+        answers = [[] for _ in prompts]
+        for index, chunk in self.stream_batch(prompts):
+            answers[index].append(chunk)
+        return ["".join(chunks) for chunks in answers]
+
+    def stream_batch(self, prompts):
+        with self.slots:
+            self.calls += 1
+            time.sleep(self.latency + self.per_prompt * len(prompts))
+            #split before every word, the chunks of an answer add up to exactly that answer
+            words = [re.split(r"(?<=\s)(?=\S)", self.answer(prompt)) for prompt in prompts]
+            for step in range(max(map(len, words), default=0)):
+                if step and self.chunk_delay:
+                    time.sleep(self.chunk_delay)
+                for index, chunks in enumerate(words):
+                    if step < len(chunks):
+                        yield index, chunks[step]
+
+    @staticmethod
+    def answer(prompt):
+        #echoing the whole prompt would grow answers exponentially along a chain of Chat operators
+        digest = hashlib.sha256(prompt.encode()).hexdigest()[:12]
+        return f"Dummy Result for: {' '.join(prompt[:PROMPT_PREFIX].split())} [{digest}]"
+
+
+BACKENDS = {
+    "mock": MockLLMBackend,
+}
+
+
+class LLMBroker:
+    def __init__(self, backend, window=LLM_CONFIG["window"], max_batch=LLM_CONFIG["max_batch"], max_in_flight=LLM_CONFIG["max_in_flight"]):
+        self.backend = backend
+        self.window = window
+        self.max_batch = max_batch
+        #batches are sent from a pool, so that a slow call doesn't hold back the next batch
+        self.calls = ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix="llm-call")
+        #(prompt, future, on_chunk) waiting for the current batch
+        self.waiting = []
+        self.condition = threading.Condition()
+        self.running = True
+        self.requests = 0
+        self.batches = 0
+        self.thread = threading.Thread(target=self.collect, name="llm-broker", daemon=True)
+        self.thread.start()
+
+    def submit(self, prompt, on_chunk=None):
+        """Queue prompt for the next batch, returns a Future resolved with its answer
+        on_chunk is called with every chunk of the answer as the backend streams it"""
+        future = Future()
+        with self.condition:
+            self.waiting.append((prompt, future, on_chunk))
+            self.requests += 1
+            self.condition.notify()
+        return future
+
+    def collect(self):
+        while True:
+            with self.condition:
+                while self.running and not self.waiting:
+                    self.condition.wait()
+                if not self.running:
+                    break
+                #the window opens with the first prompt of a batch
+                deadline = time.monotonic() + self.window
+                while len(self.waiting) < self.max_batch:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0 or not self.condition.wait(remaining):
+                        break
+                batch, self.waiting = self.waiting[:self.max_batch], self.waiting[self.max_batch:]
+                self.batches += 1
+            self.calls.submit(self.call, batch)
+
+    def call(self, batch):
+        answers = [[] for _ in batch]
+        try:
+            for index, chunk in self.backend.stream_batch([prompt for prompt, _, _ in batch]):
+                answers[index].append(chunk)
+                on_chunk = batch[index][2]
+                if on_chunk is not None:
+                    try:
+                        on_chunk(chunk)
+                    except Exception as e:
+                        #whoever watches the stream must not cost the prompt its answer
+                        print(f"LLM broker failed to pass on a chunk: {e}")
+            if any(not chunks for chunks in answers):
+                raise RuntimeError(f"Backend {self.backend.name} left prompts of a batch of {len(batch)} unanswered")
+        except Exception as e:
+            for _, future, _ in batch:
+                future.set_exception(e)
+            return
+        for (_, future, _), chunks in zip(batch, answers):
+            future.set_result("".join(chunks))
+
+    def metrics(self):
+        with self.condition:
+            return {
+                "requests": self.requests,
+                "batches": self.batches,
+                "mean_batch_size": self.requests / self.batches if self.batches else 0.0,
+            }
+
+    def close(self):
+        with self.condition:
+            self.running = False
+            self.condition.notify()
+        self.thread.join()
+        self.calls.shutdown()
+
+
+def then(future, transform):
+    """Future resolved with transform(result of future)"""
+    result = Future()
+
+    def resolve(done):
+        try:
+            result.set_result(transform(done.result()))
+        except Exception as e:
+            result.set_exception(e)
+
+    future.add_done_callback(resolve)
+    return result
+
+
+def gather(futures):
+    """Future resolved with the results of futures in their order, or the first exception among them"""
+    result = Future()
+    remaining = [len(futures)]
+    lock = threading.Lock()
+
+    def resolve(done):
+        with lock:
+            remaining[0] -= 1
+            if result.done():
+                return
+            if done.exception() is not None:
+                result.set_exception(done.exception())
+            elif remaining[0] == 0:
+                result.set_result([future.result() for future in futures])
+
+    if not futures:
+        result.set_result([])
+    for future in futures:
+        future.add_done_callback(resolve)
+    return result
+
+
+#one broker per process, shared by every Chat operator the process runs
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    global _broker
+    with _broker_lock:
+        if _broker is None:
+            backend = BACKENDS[LLM_CONFIG["backend"]](**LLM_CONFIG["backend_options"])
+            _broker = LLMBroker(backend)
+        return _broker
+
+
+def set_broker(broker):
+    """Replace the process wide broker, returns the previous one"""
+    global _broker
+    with _broker_lock:
+        previous, _broker = _broker, broker
+        return previous
@@ -1,31 +1,305 @@
 from pydantic import BaseModel
 
+import codec
+from channels import worker_endpoint
+
 
 class WorkerExecutionStart(BaseModel):
     type: str = "WorkerExecutionStart"
+    execution_id: str
+
+class WorkerExecutionCancel(BaseModel):
+    """Drops what a worker hosts of an execution, e.g. after the controller resumed it elsewhere"""
+    type: str = "WorkerExecutionCancel"
+    execution_id: str
 
 class WorkerAssignment():
-    def __init__(self, worker, operator, workflow):
+    # bump when the wire schema below changes, workers reject assignments of another version
+    VERSION = 6
+
+    def __init__(self, worker, opID, opType, properties, upstreams, downstreams, inputLinks, outputLinks, storeResultAs="", priority=0.0,
+                 outputPartitioning=None):
         self.worker = worker
-        self.operator = operator
-        self.opID = self.operator.GetId()
-        self.workflow = workflow
-        self.upstreams = self.upstreams()
-        self.downstreams = self.downstreams()
+        self.opID = opID
+        self.opType = opType
+        self.properties = properties
+        self.upstreams = upstreams
+        self.downstreams = downstreams
+        #[source operator id, source output port, input port], one per incoming link
+        self.inputLinks = inputLinks
+        #[output port, target operator id, target input port], one per outgoing link
+        self.outputLinks = outputLinks
+        #fingerprint to store the operator's output under in the result store, empty if it isn't kept
+        self.storeResultAs = storeResultAs
+        #estimated cost of the longest path from the operator to a sink, the worker runs ready operators with higher priority first
+        self.priority = priority
+        #partition spec of every output port feeding one instance of a parallel operator (see parallel.py), the other ports get every tuple
+        self.outputPartitioning = outputPartitioning if outputPartitioning is not None else []
 
-    def upstreams(self):
-        return list(self.workflow.DAG.predecessors(self.opID))
+    @classmethod
+    def from_workflow(cls, worker, operator, workflow, storeResultAs="", priority=0.0):
+        opID = operator.GetId()
+        return cls(
+            worker=worker,
+            opID=opID,
+            opType=operator.GetType(),
+            properties=operator.GetProperties(),
+            upstreams=list(workflow.DAG.predecessors(opID)),
+            downstreams=list(workflow.DAG.successors(opID)),
+            inputLinks=[[source, edge['srcPort'], edge['targetPort']] for source, _, edge in workflow.DAG.in_edges(opID, data=True)],
+            outputLinks=[[edge['srcPort'], target, edge['targetPort']] for _, target, edge in workflow.DAG.out_edges(opID, data=True)],
+            storeResultAs=storeResultAs,
+            priority=priority,
+            outputPartitioning=workflow.workflow_dict.get("partitioning", {}).get(opID, []),
+        )
 
-    def downstreams(self):
-        return list(self.workflow.DAG.successors(self.opID))
+
+class DeploymentManifest():
+    """Everything one worker needs for an execution, delivered in a single message"""
+    VERSION = 6
+
+    def __init__(self, execution_id, worker, assignments, placement, batch_size, credits, result_store, checkpoint_store):
+        self.execution_id = execution_id
+        self.worker = worker
+        self.assignments = assignments
+        #operator id -> worker, shared by all assignments, covers every operator they send to
+        self.placement = placement
+        #number of tuples an operator sends downstream per ExecutionResult
+        self.batch_size = batch_size
+        #batches a producer may send over an edge before the consumer grants more, 0 turns flow control off
+        self.credits = credits
+        #directory of the result store assignments with storeResultAs write to
+        self.result_store = result_store
+        #sqlite file the output of every completed operator is checkpointed in, empty if checkpointing is off
+        self.checkpoint_store = checkpoint_store
+
+    @classmethod
+    def build_all(cls, execution_id, workers, workflow, placement, batch_size, credits, result_store, checkpoint_store, store_results, priorities=None):
+        """One manifest per worker endpoint, workers without operators get an empty manifest"""
+        #store_results maps the operators whose output is kept to their fingerprint, priorities operators to their priority
+        manifests = {worker_endpoint(worker): cls(execution_id, worker, [], {}, batch_size, credits, result_store, checkpoint_store)
+                     for worker in workers}
+        for operator in workflow.GetOperators():
+            worker = placement[operator.GetId()]
+            manifest = manifests[worker_endpoint(worker)]
+            assignment = WorkerAssignment.from_workflow(worker, operator, workflow, store_results.get(operator.GetId(), ""),
+                                                        priorities.get(operator.GetId(), 0.0) if priorities else 0.0)
+            manifest.assignments.append(assignment)
+            for targetOpID in assignment.downstreams:
+                manifest.placement[targetOpID] = placement[targetOpID]
+        return manifests
 
 
 class ExecutionResult():
-    def __init__(self, host, port, op_id, result):
+    """One batch of an operator's output on one of its output ports"""
+    def __init__(self, execution_id, host, port, op_id, output_port, seq, result):
+        self.execution_id = execution_id
         self.host = host
         self.port = port
         self.op_id = op_id
+        self.output_port = output_port
+        self.seq = seq
+        #list of tuples
         self.result = result
 
+class EndOfStream():
+    """Sent after the last ExecutionResult of an output port"""
+    def __init__(self, execution_id, host, port, op_id, output_port):
+        self.execution_id = execution_id
+        self.host = host
+        self.port = port
+        self.op_id = op_id
+        self.output_port = output_port
+
+class CreditGrant():
+    """Sent by a consumer to the worker of a producer, allowing op_id to send more batches to target_op_id"""
+    def __init__(self, execution_id, host, port, op_id, output_port, target_op_id, credits):
+        self.execution_id = execution_id
+        self.host = host
+        self.port = port
+        self.op_id = op_id
+        self.output_port = output_port
+        self.target_op_id = target_op_id
+        self.credits = credits
+
+class OperatorCompleted():
+    """Sent by a worker to the controller once one of its operators has finished"""
+    def __init__(self, execution_id, host, port, op_id, statistics):
+        self.execution_id = execution_id
+        self.host = host
+        self.port = port
+        self.op_id = op_id
+        #final runtime statistics of the operator on this worker (see operator_statistics.py)
+        self.statistics = statistics
+
+class OperatorFailed():
+    """Sent by a worker to the controller when one of its operators raised, the controller fails the execution"""
+    def __init__(self, execution_id, host, port, op_id, error):
+        self.execution_id = execution_id
+        self.host = host
+        self.port = port
+        self.op_id = op_id
+        self.error = error
+
+class OperatorStatisticsReport():
+    """Sent by a worker to the controller at a fixed interval, operator id -> runtime statistics of one execution"""
+    def __init__(self, execution_id, host, port, statistics):
+        self.execution_id = execution_id
+        self.host = host
+        self.port = port
+        self.statistics = statistics
+
+class OperatorOutputChunk():
+    """Sent by a worker to the controller, the next piece of the partial output an operator streams"""
+    def __init__(self, execution_id, host, port, op_id, seq, text, final):
+        self.execution_id = execution_id
+        self.host = host
+        self.port = port
+        self.op_id = op_id
+        self.seq = seq
+        #the texts of all chunks of an operator, in seq order, add up to its streamed output
+        self.text = text
+        #whether this is the last chunk of the operator
+        self.final = final
+
+class Heartbeat():
+    """Sent by every worker to the controller at a fixed interval, a worker that stops sending is declared dead"""
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+
+class WorkerRegistration():
+    """Sent by a worker to the controller when it starts, and again whenever the controller doesn't know it"""
+    def __init__(self, host, port, slots, memory, heartbeat_interval):
+        self.host = host
+        self.port = port
+        #operators the worker runs at once
+        self.slots = slots
+        #bytes of memory of the worker's machine, 0 if unknown
+        self.memory = memory
+        #seconds between the worker's heartbeats, 0 if it sends none
+        self.heartbeat_interval = heartbeat_interval
+
+class WorkerDeregistration():
+    """Sent by a worker to the controller when it shuts down"""
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+
+class SharedMemoryHandle():
+    """Stands in for an encoded message of size bytes that waits in a shared memory segment or spill file (see handoff.py)"""
+    def __init__(self, segment, size, backend="shm"):
+        self.segment = segment
+        self.size = size
+        self.backend = backend
+
 class ControllerTermination(BaseModel):
-    type:str = "ControllerTermination"
\ No newline at end of file
+    type:str = "ControllerTermination"
+
+
+# ---------------------- Wire Schemas ---------------------- #
+# messages sent to worker sockets are encoded with codec instead of pickle
+
+codec.register(1, WorkerExecutionStart, [
+    ("execution_id", codec.STR),
+], version=2)
+codec.register(2, WorkerAssignment, [
+    ("worker", codec.WORKER),
+    ("opID", codec.STR),
+    ("opType", codec.STR),
+    ("properties", codec.JSON),
+    ("upstreams", codec.STR_LIST),
+    ("downstreams", codec.STR_LIST),
+    ("inputLinks", codec.JSON),
+    ("outputLinks", codec.JSON),
+    ("storeResultAs", codec.STR),
+    ("priority", codec.FLOAT),
+    ("outputPartitioning", codec.JSON),
+], version=WorkerAssignment.VERSION)
+codec.register(3, ExecutionResult, [
+    ("execution_id", codec.STR),
+    ("host", codec.STR),
+    ("port", codec.INT),
+    ("op_id", codec.STR),
+    ("output_port", codec.INT),
+    ("seq", codec.INT),
+    ("result", codec.JSON),
+], version=3)
+codec.register(4, DeploymentManifest, [
+    ("execution_id", codec.STR),
+    ("worker", codec.WORKER),
+    ("assignments", codec.MESSAGE_LIST),
+    ("placement", codec.WORKER_MAP),
+    ("batch_size", codec.INT),
+    ("credits", codec.INT),
+    ("result_store", codec.STR),
+    ("checkpoint_store", codec.STR),
+], version=DeploymentManifest.VERSION)
+codec.register(5, OperatorCompleted, [
+    ("execution_id", codec.STR),
+    ("host", codec.STR),
+    ("port", codec.INT),
+    ("op_id", codec.STR),
+    ("statistics", codec.JSON),
+], version=3)
+codec.register(6, EndOfStream, [
+    ("execution_id", codec.STR),
+    ("host", codec.STR),
+    ("port", codec.INT),
+    ("op_id", codec.STR),
+    ("output_port", codec.INT),
+], version=2)
+codec.register(7, CreditGrant, [
+    ("execution_id", codec.STR),
+    ("host", codec.STR),
+    ("port", codec.INT),
+    ("op_id", codec.STR),
+    ("output_port", codec.INT),
+    ("target_op_id", codec.STR),
+    ("credits", codec.INT),
+], version=2)
+codec.register(8, SharedMemoryHandle, [
+    ("segment", codec.STR),
+    ("size", codec.INT),
+    ("backend", codec.STR),
+], version=2)
+codec.register(9, OperatorOutputChunk, [
+    ("execution_id", codec.STR),
+    ("host", codec.STR),
+    ("port", codec.INT),
+    ("op_id", codec.STR),
+    ("seq", codec.INT),
+    ("text", codec.STR),
+    ("final", codec.BOOL),
+])
+codec.register(10, WorkerExecutionCancel, [
+    ("execution_id", codec.STR),
+])
+codec.register(11, Heartbeat, [
+    ("host", codec.STR),
+    ("port", codec.INT),
+])
+codec.register(12, OperatorStatisticsReport, [
+    ("execution_id", codec.STR),
+    ("host", codec.STR),
+    ("port", codec.INT),
+    ("statistics", codec.JSON),
+])
+codec.register(13, WorkerRegistration, [
+    ("host", codec.STR),
+    ("port", codec.INT),
+    ("slots", codec.INT),
+    ("memory", codec.INT),
+    ("heartbeat_interval", codec.FLOAT),
+], version=2)
+codec.register(14, WorkerDeregistration, [
+    ("host", codec.STR),
+    ("port", codec.INT),
+])
+codec.register(15, OperatorFailed, [
+    ("execution_id", codec.STR),
+    ("host", codec.STR),
+    ("port", codec.INT),
+    ("op_id", codec.STR),
+    ("error", codec.STR),
+])
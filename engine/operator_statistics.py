@@ -0,0 +1,67 @@
+import time
+
+# Runtime statistics of operators, in the shape of OperatorAggregatedMetrics in web/websocket.py.
+# A worker keeps one OperatorStatistics per operator it hosts. Timers are taken once per run of the
+# operator on an executor thread, not per tuple: data processing is the time spent on input batches
+# and output, control processing the time spent on credits, completion and the stores, and idle
+# time is whatever is left of the time since the execution started. Times are in nanoseconds.
+
+READY = "Ready"
+RUNNING = "Running"
+COMPLETED = "Completed"
+
+
+class OperatorStatistics:
+    __slots__ = ("state", "input_rows", "output_rows", "data_processing_time", "control_processing_time", "started_at", "finished_at")
+
+    def __init__(self):
+        self.state = READY
+        self.input_rows = 0
+        self.output_rows = 0
+        self.data_processing_time = 0
+        self.control_processing_time = 0
+        self.started_at = None
+        self.finished_at = None
+
+    def start(self):
+        self.state = RUNNING
+        self.started_at = time.perf_counter_ns()
+
+    def finish(self):
+        self.state = COMPLETED
+        self.finished_at = time.perf_counter_ns()
+
+    def snapshot(self):
+        if self.started_at is None:
+            idle = 0
+        else:
+            elapsed = (self.finished_at or time.perf_counter_ns()) - self.started_at
+            idle = max(elapsed - self.data_processing_time - self.control_processing_time, 0)
+        return {
+            "state": self.state,
+            "inputRows": self.input_rows,
+            "outputRows": self.output_rows,
+            "dataProcessingTime": self.data_processing_time,
+            "controlProcessingTime": self.control_processing_time,
+            "idleTime": idle,
+        }
+
+
+def aggregate(snapshots):
+    """OperatorAggregatedMetrics of one operator from the snapshots of the workers running it"""
+    states = {snapshot["state"] for snapshot in snapshots}
+    if states == {COMPLETED}:
+        state = COMPLETED
+    elif RUNNING in states or COMPLETED in states:
+        state = RUNNING
+    else:
+        state = READY
+    return {
+        "operatorState": state,
+        "aggregatedInputRowCount": sum(snapshot["inputRows"] for snapshot in snapshots),
+        "aggregatedOutputRowCount": sum(snapshot["outputRows"] for snapshot in snapshots),
+        "numWorkers": len(snapshots),
+        "aggregatedDataProcessingTime": sum(snapshot["dataProcessingTime"] for snapshot in snapshots),
+        "aggregatedControlProcessingTime": sum(snapshot["controlProcessingTime"] for snapshot in snapshots),
+        "aggregatedIdleTime": sum(snapshot["idleTime"] for snapshot in snapshots),
+    }
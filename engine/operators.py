@@ -0,0 +1,193 @@
+import json
+import time
+
+from llm import gather, get_broker, then
+from result_store import ResultStore
+from checkpoint import CheckpointStore
+
+# Operator executors run the logic of one operator on a worker. Tuples are json values (rows are
+# dicts). process is called for every input batch as it arrives, so a streaming operator can emit
+# output while its upstreams are still producing; finish is called once every input port has seen
+# its end of stream. Both return (or yield) the output tuples, or a Future of them when the output
+# comes from elsewhere; the worker then frees the executor slot until the Future is resolved. A
+# cacheable executor emits its whole output from finish, which then depends on nothing but its
+# properties and inputs, so workers may serve it from the result cache instead. An executor that
+# streams partial output passes text chunks to on_chunk while it works, the worker forwards them to
+# the controller; its output tuples stay what the operator returns.
+
+
+def burn(work):
+    #cpu bound stand-in for real operator logic, holds the GIL for work iterations
+    total = 0
+    for i in range(work):
+        total += i * i
+    return total
+
+
+class OperatorExecutor:
+    cacheable = False
+    streams_output = False
+
+    @classmethod
+    def parallelizable(cls, properties):
+        #whether instances may each process a partition of the input, the default parallelism applies then (see parallel.py)
+        return False
+
+    def __init__(self, op_id, properties):
+        self.op_id = op_id
+        self.properties = properties
+        #set by the worker for executors that stream partial output
+        self.on_chunk = None
+
+    def process(self, port, tuples):
+        return []
+
+    def finish(self):
+        return []
+
+    def streamed_text(self, output):
+        """The partial output streamed while producing output, for output served from the result cache"""
+        return ""
+
+
+class ChatOperator(OperatorExecutor):
+    """
+    Blocking, the answer needs every input of the conversation, it is streamed while the LLM writes it.
+    With "perRow" every input row is a conversation of its own, answered as the row arrives.
+    """
+    cacheable = True
+    streams_output = True
+
+    @classmethod
+    def parallelizable(cls, properties):
+        return bool(properties.get("perRow"))
+
+    def __init__(self, op_id, properties):
+        super().__init__(op_id, properties)
+        self.inputs = []
+        self.per_row = bool(properties.get("perRow"))
+        if self.per_row:
+            #answers come out of process, the result cache only covers what finish returns
+            self.cacheable = False
+
+    def process(self, port, tuples):
+        if self.per_row:
+            question = self.properties.get("question") or ""
+            answers = [get_broker().submit(question + "\n\nRow:\n" + json.dumps(tuple, sort_keys=True)) for tuple in tuples]
+            return then(gather(answers), lambda answers: [{**tuple, "answer": answer} for tuple, answer in zip(tuples, answers)])
+        self.inputs.extend(tuples)
+        return []
+
+    def finish(self):
+        if self.per_row:
+            return []
+        #answered through the LLM broker, which batches the prompts of operators finishing together
+        prompt = self.properties.get("question") or ""
+        if self.inputs:
+            prompt += "\n\nContext:\n" + "\n".join(json.dumps(tuple, sort_keys=True) for tuple in self.inputs)
+        return then(get_broker().submit(prompt, self.on_chunk), lambda answer: [{"answer": answer}])
+
+    def streamed_text(self, output):
+        return "".join(tuple["answer"] for tuple in output)
+
+
+class MockSourceOperator(OperatorExecutor):
+    """Produces "rows" tuples, spending "tupleCost" seconds and "tupleWork" cpu iterations on each
+    tuples carry a "payload" of "rowBytes" characters if that is set"""
+    def finish(self):
+        cost = self.properties.get("tupleCost", 0)
+        work = self.properties.get("tupleWork", 0)
+        payload = "x" * self.properties.get("rowBytes", 0)
+        for i in range(self.properties.get("rows", 0)):
+            if cost:
+                time.sleep(cost)
+            if work:
+                burn(work)
+            yield {"id": i, "payload": payload} if payload else {"id": i}
+
+
+class MockMapOperator(OperatorExecutor):
+    """Streams its input through, spending "tupleCost" seconds and "tupleWork" cpu iterations on each tuple"""
+    @classmethod
+    def parallelizable(cls, properties):
+        return True
+
+    def process(self, port, tuples):
+        cost = self.properties.get("tupleCost", 0)
+        work = self.properties.get("tupleWork", 0)
+        for tuple in tuples:
+            if cost:
+                time.sleep(cost)
+            if work:
+                burn(work)
+            yield tuple
+
+
+class MockReduceOperator(OperatorExecutor):
+    """Blocking, spends "tupleCost" seconds and "tupleWork" cpu iterations on every input tuple and emits "rows" tuples at the end"""
+    def process(self, port, tuples):
+        cost = self.properties.get("tupleCost", 0)
+        work = self.properties.get("tupleWork", 0)
+        for tuple in tuples:
+            if cost:
+                time.sleep(cost)
+            if work:
+                burn(work)
+        return []
+
+    def finish(self):
+        for i in range(self.properties.get("rows", 0)):
+            yield {"id": i}
+
+
+class MergeOperator(OperatorExecutor):
+    """
+    Output of the parallel instances of an operator, instance i on input port i (see parallel.py).
+    Streams it through, or with "ordered" in instance order: instance 0 as it arrives, the others at the end.
+    """
+    def __init__(self, op_id, properties):
+        super().__init__(op_id, properties)
+        self.buffered = {}
+
+    def process(self, port, tuples):
+        if not self.properties.get("ordered") or port == 0:
+            return tuples
+        self.buffered.setdefault(port, []).extend(tuples)
+        return []
+
+    def finish(self):
+        for port in sorted(self.buffered):
+            yield from self.buffered[port]
+
+
+class ReplayResultOperator(OperatorExecutor):
+    """Streams the stored result of a reused operator, "fingerprint" in the "resultStore" directory"""
+    def finish(self):
+        return ResultStore(self.properties["resultStore"]).get(self.properties["fingerprint"])
+
+
+class ReplayCheckpointOperator(OperatorExecutor):
+    """Streams the checkpointed output of an operator that completed in execution "executionId" before it failed"""
+    def finish(self):
+        store = CheckpointStore(self.properties["checkpointStore"])
+        try:
+            yield from store.read(self.properties["executionId"], self.op_id)
+        finally:
+            store.close()
+
+
+EXECUTORS = {
+    "Chat": ChatOperator,
+    "MockSource": MockSourceOperator,
+    "MockMap": MockMapOperator,
+    "MockReduce": MockReduceOperator,
+    "Merge": MergeOperator,
+    "ReplayResult": ReplayResultOperator,
+    "ReplayCheckpoint": ReplayCheckpointOperator,
+}
+
+
+def create_executor(op_type, op_id, properties):
+    if op_type not in EXECUTORS:
+        raise ValueError(f"No executor for operator type {op_type}")
+    return EXECUTORS[op_type](op_id, properties)
@@ -0,0 +1,198 @@
+import os,sys
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.dirname(CURRENT_DIR))
+
+import bisect
+import itertools
+import json
+import zlib
+
+from model.texera.TexeraWorkflow import TexeraWorkflow
+from operators import EXECUTORS
+from engine.config import PARALLELISM_CONFIG
+
+# Data-parallel operators. An operator X with a parallelism of N > 1 runs as N instances
+# "X-instance-i" of the same type and properties, each on a partition of X's input, followed by a
+# Merge operator that takes over X's id, so its downstreams, stored results and checkpoints stay
+# those of X. Every producer feeding X gets one extra output port per instance, and sends each of
+# its output tuples to the port of one instance only:
+#   round_robin  tuple after tuple to the next instance
+#   hash         by the hash of "partitionAttribute", equal values meet in one instance
+#   range        by "partitionBoundaries" on "partitionAttribute", one instance per range
+# The parallelism comes from the "parallelism" property, or else from the cluster default for
+# executors that are parallelizable (see operators.py). Range partitioning has one instance more
+# than it has boundaries. Merge streams the instance outputs through as they arrive, except after
+# range partitioning, where it emits them in instance order, i.e. in the order of the ranges.
+# Range boundaries are either all numbers or all strings, partition keys are compared as the same
+# kind: numeric ranges take numbers and numeric strings, keys that are neither go to the first
+# instance like missing ones; string ranges compare the text of any key.
+
+PARTITIONINGS = ("round_robin", "hash", "range")
+MERGE_OPERATOR = "Merge"
+
+
+def instance_id(op_id, index):
+    return f"{op_id}-instance-{index}"
+
+
+def _boundary_kind(operator, boundaries):
+    if all(isinstance(value, (int, float)) and not isinstance(value, bool) for value in boundaries):
+        return "number"
+    if all(isinstance(value, str) for value in boundaries):
+        return "string"
+    raise ValueError(f"partitionBoundaries of operator {operator.GetId()} must be all numbers or all strings, got {boundaries}")
+
+
+def _range_key(value, kind):
+    #the key of a tuple as the kind of its boundaries, None if it has none
+    if value is None:
+        return None
+    if kind == "string":
+        return value if isinstance(value, str) else json.dumps(value, sort_keys=True, default=str)
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return value
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def parallelism_of(operator, default):
+    properties = operator.GetProperties()
+    if properties.get("parallelism") is not None:
+        return max(1, int(properties["parallelism"]))
+    executor = EXECUTORS.get(operator.GetType())
+    return default if executor is not None and executor.parallelizable(properties) else 1
+
+
+def partitioning_of(operator, instances, default):
+    """The partition spec of operator's input, and the number of instances it runs as"""
+    properties = operator.GetProperties()
+    strategy = properties.get("partitioning") or default
+    if strategy not in PARTITIONINGS:
+        raise ValueError(f"Unknown partitioning {strategy} of operator {operator.GetId()}, expected one of {list(PARTITIONINGS)}")
+    spec = {"strategy": strategy, "attribute": properties.get("partitionAttribute"), "boundaries": []}
+    if strategy != "round_robin" and not spec["attribute"]:
+        raise ValueError(f"Operator {operator.GetId()} is partitioned by {strategy} but has no partitionAttribute")
+    if strategy == "range":
+        boundaries = properties.get("partitionBoundaries") or []
+        if not boundaries:
+            raise ValueError(f"Operator {operator.GetId()} is partitioned by range but has no partitionBoundaries")
+        spec["kind"] = _boundary_kind(operator, boundaries)
+        spec["boundaries"] = sorted(boundaries)
+        instances = len(spec["boundaries"]) + 1
+    return spec, instances
+
+
+def parallelize(workflow, default=PARALLELISM_CONFIG["default"], partitioning=PARALLELISM_CONFIG["partitioning"]):
+    """
+    The workflow with every operator of a parallelism above 1 replaced by its instances and a Merge,
+    and logical operator id -> instance ids. The workflow itself is returned when nothing runs in parallel.
+    """
+    plan = workflow.workflow_dict
+    groups = {}
+    for operator in workflow.GetOperators():
+        if not workflow.DAG.in_degree(operator.GetId()):
+            #a source has no input to partition
+            continue
+        instances = parallelism_of(operator, default)
+        if instances > 1 or operator.GetProperties().get("partitionBoundaries"):
+            spec, instances = partitioning_of(operator, instances, partitioning)
+            if instances > 1:
+                groups[operator.GetId()] = (instances, spec)
+    if not groups:
+        return workflow, {}
+
+    operators = []
+    for operator in plan.get("operators", []):
+        op_id = operator["operatorID"]
+        if op_id not in groups:
+            operators.append(operator)
+            continue
+        instances, spec = groups[op_id]
+        operators.extend({**operator, "operatorID": instance_id(op_id, i), "viewResult": False} for i in range(instances))
+        operators.append({
+            "operatorID": op_id,
+            "operatorType": MERGE_OPERATOR,
+            "ordered": spec["strategy"] == "range",
+            "inputPorts": [{"portID": f"input-{i}"} for i in range(instances)],
+            "outputPorts": operator.get("outputPorts", []),
+            "viewResult": operator.get("viewResult", False),
+        })
+
+    #output ports of a producer are numbered on from the ones it has
+    next_port = {}
+    for link in plan.get("links", []):
+        port = link["fromPortId"]["id"]
+        if isinstance(port, int):
+            next_port[link["fromOpId"]] = max(next_port.get(link["fromOpId"], 0), port + 1)
+
+    links = []
+    #producer id -> [partition spec of one of its output ports]
+    partitioning = {}
+    for link in plan.get("links", []):
+        target = link["toOpId"]
+        if target not in groups:
+            links.append(link)
+            continue
+        instances, spec = groups[target]
+        source = link["fromOpId"]
+        for i in range(instances):
+            port = next_port.get(source, 0)
+            next_port[source] = port + 1
+            links.append({**link, "fromPortId": {**link["fromPortId"], "id": port}, "toOpId": instance_id(target, i)})
+            partitioning.setdefault(source, []).append({**spec, "port": port, "group": target, "instance": i, "instances": instances})
+    for op_id, (instances, _) in groups.items():
+        for i in range(instances):
+            links.append({
+                "fromOpId": instance_id(op_id, i),
+                "fromPortId": {"id": 0, "internal": False},
+                "toOpId": op_id,
+                "toPortId": {"id": i, "internal": False},
+            })
+
+    parallel = TexeraWorkflow(
+        {**plan, "operators": operators, "links": links, "partitioning": partitioning},
+        wid=workflow.wid,
+        workflow_title=workflow.workflow_title,
+    )
+    return parallel, {op_id: [instance_id(op_id, i) for i in range(instances)] for op_id, (instances, _) in groups.items()}
+
+
+def _partitioner(spec):
+    #output tuple -> index of the instance it goes to
+    count = spec["instances"]
+    if spec["strategy"] == "round_robin":
+        turns = itertools.cycle(range(count))
+        return lambda tuple: next(turns)
+    attribute = spec["attribute"]
+    if spec["strategy"] == "hash":
+        #stable across processes, every producer of a group has to agree on the instance of a value
+        return lambda tuple: zlib.crc32(json.dumps(tuple.get(attribute), sort_keys=True, default=str).encode()) % count
+    boundaries = spec["boundaries"]
+    kind = spec.get("kind", "number")
+
+    def by_range(tuple):
+        key = _range_key(tuple.get(attribute), kind)
+        return 0 if key is None else bisect.bisect_right(boundaries, key)
+    return by_range
+
+
+class OutputPartitioning:
+    """The output ports of a producer an output tuple goes to, given the partition specs of its ports"""
+
+    def __init__(self, output_ports, specs):
+        partitioned = {spec["port"] for spec in specs}
+        #ports of consumers that get every tuple
+        self.broadcast = [port for port in output_ports if port not in partitioned]
+        self.groups = {}
+        for spec in specs:
+            if spec["group"] not in self.groups:
+                self.groups[spec["group"]] = (_partitioner(spec), {})
+            self.groups[spec["group"]][1][spec["instance"]] = spec["port"]
+
+    def route(self, tuple):
+        ports = list(self.broadcast)
+        for partitioner, ports_by_instance in self.groups.values():
+            ports.append(ports_by_instance[partitioner(tuple)])
+        return ports
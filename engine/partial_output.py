@@ -0,0 +1,53 @@
+import threading
+import time
+
+# Partial output an operator streams while it works, e.g. the answer of a Chat operator as the LLM
+# writes it. Chunks arrive one word at a time, sending each on its own would flood the controller
+# and the browser, so they are coalesced: whatever arrived is sent once interval seconds have passed
+# since the last send, or as soon as max_chars characters are waiting. The last message carries the
+# rest and final=True. Sent texts are never split or reordered, so they add up to the whole output.
+
+
+class PartialOutput:
+    """Coalesces the chunks of one operator, send(seq, text, final) is called for every message"""
+
+    def __init__(self, send, interval, max_chars):
+        self.send = send
+        self.interval = interval
+        self.max_chars = max_chars
+        #chunks are added by whichever thread the executor streams from
+        self.lock = threading.Lock()
+        self.buffer = []
+        self.buffered_chars = 0
+        self.seq = 0
+        #the first chunk goes out right away, it is what the user waits for
+        self.sent_at = None
+        self.closed = False
+
+    def add(self, text):
+        with self.lock:
+            if self.closed or not text:
+                return
+            self.buffer.append(text)
+            self.buffered_chars += len(text)
+            if self.sent_at is None or self.buffered_chars >= self.max_chars or time.monotonic() - self.sent_at >= self.interval:
+                self.flush(False)
+
+    def close(self, text=""):
+        """Send what is left, and text after it, as the final message, nothing at all if the operator never streamed"""
+        with self.lock:
+            if self.closed:
+                return
+            self.closed = True
+            if text:
+                self.buffer.append(text)
+            if self.seq or self.buffer:
+                self.flush(True)
+
+    def flush(self, final):
+        text = "".join(self.buffer)
+        self.buffer = []
+        self.buffered_chars = 0
+        self.send(self.seq, text, final)
+        self.seq += 1
+        self.sent_at = time.monotonic()
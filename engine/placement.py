@@ -0,0 +1,171 @@
+import networkx as nx
+
+from engine.config import EXECUTOR_CONFIG, PLACEMENT_CONFIG
+
+# Operator placement strategies. A strategy maps every operator of a workflow DAG to one of the
+# configured workers, optionally using per-operator cost estimates (operator id -> cost, 1.0 when
+# missing). placement_metrics reports how good a placement is expected to be. The capacity of a
+# worker is its slots, as many as its memory holds at memory_per_slot where it advertised memory.
+
+
+def _cost(costs, op_id):
+    return costs.get(op_id, 1.0) if costs else 1.0
+
+
+def _slots(worker):
+    slots = worker.get("slots", EXECUTOR_CONFIG["slots"])
+    memory, per_slot = worker.get("memory", 0), PLACEMENT_CONFIG["memory_per_slot"]
+    if memory and per_slot:
+        #at least one slot, a worker that registered can always run something
+        slots = min(slots, max(1, memory // per_slot))
+    return slots
+
+
+class PlacementStrategy:
+    name = None
+
+    def place(self, dag, workers, costs=None):
+        """Return operator id -> worker for every node of dag"""
+        raise NotImplementedError
+
+
+class RoundRobinPlacement(PlacementStrategy):
+    name = "round_robin"
+
+    def place(self, dag, workers, costs=None):
+        return {op_id: workers[i % len(workers)] for i, op_id in enumerate(dag.nodes)}
+
+
+class LoadBalancedPlacement(PlacementStrategy):
+    """Largest operator first onto the worker with the least cost per slot, ignoring edges"""
+    name = "load_balanced"
+
+    def place(self, dag, workers, costs=None):
+        load = [0.0] * len(workers)
+        placement = {}
+        for op_id in sorted(dag.nodes, key=lambda op_id: -_cost(costs, op_id)):
+            index = min(range(len(workers)), key=lambda i: load[i] / _slots(workers[i]))
+            placement[op_id] = workers[index]
+            load[index] += _cost(costs, op_id)
+        return placement
+
+
+class LocalityFirstPlacement(PlacementStrategy):
+    """
+    Grows clusters along the edges in topological order, so chains and diamonds end up on one worker
+    and cross-worker edges are kept to a minimum. An operator joins the cluster(s) of its upstreams
+    as long as the merged cluster can still finish within the bound of the whole workflow, i.e. its
+    longest path and its cost spread over one worker's slots stay below the larger of the critical
+    path and the total cost spread over all slots. Clusters are then spread over workers largest first.
+    """
+    name = "locality"
+
+    def place(self, dag, workers, costs=None):
+        slots = min(_slots(worker) for worker in workers)
+        total = sum(_cost(costs, op_id) for op_id in dag.nodes)
+        bound = max(total / sum(_slots(worker) for worker in workers), critical_path_cost(dag, costs))
+
+        #finish time of every operator if nothing had to wait for a slot
+        finish = {}
+        cluster_of = {}
+        members = {}
+        cluster_cost = {}
+        for op_id in nx.topological_sort(dag):
+            cost = _cost(costs, op_id)
+            finish[op_id] = max((finish[pred] for pred in dag.predecessors(op_id)), default=0.0) + cost
+            upstream_clusters = list(dict.fromkeys(cluster_of[pred] for pred in dag.predecessors(op_id)))
+            merged_cost = sum(cluster_cost[cluster] for cluster in upstream_clusters) + cost
+            if upstream_clusters and max(finish[op_id], merged_cost / slots) <= bound:
+                target = upstream_clusters[0]
+                for cluster in upstream_clusters[1:]:
+                    for member in members.pop(cluster):
+                        cluster_of[member] = target
+                        members[target].append(member)
+                    cluster_cost[target] += cluster_cost.pop(cluster)
+            else:
+                target = op_id
+                members[target] = []
+                cluster_cost[target] = 0.0
+            cluster_of[op_id] = target
+            members[target].append(op_id)
+            cluster_cost[target] += cost
+
+        load = [0.0] * len(workers)
+        placement = {}
+        for cluster in sorted(members, key=lambda cluster: -cluster_cost[cluster]):
+            index = min(range(len(workers)), key=lambda i: load[i] / _slots(workers[i]))
+            for op_id in members[cluster]:
+                placement[op_id] = workers[index]
+            load[index] += cluster_cost[cluster]
+        return placement
+
+
+STRATEGIES = {strategy.name: strategy for strategy in (RoundRobinPlacement, LocalityFirstPlacement, LoadBalancedPlacement)}
+
+
+def get_strategy(name=PLACEMENT_CONFIG["strategy"]):
+    if name not in STRATEGIES:
+        raise ValueError(f"Unknown placement strategy {name}, expected one of {list(STRATEGIES)}")
+    return STRATEGIES[name]()
+
+
+def spread_instances(placement, instances, workers):
+    """
+    Moves the instances of every parallel operator (operator id -> instance ids, see parallel.py)
+    onto different workers, round robin from the worker the strategy chose for the first instance,
+    since strategies that keep edges local would otherwise put them all on the same worker.
+    """
+    for instance_ids in instances.values():
+        start = workers.index(placement[instance_ids[0]])
+        for i, op_id in enumerate(instance_ids):
+            placement[op_id] = workers[(start + i) % len(workers)]
+    return placement
+
+
+def critical_path_cost(dag, costs=None):
+    finish = {}
+    for op_id in nx.topological_sort(dag):
+        finish[op_id] = max((finish[pred] for pred in dag.predecessors(op_id)), default=0.0) + _cost(costs, op_id)
+    return max(finish.values(), default=0.0)
+
+
+def critical_path_ranks(dag, costs=None):
+    """Operator id -> cost of the longest path from the operator to a sink, its own cost included"""
+    rank = {}
+    for op_id in reversed(list(nx.topological_sort(dag))):
+        rank[op_id] = max((rank[succ] for succ in dag.successors(op_id)), default=0.0) + _cost(costs, op_id)
+    return rank
+
+
+def placement_metrics(dag, placement, costs=None, transfer_cost=PLACEMENT_CONFIG["transfer_cost"]):
+    """
+    Cross-worker edge count and estimated makespan of a placement. The makespan comes from list
+    scheduling the operators in topological order on their workers' slots, where an input from
+    another worker arrives transfer_cost after its producer finished.
+    """
+    def key(worker):
+        return (worker["host"], worker["port"])
+
+    cross_worker_edges = sum(1 for source, target in dag.edges if key(placement[source]) != key(placement[target]))
+
+    slot_free = {}
+    finish = {}
+    for op_id in nx.topological_sort(dag):
+        worker = placement[op_id]
+        slots = slot_free.setdefault(key(worker), [0.0] * _slots(worker))
+        inputs_ready = max((finish[pred] + (transfer_cost if key(placement[pred]) != key(worker) else 0.0)
+                            for pred in dag.predecessors(op_id)), default=0.0)
+        slot = min(range(len(slots)), key=lambda i: slots[i])
+        finish[op_id] = max(inputs_ready, slots[slot]) + _cost(costs, op_id)
+        slots[slot] = finish[op_id]
+
+    load = {}
+    for op_id, worker in placement.items():
+        name = f"{worker['host']}:{worker['port']}"
+        load[name] = load.get(name, 0.0) + _cost(costs, op_id)
+
+    return {
+        "cross_worker_edges": cross_worker_edges,
+        "estimated_makespan": max(finish.values(), default=0.0),
+        "load": load,
+    }
@@ -0,0 +1,32 @@
+import json
+import os
+import threading
+
+# Durable operator results for incremental re-execution, keyed by operator fingerprint (see
+# incremental.py). A fingerprint covers the operator and everything upstream of it, so a stored
+# result stays valid for any later plan in which the operator has the same fingerprint. Workers
+# write results here and read them back for reuse, so the directory has to be shared by all of them.
+
+
+class ResultStore:
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, fingerprint):
+        return os.path.join(self.directory, f"{fingerprint}.json")
+
+    def has(self, fingerprint):
+        return os.path.exists(self.path(fingerprint))
+
+    def get(self, fingerprint):
+        with open(self.path(fingerprint)) as file:
+            return json.load(file)
+
+    def put(self, fingerprint, tuples):
+        path = self.path(fingerprint)
+        #write and rename, a reader never sees half a result
+        temporary = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temporary, "w") as file:
+            json.dump(tuples, file)
+        os.replace(temporary, path)
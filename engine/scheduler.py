@@ -0,0 +1,64 @@
+import itertools
+import math
+import queue
+import threading
+
+from engine.config import EXECUTOR_CONFIG
+
+POLICIES = ("fifo", "critical_path")
+
+
+class ReadyQueueScheduler:
+    """
+    Local ready queue of a worker. Operators with input to process are submitted here by key and run
+    on a fixed number of executor threads (slots). With the "fifo" policy they run in the order they
+    became ready, with "critical_path" the one with the highest priority (its longest remaining path
+    to a sink, see placement.critical_path_ranks) runs first, ties in the order they became ready.
+    An exception out of run(key) goes to on_failure(key, exception), the executor thread moves on.
+    """
+
+    def __init__(self, run, slots, name="worker", policy=EXECUTOR_CONFIG["policy"], on_failure=None):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown scheduling policy {policy}, expected one of {list(POLICIES)}")
+        self.run = run
+        self.on_failure = on_failure
+        self.slots = slots
+        self.policy = policy
+        #(rank, submission number, key), lowest first
+        self.ready_queue = queue.PriorityQueue()
+        self.submissions = itertools.count()
+        self.threads = [
+            threading.Thread(target=self._serve, name=f"{name}-executor-{i}", daemon=True)
+            for i in range(slots)
+        ]
+        for thread in self.threads:
+            thread.start()
+
+    def submit(self, key, priority=0.0):
+        rank = -priority if self.policy == "critical_path" else 0.0
+        self.ready_queue.put((rank, next(self.submissions), key))
+
+    def close(self):
+        #behind everything still queued
+        for _ in self.threads:
+            self.ready_queue.put((math.inf, next(self.submissions), None))
+        for thread in self.threads:
+            if thread is not threading.current_thread():
+                thread.join()
+
+    def _serve(self):
+        while True:
+            _, _, key = self.ready_queue.get()
+            if key is None:
+                break
+            try:
+                self.run(key)
+            except Exception as e:
+                if self.on_failure is None:
+                    print(f"Operator {key} failed: {e}")
+                    continue
+                try:
+                    self.on_failure(key, e)
+                except Exception as failure:
+                    #the executor thread must survive whatever handling the failure runs into
+                    print(f"Handling the failure of operator {key} failed: {failure}")
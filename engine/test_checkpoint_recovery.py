@@ -0,0 +1,92 @@
+import os,sys
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.dirname(CURRENT_DIR))
+
+import tempfile
+import time
+
+import pykka
+
+from checkpoint import CheckpointStore
+from controller import Controller
+from llm import LLMBroker, MockLLMBackend, set_broker
+from result_store import ResultStore
+from worker import WorkerActor
+from workload import chain_plan, to_workflow
+
+# Fault injection: a chain of Chat operators runs across three workers, one of them crashes once
+# part of the chain has completed. The controller finds the crash by the missing heartbeats and
+# resumes the execution on the two survivors, which must only ask the LLM for the operators that
+# hadn't completed and end with the same answer as a run without failure.
+
+CONTROLLER = {"host": "localhost", "port": 6100, "report_port": 6101}
+CHAIN = 6
+KILL_AFTER = 3
+
+directory = tempfile.mkdtemp()
+checkpoint_path = os.path.join(directory, "checkpoints.sqlite")
+backend = MockLLMBackend(latency=0.2)
+broker = LLMBroker(backend)
+set_broker(broker)
+
+workers_config = [{"host": "localhost", "port": 5600 + i} for i in range(3)]
+workers = {worker["port"]: WorkerActor.start(worker["host"], worker["port"], CONTROLLER, cache_config={"enabled": False},
+                                             heartbeat_interval=0.1) for worker in workers_config}
+controller = Controller.start(CONTROLLER["host"], CONTROLLER["port"], workers_config, report_port=CONTROLLER["report_port"],
+                              placement="round_robin", result_store=os.path.join(directory, "results"), checkpoint_store=checkpoint_path,
+                              heartbeat_timeout=0.5)
+checkpoints = CheckpointStore(checkpoint_path)
+
+
+def run_chain():
+    plan = chain_plan(CHAIN, question="Continue the story.")
+    sink = plan["operators"][-1]["operatorID"]
+    plan["opsToViewResult"] = [sink]
+    execution = controller.proxy().new_execution(to_workflow(plan)).get()
+    assert controller.proxy().deploy_workflow(execution).get().ok()
+    assert controller.proxy().start_execution(execution).get().ok()
+    return execution, sink
+
+
+def stored_answer(execution, sink):
+    return ResultStore(os.path.join(directory, "results")).get(execution.plan.fingerprints[sink])
+
+
+try:
+    # reference run without failure
+    execution, sink = run_chain()
+    assert execution.done.wait(30), "reference execution did not finish"
+    expected = stored_answer(execution, sink)
+    assert checkpoints.completed(execution.execution_id) == set(), "checkpoints were kept after completion"
+
+    # same chain again, killing the worker of the first operator still running once KILL_AFTER operators completed
+    execution, sink = run_chain()
+    while len(checkpoints.completed(execution.execution_id)) < KILL_AFTER:
+        time.sleep(0.01)
+    completed = checkpoints.completed(execution.execution_id)
+    running = next(operator["operatorID"] for operator in execution.workflow.workflow_dict["operators"] if operator["operatorID"] not in completed)
+    victim = execution.placement[running]
+    calls_before = backend.calls
+    #a crash, a worker that stops cleanly deregisters and its executions are recovered without detection
+    killed = workers.pop(victim["port"])
+    killed.proxy().deregister = False
+    killed.stop()
+    print(f"Killed Worker {victim['port']} while it ran {running}, {len(completed)} operators completed")
+
+    assert execution.done.wait(30), "resumed execution did not finish"
+    resumed = execution.resumed_as
+    assert resumed is not None and resumed.error is None, "the execution was not resumed"
+    assert [recovery["worker"] for recovery in resumed.recoveries] == [victim["port"]], resumed.recoveries
+    assert victim["port"] not in {worker["port"] for worker in resumed.placement.values()}, "the dead worker got operators"
+    assert resumed.plan.checkpoints.keys() >= completed, "completed operators were not resumed from their checkpoints"
+
+    calls = backend.calls - calls_before
+    #the prompt of the killed operator may have reached the backend only after the kill
+    assert calls - (CHAIN - len(completed)) in (0, 1), f"{calls} LLM calls, only {CHAIN - len(completed)} operators had to run again"
+    assert stored_answer(resumed, sink) == expected, "resumed execution ended with another answer"
+    assert checkpoints.completed(execution.execution_id) == set(), "checkpoints were kept after completion"
+    print(f"Resumed execution finished after {calls} more LLM calls for a chain of {CHAIN}, the answer matches the run without failure")
+finally:
+    checkpoints.close()
+    pykka.ActorRegistry.stop_all()
+    broker.close()
@@ -0,0 +1,53 @@
+import os,sys
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.dirname(CURRENT_DIR))
+
+import tempfile
+import time
+
+import pykka
+
+from controller import Controller
+from llm import LLMBackend, LLMBroker, set_broker
+from worker import WorkerActor
+from workload import chain_plan, to_workflow
+
+# Operator failure: the LLM backend raises on every call, so the Chat operators of a chain fail. The
+# worker of the first one reports the failure, and the controller fails the execution with the error
+# instead of waiting forever for operators that will never complete.
+
+CONTROLLER = {"host": "localhost", "port": 6100, "report_port": 6101}
+
+
+class FailingBackend(LLMBackend):
+    name = "failing"
+
+    def stream_batch(self, prompts):
+        raise RuntimeError("LLM backend unavailable")
+        yield
+
+
+broker = LLMBroker(FailingBackend())
+previous = set_broker(broker)
+workers_config = [{"host": "localhost", "port": 5600 + i} for i in range(3)]
+workers = [WorkerActor.start(worker["host"], worker["port"], CONTROLLER, cache_config={"enabled": False}) for worker in workers_config]
+controller = Controller.start(CONTROLLER["host"], CONTROLLER["port"], workers_config, report_port=CONTROLLER["report_port"],
+                              placement="round_robin", result_store=tempfile.mkdtemp(), checkpoint_store="", heartbeat_timeout=0)
+
+try:
+    execution = controller.proxy().new_execution(to_workflow(chain_plan(3, question="Tell a story."))).get()
+    assert controller.proxy().deploy_workflow(execution).get().ok()
+    assert controller.proxy().start_execution(execution).get().ok()
+    assert execution.done.wait(10), f"execution hangs with {execution.remaining_operators} remaining"
+    assert execution.error is not None and "LLM backend unavailable" in execution.error, execution.error
+    assert controller.proxy().get_execution(execution.execution_id).get() is execution
+    #cancels go out fire and forget
+    deadline = time.monotonic() + 5
+    while any(worker.proxy().executions.get() for worker in workers):
+        assert time.monotonic() < deadline, "workers kept the failed execution"
+        time.sleep(0.01)
+    print(f"Execution failed with: {execution.error}")
+finally:
+    pykka.ActorRegistry.stop_all()
+    set_broker(previous)
+    broker.close()
@@ -0,0 +1,83 @@
+import os,sys
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.dirname(CURRENT_DIR))
+
+import collections
+import json
+import tempfile
+
+import pykka
+
+import parallel
+from controller import Controller
+from llm import LLMBroker, MockLLMBackend, set_broker
+from result_store import ResultStore
+from worker import WorkerActor
+from workload import link, logical_plan, operator, to_workflow
+
+# Data-parallel operators: source -> operator -> sink, where the middle operator runs as several
+# instances on different workers. Whatever the partitioning, the sink must see what it sees when the
+# operator runs once, range partitioning even in the same order. Chat with perRow answers every row.
+
+CONTROLLER = {"host": "localhost", "port": 6100, "report_port": 6101}
+ROWS = 300
+
+directory = tempfile.mkdtemp()
+set_broker(LLMBroker(MockLLMBackend(latency=0.05)))
+workers_config = [{"host": "localhost", "port": 5600 + i} for i in range(3)]
+workers = [WorkerActor.start(worker["host"], worker["port"], CONTROLLER, cache_config={"enabled": False}) for worker in workers_config]
+controller = Controller.start(CONTROLLER["host"], CONTROLLER["port"], workers_config, report_port=CONTROLLER["report_port"],
+                              result_store=os.path.join(directory, "results"), checkpoint_store="", heartbeat_timeout=0)
+
+
+def run(op_type, **properties):
+    plan = logical_plan(
+        [operator("source", "MockSource", rows=ROWS), operator("operator", op_type, **properties), operator("sink", "MockMap")],
+        [link("source", "operator"), link("operator", "sink")],
+    )
+    plan["settings"] = {"dataTransferBatchSize": 16}
+    plan["opsToViewResult"] = ["sink"]
+    execution = controller.proxy().new_execution(to_workflow(plan)).get()
+    assert controller.proxy().deploy_workflow(execution).get().ok()
+    assert controller.proxy().start_execution(execution).get().ok()
+    assert execution.done.wait(30), f"execution of {properties} did not finish"
+    instances = execution.instances.get("operator", [])
+    assert len({json.dumps(execution.placement[op_id], sort_keys=True) for op_id in instances}) == len(instances), "instances share a worker"
+    return ResultStore(os.path.join(directory, "results")).get(execution.plan.fingerprints["sink"]), instances
+
+
+def multiset(rows):
+    return collections.Counter(json.dumps(row, sort_keys=True) for row in rows)
+
+
+try:
+    expected, instances = run("MockMap")
+    assert len(expected) == ROWS and not instances
+
+    for properties in ({"parallelism": 3}, {"parallelism": 3, "partitioning": "hash", "partitionAttribute": "id"}):
+        output, instances = run("MockMap", **properties)
+        assert len(instances) == 3, instances
+        assert multiset(output) == multiset(expected), f"{properties} changed the output"
+        print(f"MockMap with {properties}: same {len(output)} rows from {len(instances)} instances")
+
+    output, instances = run("MockMap", partitioning="range", partitionAttribute="id", partitionBoundaries=[100, 200])
+    assert len(instances) == 3 and output == expected, "range partitioning changed the output or its order"
+    print(f"MockMap partitioned by range: same {len(output)} rows in the same order from {len(instances)} instances")
+
+    try:
+        run("MockMap", partitioning="range", partitionAttribute="id", partitionBoundaries=[100, "200"])
+        raise AssertionError("boundaries of mixed types were accepted")
+    except ValueError as error:
+        assert "all numbers or all strings" in str(error), error
+    print("MockMap with boundaries of mixed types: rejected when the plan is built")
+
+    partition = parallel._partitioner({"strategy": "range", "instances": 3, "attribute": "id", "boundaries": [100, 200], "kind": "number"})
+    assert [partition({"id": value}) for value in (5, "150", "abc", None, 250.0)] == [0, 1, 0, 0, 2]
+    print("Range partitioning of keys of other types: numeric strings by value, the rest to the first instance")
+
+    expected, _ = run("Chat", question="Summarise the row.", perRow=True, parallelism=1)
+    output, instances = run("Chat", question="Summarise the row.", perRow=True, parallelism=2)
+    assert len(instances) == 2 and len(output) == ROWS and multiset(output) == multiset(expected)
+    print(f"Chat per row: {len(output)} answers from {len(instances)} instances")
+finally:
+    pykka.ActorRegistry.stop_all()
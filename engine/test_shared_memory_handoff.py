@@ -0,0 +1,91 @@
+import os,sys
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.dirname(CURRENT_DIR))
+
+import tempfile
+import types
+
+import pykka
+
+import codec
+import handoff
+from controller import Controller
+from messages import ExecutionResult
+from result_store import ResultStore
+from worker import WorkerActor
+from workload import link, logical_plan, operator, to_workflow
+
+# Shared memory handoff: a source on one worker feeds three consumers on the three other workers of
+# this host over ipc, with batches large enough to go through shared memory. Every batch must be
+# written once for all three consumers, and every segment unlinked once they all read it. A spill
+# file is read the same way as a segment. A segment a reader didn't acknowledge in time is unlinked
+# rather than reused, the reader may still be decoding it.
+
+CONTROLLER = {"host": "localhost", "port": 6100, "report_port": 6101}
+ROWS = 200
+BATCH = 50
+
+directory = tempfile.mkdtemp()
+before = set(os.listdir(handoff.SHM_DIRECTORY)) if os.path.isdir(handoff.SHM_DIRECTORY) else set()
+workers_config = [{"host": "localhost", "port": 5600 + i} for i in range(4)]
+workers = [WorkerActor.start(worker["host"], worker["port"], CONTROLLER, shared_memory_threshold=256, cache_config={"enabled": False},
+                             transport="ipc") for worker in workers_config]
+controller = Controller.start(CONTROLLER["host"], CONTROLLER["port"], workers_config, report_port=CONTROLLER["report_port"],
+                              placement="round_robin", result_store=os.path.join(directory, "results"), checkpoint_store="",
+                              heartbeat_timeout=0, transport="ipc")
+
+try:
+    message = ExecutionResult("execution", "localhost", 5600, "source", 0, 0, [{"id": i, "text": "x" * 100} for i in range(100)])
+    encoded = codec.encode(message)
+    path = os.path.join(directory, "gc-0123456789abcdef.spill")
+    with open(path, "wb") as file:
+        file.write(encoded)
+    assert handoff.read_segment(handoff.FILE, path, len(encoded), codec.decode, directory).result == message.result
+    #handles come over the network, anything but a segment or a spill file of a worker is refused
+    for backend, name in ((handoff.SHM, "../etc"), (handoff.SHM, "other-segment"), (handoff.FILE, "/etc/passwd"),
+                          (handoff.FILE, os.path.join(directory, "..", os.path.basename(directory), "message.spill"))):
+        try:
+            handoff.read_segment(backend, name, 1, codec.decode, directory)
+        except ValueError:
+            continue
+        raise AssertionError(f"{backend} segment {name} was read")
+    handoff.release_segment(handoff.FILE, path)
+    assert not os.path.exists(path)
+
+    consumers = [f"consumer-{i}" for i in range(3)]
+    plan = logical_plan(
+        [operator("source", "MockSource", rows=ROWS)] + [operator(op_id, "MockMap") for op_id in consumers],
+        [link("source", op_id) for op_id in consumers],
+    )
+    plan["settings"] = {"dataTransferBatchSize": BATCH}
+    plan["opsToViewResult"] = consumers
+    execution = controller.proxy().new_execution(to_workflow(plan)).get()
+    assert controller.proxy().deploy_workflow(execution).get().ok()
+    assert len({execution.placement[op_id]["port"] for op_id in ["source"] + consumers}) == 4
+    assert controller.proxy().start_execution(execution).get().ok()
+    assert execution.done.wait(30), "execution did not finish"
+
+    results = ResultStore(os.path.join(directory, "results"))
+    for op_id in consumers:
+        assert results.get(execution.plan.fingerprints[op_id]) == [{"id": i} for i in range(ROWS)], f"{op_id} got other rows"
+    source_worker = workers[execution.placement["source"]["port"] - 5600]
+    metrics = source_worker.proxy().get_shared_memory_metrics().get()
+    assert metrics["written"] == ROWS // BATCH, f"{metrics['written']} segments written for {ROWS // BATCH} batches"
+    assert metrics["live"] == 0, f"{metrics['live']} segments were not released"
+    print(f"{metrics['written']} segments of {metrics['written_bytes']} bytes written once for {len(consumers)} consumers, all released")
+
+    #nothing listens on the port of the reader, so its acknowledgement times out
+    sender = WorkerActor.start("localhost", 5604, CONTROLLER, shared_memory_threshold=256, cache_config={"enabled": False},
+                               transport="ipc", ack_timeout=0.2, heartbeat_interval=0)
+    sender.proxy().send_through_shared_memory(types.SimpleNamespace(execution_id="execution"), types.SimpleNamespace(finished=False),
+                                              [{"host": "localhost", "port": 5699}], encoded).get()
+    metrics = sender.proxy().get_shared_memory_metrics().get()
+    assert metrics["written"] == 1 and metrics["live"] == 0, metrics
+    assert metrics["pooled"] == 0, "a segment whose reader timed out went back to the pool"
+    print("A segment whose reader timed out was unlinked instead of reused")
+finally:
+    pykka.ActorRegistry.stop_all()
+
+if os.path.isdir(handoff.SHM_DIRECTORY):
+    left = {name for name in os.listdir(handoff.SHM_DIRECTORY) if name.startswith("gc-")} - before
+    assert not left, f"segments left behind: {left}"
@@ -0,0 +1,71 @@
+import os,sys
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.dirname(CURRENT_DIR))
+
+import time
+
+import pykka
+
+import networkx as nx
+
+from controller import Controller
+from placement import LoadBalancedPlacement
+from worker import WorkerActor
+from workload import chain_plan, to_workflow
+
+# Dynamic membership: the controller starts without any configured worker. Two workers started
+# before it register once it is up, a third one started later gets operators of the next execution,
+# and a worker that shuts down gets none anymore. Placement counts a worker with little memory as
+# having fewer slots.
+
+CONTROLLER = {"host": "localhost", "port": 6100, "report_port": 6101, "event_port": 6102}
+GiB = 2**30
+
+
+def wait_for_members(controller, ports, timeout=5):
+    start = time.perf_counter()
+    while {worker["port"] for worker in controller.proxy().get_members().get()} != ports:
+        assert time.perf_counter() - start < timeout, f"members {controller.proxy().get_members().get()} never became {ports}"
+        time.sleep(0.01)
+    return time.perf_counter() - start
+
+
+def run_chain(controller):
+    plan = chain_plan(6, "MockMap")
+    plan["operators"][0].update(operatorType="MockSource", rows=10)
+    execution = controller.proxy().new_execution(to_workflow(plan)).get()
+    assert controller.proxy().deploy_workflow(execution).get().ok()
+    assert controller.proxy().start_execution(execution).get().ok()
+    assert execution.done.wait(10), "execution did not finish"
+    return {worker["port"] for worker in execution.placement.values()}
+
+
+dag = nx.DiGraph()
+dag.add_nodes_from(f"op{i}" for i in range(10))
+small, large = {"host": "localhost", "port": 1, "slots": 4, "memory": 2 * GiB}, {"host": "localhost", "port": 2, "slots": 4, "memory": 16 * GiB}
+placed = list(LoadBalancedPlacement().place(dag, [small, large]).values())
+assert placed.count(small) < placed.count(large), f"{placed.count(small)} of 10 operators went to the worker with 2 GiB of memory"
+print(f"Load balanced placement put {placed.count(small)} of 10 operators on the worker with 2 GiB and 4 slots")
+
+try:
+    workers = {port: WorkerActor.start("localhost", port, CONTROLLER, slots=2, memory=4 * GiB) for port in (5600, 5601)}
+    time.sleep(0.2)
+    controller = Controller.start(CONTROLLER["host"], CONTROLLER["port"], [], report_port=CONTROLLER["report_port"],
+                                  event_port=CONTROLLER["event_port"], placement="round_robin", checkpoint_store="")
+    took = wait_for_members(controller, {5600, 5601})
+    members = controller.proxy().get_members().get()
+    assert all(member["slots"] == 2 and member["memory"] == 4 * GiB and member["alive"] for member in members), members
+    assert run_chain(controller) == {5600, 5601}
+    print(f"Workers started before the controller registered {took:.3f}s after it came up")
+
+    workers[5602] = WorkerActor.start("localhost", 5602, CONTROLLER, slots=4, memory=8 * GiB)
+    took = wait_for_members(controller, {5600, 5601, 5602})
+    assert run_chain(controller) == {5600, 5601, 5602}
+    print(f"Worker 5602 registered {took:.3f}s after it started and got operators of the next execution")
+
+    workers.pop(5601).stop()
+    took = wait_for_members(controller, {5600, 5602})
+    assert run_chain(controller) == {5600, 5602}
+    print(f"Worker 5601 deregistered {took:.3f}s after it stopped and got no operators of the next execution")
+finally:
+    pykka.ActorRegistry.stop_all()
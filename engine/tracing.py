@@ -0,0 +1,155 @@
+import json
+import os
+import threading
+import time
+
+# Opt-in tracing of engine executions. Spans for deploy, send, receive, serialise, deserialise,
+# queueing, waiting for inputs and operator execution are recorded with the execution, operator and
+# worker they belong to, and exported as Chrome trace JSON (chrome://tracing, ui.perfetto.dev).
+# Every actor gets a lane of its own ("Controller", "Worker 5555"), so in-process workers show up
+# as separate processes of the trace. Timestamps come from the monotonic clock, which is shared by
+# the processes of a host, so traces of worker processes can be merged with merge().
+#
+# Tracing is off unless enable() is called (or TRACING_CONFIG enables it). span() then returns a
+# shared no-op span and is_enabled() is a global lookup, which keeps the disabled cost to a call.
+
+from engine.config import TRACING_CONFIG
+
+_tracer = None
+
+
+class Tracer:
+    def __init__(self, max_events):
+        self.max_events = max_events
+        #complete events, appended from any thread, list.append is atomic
+        self.events = []
+        self.dropped = 0
+
+    def record(self, name, lane, start_ns, end_ns, args):
+        if len(self.events) >= self.max_events:
+            self.dropped += 1
+            return
+        self.events.append((name, lane, threading.get_ident(), start_ns, end_ns, args))
+
+
+class Span:
+    __slots__ = ("tracer", "name", "lane", "args", "start_ns")
+
+    def __init__(self, tracer, name, lane, args):
+        self.tracer = tracer
+        self.name = name
+        self.lane = lane
+        self.args = args
+
+    def tag(self, **args):
+        """Add tags known only once the span is running, e.g. the execution of a message being decoded"""
+        self.args.update(args)
+
+    def __enter__(self):
+        self.start_ns = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        self.tracer.record(self.name, self.lane, self.start_ns, time.perf_counter_ns(), self.args)
+        return False
+
+
+class NullSpan:
+    __slots__ = ()
+
+    def tag(self, **args):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+NULL_SPAN = NullSpan()
+
+
+def enable(max_events=TRACING_CONFIG["max_events"]):
+    """Start recording spans in this process, drops whatever an earlier enable() recorded"""
+    global _tracer
+    _tracer = Tracer(max_events)
+
+
+def disable():
+    global _tracer
+    _tracer = None
+
+
+def is_enabled():
+    return _tracer is not None
+
+
+def now():
+    return time.perf_counter_ns()
+
+
+def span(name, lane, **args):
+    """Context manager recording a span from entry to exit"""
+    if _tracer is None:
+        return NULL_SPAN
+    return Span(_tracer, name, lane, args)
+
+
+def record(name, lane, start_ns, end_ns, **args):
+    """Record a span whose start was taken earlier with now(), e.g. the time an operator waited for input"""
+    if _tracer is not None:
+        _tracer.record(name, lane, start_ns, end_ns, args)
+
+
+def chrome_trace():
+    """The spans recorded so far in Chrome trace event format"""
+    if _tracer is None:
+        return {"traceEvents": []}
+    lanes = {}
+    events = []
+    for name, lane, thread, start_ns, end_ns, args in list(_tracer.events):
+        pid = lanes.setdefault(lane, len(lanes) + 1)
+        events.append({
+            "name": name,
+            "cat": "engine",
+            "ph": "X",
+            "ts": start_ns / 1000,
+            "dur": (end_ns - start_ns) / 1000,
+            "pid": pid,
+            "tid": thread,
+            "args": args,
+        })
+    for lane, pid in lanes.items():
+        events.append({"name": "process_name", "ph": "M", "pid": pid, "args": {"name": lane}})
+    return {"traceEvents": events, "displayTimeUnit": "ms", "otherData": {"dropped": _tracer.dropped}}
+
+
+def export(path):
+    """Write the spans recorded so far to path as Chrome trace JSON, returns the number of spans"""
+    trace = chrome_trace()
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w") as file:
+        json.dump(trace, file)
+    return sum(1 for event in trace["traceEvents"] if event["ph"] == "X")
+
+
+def merge(paths, path):
+    """Merge the Chrome traces of several processes into one file, lanes keep their names"""
+    events = []
+    lanes = {}
+    for trace_path in paths:
+        with open(trace_path) as file:
+            trace = json.load(file)
+        #pids are only unique within one file, lanes are renumbered by name
+        names = {event["pid"]: event["args"]["name"] for event in trace["traceEvents"] if event["ph"] == "M"}
+        for event in trace["traceEvents"]:
+            if event["ph"] == "X":
+                events.append({**event, "pid": lanes.setdefault(names[event["pid"]], len(lanes) + 1)})
+    events.extend({"name": "process_name", "ph": "M", "pid": pid, "args": {"name": lane}} for lane, pid in lanes.items())
+    with open(path, "w") as file:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, file)
+
+
+if TRACING_CONFIG["enabled"]:
+    enable()
@@ -0,0 +1,182 @@
+import collections
+import itertools
+import os
+import socket
+import stat
+import threading
+from concurrent.futures import Future
+
+import zmq
+
+from engine.config import TRANSPORT_CONFIG
+
+# How engine actors reach each other. Every actor serves requests on a Server, which is reachable
+# three ways, from the least to the most local:
+#   tcp     the ROUTER socket on host:port, from anywhere
+#   ipc     the same ROUTER socket on a unix socket named after the port, from processes of the host
+#   direct  a mailbox registered in this process, actors of the process hand over the message object
+#           itself, which is neither serialised nor copied and must not be changed by either side
+# Senders pick the most local way the deployment topology allows for every peer (see select), so
+# in-process workers, as in tests and benchmarks, talk directly, worker processes of a launcher use
+# ipc and only other hosts go through tcp. TRANSPORT_CONFIG caps the choice, e.g. to measure tcp.
+#
+# Peers are still named by their tcp endpoint, which stays the key of channels, heartbeats etc.
+# Only peers known to serve on ipc are reached that way, any other peer of the host, e.g. a plain
+# ROUTER socket, keeps its tcp endpoint.
+
+BACKENDS = ("tcp", "ipc", "direct")
+
+#tcp endpoint -> Mailbox of a Server of this process
+_mailboxes = {}
+_mailboxes_lock = threading.Lock()
+_mailbox_ids = itertools.count()
+#tcp endpoint -> ipc address of a Server of this host serving on it, or None for a peer found not to
+#a peer keeps the way it was first reached, so that its messages don't overtake each other on two sockets
+_ipc_addresses = {}
+
+
+def is_local_host(host):
+    return host in ("localhost", "127.0.0.1", "::1", socket.gethostname())
+
+
+def is_served_here(endpoint):
+    """Whether a Server of this process serves the tcp endpoint"""
+    return endpoint in _mailboxes
+
+
+def ipc_address(port):
+    return f"ipc://{os.path.join(TRANSPORT_CONFIG['ipc_directory'], f'engine-{port}.sock')}"
+
+
+def _serves_ipc(address):
+    #the socket file of a Server of another process; one left behind by a process that died refuses connections
+    path = address[len("ipc://"):]
+    try:
+        if not stat.S_ISSOCK(os.stat(path).st_mode):
+            return False
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+            probe.connect(path)
+    except OSError:
+        return False
+    return True
+
+
+def ipc_peer(endpoint):
+    """ipc address the peer at a tcp endpoint of this host serves on, None if it doesn't"""
+    if endpoint in _ipc_addresses:
+        return _ipc_addresses[endpoint]
+    host, port = endpoint[len("tcp://"):].rsplit(":", 1)
+    address = ipc_address(port) if is_local_host(host) and _serves_ipc(ipc_address(port)) else None
+    with _mailboxes_lock:
+        return _ipc_addresses.setdefault(endpoint, address)
+
+
+def select(endpoint, backend=TRANSPORT_CONFIG["backend"]):
+    """
+    The way to reach the peer at a tcp endpoint, no more local than backend allows.
+    Returns ("direct", mailbox), ("ipc", address) or ("tcp", endpoint).
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown transport {backend}, expected one of {list(BACKENDS)}")
+    if backend == "direct":
+        mailbox = _mailboxes.get(endpoint)
+        if mailbox is not None:
+            return "direct", mailbox
+    if backend != "tcp" and zmq.has("ipc"):
+        address = ipc_peer(endpoint)
+        if address is not None:
+            return "ipc", address
+    return "tcp", endpoint
+
+
+class Mailbox:
+    """Requests handed over by reference, queued for the thread serving a Server"""
+
+    def __init__(self, context):
+        self.requests = collections.deque()
+        self.open = True
+        #inproc pair waking the serving thread up, the sending end is shared by every sender under a lock
+        address = f"inproc://mailbox-{next(_mailbox_ids)}"
+        self.wake_recv = context.socket(zmq.PAIR)
+        self.wake_recv.bind(address)
+        self.wake_send = context.socket(zmq.PAIR)
+        self.wake_send.connect(address)
+        self.lock = threading.Lock()
+
+    def tell(self, future, message):
+        """Queue message, future is resolved with the reply bytes"""
+        with self.lock:
+            if not self.open:
+                future.set_exception(ConnectionError("Peer stopped serving requests"))
+                return
+            self.requests.append((future, message))
+            self.wake_send.send(b"")
+
+    def close(self):
+        with self.lock:
+            self.open = False
+            self.wake_send.close()
+        self.wake_recv.close()
+        while self.requests:
+            future, _ = self.requests.popleft()
+            future.set_exception(ConnectionError("Peer stopped serving requests"))
+
+
+class Server:
+    """
+    Requests sent through a ChannelPool to host:port, by any transport.
+
+    recv() returns (envelope, message), message being the bytes that came over a socket or the object
+    a sender of this process handed over. Only the thread serving requests may use the server.
+    """
+
+    def __init__(self, context, host, port):
+        self.endpoint = f"tcp://{host}:{port}"
+        self.router = context.socket(zmq.ROUTER)
+        self.router.setsockopt(zmq.LINGER, 0)
+        self.router.bind(self.endpoint)
+        self.mailbox = Mailbox(context)
+        with _mailboxes_lock:
+            if zmq.has("ipc"):
+                self.router.bind(ipc_address(port))
+                _ipc_addresses[self.endpoint] = ipc_address(port)
+            _mailboxes[self.endpoint] = self.mailbox
+        self.poller = zmq.Poller()
+        self.poller.register(self.router, zmq.POLLIN)
+        self.poller.register(self.mailbox.wake_recv, zmq.POLLIN)
+
+    def poll(self, timeout):
+        """Wait up to timeout milliseconds for a request, True if recv() has one"""
+        #wake ups of requests still queued were drained by an earlier poll, those must not wait
+        events = dict(self.poller.poll(0 if self.mailbox.requests else timeout))
+        if self.mailbox.wake_recv in events:
+            while True:
+                try:
+                    self.mailbox.wake_recv.recv(zmq.NOBLOCK)
+                except zmq.Again:
+                    break
+        return bool(self.mailbox.requests) or self.router in events
+
+    def recv(self):
+        if self.mailbox.requests:
+            return self.mailbox.requests.popleft()
+        identity, msg_id, payload = self.router.recv_multipart(copy=False)
+        return (identity.bytes, msg_id.bytes), payload.bytes
+
+    def reply(self, envelope, reply):
+        if isinstance(reply, str):
+            reply = reply.encode()
+        if isinstance(envelope, Future):
+            if not envelope.done():
+                envelope.set_result(reply)
+            return
+        identity, msg_id = envelope
+        self.router.send_multipart([identity, msg_id, reply])
+
+    def close(self):
+        with _mailboxes_lock:
+            if _mailboxes.get(self.endpoint) is self.mailbox:
+                del _mailboxes[self.endpoint]
+                _ipc_addresses.pop(self.endpoint, None)
+        self.mailbox.close()
+        self.router.close()
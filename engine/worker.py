@@ -5,112 +5,735 @@ sys.path.append(os.path.dirname(CURRENT_DIR))
 import pykka
 import zmq
 import threading
-import pickle
+import collections
 import time
-from messages import WorkerExecutionStart, WorkerAssignment, ExecutionResult
+from concurrent.futures import Future
+import codec
+from messages import WorkerExecutionStart, WorkerExecutionCancel, DeploymentManifest, ExecutionResult, EndOfStream, OperatorCompleted, OperatorFailed, OperatorStatisticsReport, OperatorOutputChunk, CreditGrant, Heartbeat, WorkerRegistration, WorkerDeregistration, SharedMemoryHandle
+import handoff
+import tracing
+from cache import InputDigest, ResultCache
+from result_store import ResultStore
+from checkpoint import CheckpointStore
+from operators import create_executor
+from flow_control import OutputCredits
+from parallel import OutputPartitioning
+from partial_output import PartialOutput
+from channels import ChannelPool, NACK_PREFIX, worker_endpoint
+from transport import Server
+from scheduler import ReadyQueueScheduler
+from operator_statistics import OperatorStatistics
 
-from engine.config import WORKERS_CONFIG
+from engine.config import CONTROLLER_CONFIG, WORKERS_CONFIG, EXECUTOR_CONFIG, SHARED_MEMORY_CONFIG, CACHE_CONFIG, PARTIAL_OUTPUT_CONFIG, HEARTBEAT_CONFIG, STATISTICS_CONFIG, TRANSPORT_CONFIG, BROADCAST_CONFIG
+
+#completed executions whose flow control metrics a worker keeps around
+COMPLETED_METRICS_KEPT = 16
+#seconds between checks whether the operator waiting for a reply was cancelled
+REPLY_POLL = 0.1
+
+
+def pending(output):
+    #executors return their output tuples, or a Future of them
+    return output if isinstance(output, Future) else iter(output)
+
+
+class OperatorState():
+    """Execution state of one operator hosted by a worker"""
+    def __init__(self, execution_id, assignment, credits, caching, checkpointing):
+        self.execution_id = execution_id
+        self.op_id = assignment.opID
+        self.op_type = assignment.opType
+        self.properties = assignment.properties
+        self.upstreams = assignment.upstreams
+        self.downstreams = assignment.downstreams
+        self.priority = assignment.priority
+        self.executor = create_executor(self.op_type, self.op_id, self.properties)
+        #hash of everything the operator consumed, None unless its output may come from the result cache
+        cached = caching and self.executor.cacheable and not self.properties.get("bypassCache", False)
+        self.input_digest = InputDigest() if cached else None
+        #every output tuple, kept when the output goes to the result store under this fingerprint
+        self.store_result_as = assignment.storeResultAs
+        self.stored_output = [] if self.store_result_as else None
+        #output tuples not checkpointed yet and the sequence number of their batch, None if checkpointing is off
+        self.checkpoint_batch = [] if checkpointing else None
+        self.checkpoint_seq = 0
+        #coalesces the partial output the executor streams to the controller, None if it doesn't stream
+        self.partial_output = None
+
+        #(source operator id, source output port) -> input port, an input channel ends with its EndOfStream
+        self.input_channels = {(source, source_port): port for source, source_port, port in assignment.inputLinks}
+        self.finished_channels = set()
+        #output port -> target operator ids, and the tuples not sent downstream yet
+        self.output_links = {}
+        for port, target, _ in assignment.outputLinks:
+            self.output_links.setdefault(port, []).append(target)
+        self.output_buffers = {port: [] for port in self.output_links}
+        #which ports a tuple goes to when some of them feed the instances of a parallel operator, None if every port gets every tuple
+        self.partitioning = OutputPartitioning(self.output_links, assignment.outputPartitioning) if assignment.outputPartitioning else None
+        self.output_seq = {port: 0 for port in self.output_links}
+        #full batches and the final EndOfStream of every output port, waiting for credits of the consumers
+        self.outbox = {port: collections.deque() for port in self.output_links}
+        self.credits = OutputCredits(self.output_links, credits)
+
+        #batches and end of stream markers waiting to be processed, in arrival order
+        self.inbox = collections.deque()
+        self.peak_inbox = 0
+        #output tuples still to be pulled from the executor, paused while the outbox waits for credits
+        #a Future until the executor's output is there, the operator leaves its slot in the meantime
+        self.pending_output = None
+        #(channel, sender) of the batch pending_output comes from, credited back once it is fully processed
+        self.pending_batch = None
+        #whether the operator sits in the ready queue or is running, it never runs on two threads at once
+        self.scheduled = False
+        self.finishing = False
+        self.finished = False
+        self.statistics = OperatorStatistics()
+        #when the operator went to the ready queue and since when it has nothing to do, only taken while tracing
+        self.queued_at = None
+        self.waiting_since = None
+
+    def inputs_finished(self):
+        return len(self.finished_channels) == len(self.input_channels)
+
+
+class ExecutionState():
+    """The operators of one execution hosted by a worker, and the settings of their manifest"""
+    def __init__(self, manifest, caching, checkpoints):
+        self.execution_id = manifest.execution_id
+        self.batch_size = manifest.batch_size
+        self.credits = manifest.credits
+        self.result_store = ResultStore(manifest.result_store) if manifest.result_store else None
+        #CheckpointStore the output of completed operators goes to, None if checkpointing is off
+        self.checkpoints = checkpoints
+        #operator id is key, worker is value, so that we know where to send to
+        self.operator_worker_mapping = dict(manifest.placement)
+        #operator id is key, an operator is submitted to the ready queue once the execution started and it has input to process
+        self.operators = {
+            assignment.opID: OperatorState(self.execution_id, assignment, self.credits, caching, checkpoints is not None)
+            for assignment in manifest.assignments
+        }
+        self.completed_operators = set()
+        self.started = False
+
+
+def physical_memory():
+    """Bytes of memory of this machine, 0 where the platform doesn't tell"""
+    try:
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+    except (AttributeError, ValueError, OSError):
+        return 0
 
 
 class WorkerActor(pykka.ThreadingActor):
-    def __init__(self, host, port):
+    def __init__(self, host, port, controller_config=CONTROLLER_CONFIG, slots=EXECUTOR_CONFIG["slots"],
+                 shared_memory_threshold=SHARED_MEMORY_CONFIG["min_bytes"], cache_config=CACHE_CONFIG,
+                 partial_output_config=PARTIAL_OUTPUT_CONFIG, heartbeat_interval=HEARTBEAT_CONFIG["interval"],
+                 statistics_interval=STATISTICS_CONFIG["interval"], transport=TRANSPORT_CONFIG["backend"], memory=None,
+                 scheduling_policy=EXECUTOR_CONFIG["policy"], ack_timeout=BROADCAST_CONFIG["ack_timeout"]):
         super().__init__()
         self.host = host
         self.port = port
+        #capacity advertised to the controller, which places operators by it
+        self.slots = slots
+        self.memory = physical_memory() if memory is None else memory
+        #False makes stopping look like a crash to the controller, for fault injection
+        self.deregister = True
+        #trace lane of this worker
+        self.lane = f"Worker {port}"
+        self.shared_memory_threshold = shared_memory_threshold
+        #segments this worker handed to workers on its host, reused or unlinked once all of them read it
+        self.segments = handoff.SegmentLedger()
+        self.partial_output_config = partial_output_config
+        self.heartbeat_interval = heartbeat_interval
+        self.statistics_interval = statistics_interval
+        #seconds the worker waits for a peer to acknowledge a message, a dead peer must not hold an executor thread forever
+        self.ack_timeout = ack_timeout
+        self.controller = {"host": controller_config["host"], "port": controller_config["report_port"]}
+        self.heartbeat_target = {"host": controller_config["host"], "port": controller_config.get("heartbeat_port", CONTROLLER_CONFIG["heartbeat_port"])}
         self.context = zmq.Context()
-        self.socket = self.context.socket(zmq.REP)  # REP socket for replies
-        self.socket.bind(f"tcp://{self.host}:{self.port}")  # Bind to host & port
+        self.server = Server(self.context, self.host, self.port)  # replies are matched by message id
+        self.channels = ChannelPool(self.context, transport)  # long-lived channels to other workers
+        #results of cacheable operators, shared by every execution this worker hosts
+        self.cache = None
+        if cache_config["enabled"]:
+            self.cache = ResultCache(cache_config["directory"], cache_config["memory_entries"], cache_config["disk_bytes"], cache_config["ttl"])
 
         self.running = True
+        self.stopped = threading.Event()
 
-        self.operator_id = None
-        self.execution_ready = False
-
-        #operator id is key so that we know when we can start to execute
-        #upstream contain input operators for an operator that haven't sent their result yet
-        self.upstreams = []
-        self.downstreams = []
-        self.inputs = []
-
-        #operator id is key, worker is value, so that we know where to send to
-        self.operator_worker_mapping = {}
+        #execution id is key, the worker serves any number of executions at once and outlives them
+        #an execution is dropped once every operator it hosts here has completed
+        self.executions = {}
+        #checkpoint store path -> CheckpointStore, opened once and shared by the executions using it
+        self.checkpoint_stores = {}
+        #flow control metrics of the last few completed executions, oldest first
+        self.completed_metrics = collections.OrderedDict()
+        #guards execution and operator states, which are touched by the listener and the executor threads
+        self.state_lock = threading.Lock()
+        #the ready queue holds (execution id, operator id) keys
+        self.scheduler = ReadyQueueScheduler(self.run_operator, slots, name=f"worker-{self.port}", policy=scheduling_policy,
+                                             on_failure=self.fail_operator)
 
     def on_start(self):
-         threading.Thread(target=self.listen_for_messages, daemon=True).start()
+        self.listener = threading.Thread(target=self.listen_for_messages, daemon=True)
+        self.listener.start()
+        self.heartbeat = threading.Thread(target=self.keep_membership, daemon=True)
+        self.heartbeat.start()
+        self.statistics_reporter = threading.Thread(target=self.send_statistics, daemon=True)
+        if self.statistics_interval:
+            self.statistics_reporter.start()
+
+    def keep_membership(self):
+        #register with the controller until it answers, then send heartbeats
+        #a controller that doesn't know this worker (it started later or restarted) rejects heartbeats and gets registered with again
+        registration = WorkerRegistration(self.host, self.port, self.slots, self.memory, self.heartbeat_interval)
+        heartbeat = Heartbeat(self.host, self.port)
+        interval = self.heartbeat_interval or HEARTBEAT_CONFIG["interval"]
+        registered = False
+        delay = 0
+        while not self.stopped.wait(delay):
+            delay = interval
+            try:
+                #bounded waits, so that a controller that is gone doesn't pile up unanswered requests
+                if not registered:
+                    registered = not self.channels.request(worker_endpoint(self.controller), registration, interval).startswith(NACK_PREFIX)
+                    if registered:
+                        print(f"Worker {self.port} registered with the controller, {self.slots} slots")
+                elif not self.heartbeat_interval:
+                    return
+                elif self.channels.request(worker_endpoint(self.heartbeat_target), heartbeat, interval).startswith(NACK_PREFIX):
+                    registered = False
+                    delay = 0
+            except Exception:
+                pass
 
     def listen_for_messages(self):
         while self.running:
-            message = self.socket.recv()
-            deserialized_msg = pickle.loads(message)
+            #poll so that the loop notices shutdown, the server is only touched by this thread
+            if not self.server.poll(100):
+                continue
+            envelope, message = self.server.recv()
+            #messages from actors of this process come as objects
+            encoded = isinstance(message, bytes)
+            with tracing.span("receive", self.lane, worker=self.port, bytes=len(message) if encoded else 0) as span:
+                try:
+                    if encoded:
+                        with tracing.span("deserialise", self.lane, worker=self.port):
+                            deserialized_msg = codec.decode(message)
+                    else:
+                        deserialized_msg = message
+                    span.tag(message=type(deserialized_msg).__name__, execution=getattr(deserialized_msg, "execution_id", ""))
+                    self.handle_message(deserialized_msg)
+                except Exception as e:
+                    print(f"Worker {self.port} failed to handle message: {e}")
+                    self.server.reply(envelope, NACK_PREFIX + f"Worker {self.port} failed to handle message: {e}".encode())
+                    continue
 
-            self.socket.send_string(f"Worker {self.port} received message {deserialized_msg}.")
+            self.server.reply(envelope, f"Worker {self.port} received message {deserialized_msg}.")
 
-            #type1: task assignment message from the controller, deserialize the message and save needed information
-            if isinstance(deserialized_msg, WorkerAssignment):
-                assignment = deserialized_msg
-                self.read_assignment(assignment)
+    def send_statistics(self):
+        #final statistics of an operator go with its OperatorCompleted, these reports show progress until then
+        while not self.stopped.wait(self.statistics_interval):
+            with self.state_lock:
+                executions = [execution for execution in self.executions.values() if execution.started]
+            for execution in executions:
+                statistics = {op_id: operator.statistics.snapshot() for op_id, operator in execution.operators.items()}
+                report = OperatorStatisticsReport(execution.execution_id, self.host, self.port, statistics)
+                try:
+                    self.channels.request(worker_endpoint(self.controller), report, self.statistics_interval)
+                except Exception:
+                    pass
 
-            #type2: results from the dependant actors, record it locally and see if all dependant messages arrive.
-            elif isinstance(deserialized_msg, ExecutionResult):
-                input = deserialized_msg
-                self.read_result(input)
+    def handle_message(self, deserialized_msg):
+        #type1: deployment manifest from the controller, holding this worker's operator assignments of one execution
+        if isinstance(deserialized_msg, DeploymentManifest):
+            manifest = deserialized_msg
+            self.read_manifest(manifest)
 
-            #type3: execution start message from the controller, start to execute (if no dependant nodes, start to execute right away; if having 1+ dependant nodes, wait for their message all arrives and start to execute)
-            elif isinstance(deserialized_msg, WorkerExecutionStart):
-                threading.Thread(target=self.execute_operators, daemon=True).start()
-            else:
-                print(f"Worker {self.port} was not able to recognize message {deserialized_msg}")
-        time.sleep(1)
-        self.on_stop()
+        #type2: a batch of results from an upstream operator, or the end of its stream, queued for every local consumer
+        elif isinstance(deserialized_msg, ExecutionResult):
+            input = deserialized_msg
+            self.read_result(input)
 
-    def send_to_worker(self, target, message):
-        try:
-            socket = self.context.socket(zmq.REQ)
-            socket.connect(f"tcp://{target['host']}:{target['port']}")
-            socket.send(message)
+        elif isinstance(deserialized_msg, EndOfStream):
+            self.read_end_of_stream(deserialized_msg)
+
+        #type4: a downstream operator processed batches and grants credits to send more
+        elif isinstance(deserialized_msg, CreditGrant):
+            grant = deserialized_msg
+            self.grant_credits(grant.execution_id, grant.op_id, grant.output_port, grant.target_op_id, grant.credits)
+
+        #a large message from a worker on the same host, waiting in shared memory
+        elif isinstance(deserialized_msg, SharedMemoryHandle):
+            #decoded before the handle is acknowledged, the sender may unlink the segment after that
+            handle = deserialized_msg
+            self.handle_message(handoff.read_segment(handle.backend, handle.segment, handle.size, codec.decode))
+
+        #type3: execution start message from the controller, every operator of the execution goes to the ready queue
+        elif isinstance(deserialized_msg, WorkerExecutionStart):
+            self.start_execution(deserialized_msg.execution_id)
 
-            response = socket.recv_string()
+        #the controller gave up on an execution, e.g. it resumed it without a worker that died
+        elif isinstance(deserialized_msg, WorkerExecutionCancel):
+            self.cancel_execution(deserialized_msg.execution_id)
+        else:
+            raise ValueError(f"Worker {self.port} was not able to recognize message {deserialized_msg}")
+
+    def send_to_worker(self, target, message, operator=None):
+        #operator is the one sending, it stops waiting for the reply once it is cancelled
+        future = self.channels.send(worker_endpoint(target), message)
+        try:
+            response = self.wait_for_reply(future, operator).decode()
             #print(f"Worker {self.port} received from Worker {target['port']}: {response}")
-            socket.close()
         except Exception as e:
             response = f"Worker {self.port} failed to reach Worker {target['port']}: {e}"
+        finally:
+            self.channels.forget(future)
         return response
 
-    def read_assignment(self, assignment):
-        opID = assignment.opID
-        if assignment.worker['host'] == self.host and assignment.worker['port'] == self.port:
-            print(f"Worker {self.port} received operator assignment for {opID}.")
-            self.operator_id = opID
-            self.upstreams = assignment.upstreams
-            if self.upstreams == []:
-                self.execution_ready = True
-            self.downstreams = assignment.downstreams
-        self.operator_worker_mapping[opID] = assignment.worker
+    def wait_for_reply(self, future, operator=None):
+        deadline = time.monotonic() + self.ack_timeout
+        while True:
+            try:
+                return future.result(max(min(REPLY_POLL, deadline - time.monotonic()), 0))
+            except TimeoutError:
+                if not self.running or (operator is not None and operator.finished):
+                    raise RuntimeError("the sender was cancelled")
+                if time.monotonic() >= deadline:
+                    raise TimeoutError(f"no reply within {self.ack_timeout}s")
+
+    def get_execution(self, execution_id):
+        execution = self.executions.get(execution_id)
+        if execution is None:
+            raise ValueError(f"Worker {self.port} hosts no execution {execution_id}")
+        return execution
+
+    def read_manifest(self, manifest):
+        for assignment in manifest.assignments:
+            print(f"Worker {self.port} received operator assignment for {assignment.opID} of execution {manifest.execution_id}.")
+        checkpoints = self.checkpoint_store(manifest.checkpoint_store) if manifest.checkpoint_store else None
+        execution = ExecutionState(manifest, self.cache is not None, checkpoints)
+        for operator in execution.operators.values():
+            if operator.executor.streams_output:
+                operator.partial_output = PartialOutput(
+                    lambda seq, text, final, operator=operator: self.send_chunk(operator, seq, text, final),
+                    self.partial_output_config["interval"], self.partial_output_config["max_chars"],
+                )
+                operator.executor.on_chunk = operator.partial_output.add
+        with self.state_lock:
+            if manifest.execution_id in self.executions:
+                raise ValueError(f"Worker {self.port} already hosts execution {manifest.execution_id}")
+            #workers without operators of this execution have nothing to keep
+            if execution.operators:
+                self.executions[manifest.execution_id] = execution
+
+    def checkpoint_store(self, path):
+        with self.state_lock:
+            if path not in self.checkpoint_stores:
+                self.checkpoint_stores[path] = CheckpointStore(path)
+            return self.checkpoint_stores[path]
 
     def read_result(self, input):
-        print(f"Worker {self.port} received results from worker {input.port}.")
-        self.inputs.append(input.result)
-        if(len(self.inputs) == len(self.upstreams)):
-            self.execution_ready = True
+        #one message per worker carries the batch to every local operator consuming it
+        execution = self.get_execution(input.execution_id)
+        channel = (input.op_id, input.output_port)
+        sender = {"host": input.host, "port": input.port}
+        for operator in list(execution.operators.values()):
+            if channel in operator.input_channels:
+                self.deliver(execution, operator.op_id, (channel, input.result, sender))
+
+    def read_end_of_stream(self, end):
+        print(f"Worker {self.port} received end of stream of {end.op_id} from worker {end.port}.")
+        execution = self.get_execution(end.execution_id)
+        channel = (end.op_id, end.output_port)
+        for operator in list(execution.operators.values()):
+            if channel in operator.input_channels:
+                self.deliver(execution, operator.op_id, (channel, None, None))
 
-    def execute_operators(self):
-        #Check if operator is execution ready
+    def start_execution(self, execution_id):
+        with self.state_lock:
+            execution = self.executions.get(execution_id)
+            if execution is None:
+                return
+            execution.started = True
+            for operator in execution.operators.values():
+                operator.statistics.start()
+            ready = [operator for operator in execution.operators.values() if not operator.scheduled and not operator.finished]
+            for operator in ready:
+                operator.scheduled = True
+        for operator in ready:
+            self.submit(execution_id, operator)
+
+    def cancel_execution(self, execution_id):
+        with self.state_lock:
+            execution = self.executions.pop(execution_id, None)
+            if execution is None:
+                return
+            #operators still running or waiting for an answer stop at their next step
+            for operator in execution.operators.values():
+                operator.finished = True
+        self.segments.release_execution(execution_id)
+        print(f"Worker {self.port} cancelled execution {execution_id}")
+
+    def deliver(self, execution, op_id, item):
+        #item is (channel, tuples, sender), tuples is None for the end of stream of that channel
+        #sender is the worker that sent the batch, None when it came from a local operator
+        with self.state_lock:
+            operator = execution.operators[op_id]
+            #a failed or cancelled operator takes no more input
+            if operator.finished:
+                return
+            operator.inbox.append(item)
+            operator.peak_inbox = max(operator.peak_inbox, len(operator.inbox))
+            if not execution.started or operator.scheduled:
+                return
+            operator.scheduled = True
+            waiting_since, operator.waiting_since = operator.waiting_since, None
+        if waiting_since is not None:
+            tracing.record("wait-for-inputs", self.lane, waiting_since, tracing.now(),
+                           execution=execution.execution_id, operator=op_id, worker=self.port)
+        self.submit(execution.execution_id, operator)
+
+    def submit(self, execution_id, operator):
+        #every operator goes to the ready queue through here, so that traces show how long it waits there
+        if tracing.is_enabled():
+            operator.queued_at = tracing.now()
+        self.scheduler.submit((execution_id, operator.op_id), operator.priority)
+
+    def grant_credits(self, execution_id, op_id, port, target_op_id, credits):
+        with self.state_lock:
+            #grants may trail behind the end of the execution, there is nothing left to send then
+            execution = self.executions.get(execution_id)
+            if execution is None:
+                return
+            operator = execution.operators[op_id]
+            started = time.perf_counter_ns()
+            operator.credits.grant(port, target_op_id, credits)
+            operator.statistics.control_processing_time += time.perf_counter_ns() - started
+        #an operator paused for credits is not in the ready queue, put it back
+        self.wake(execution, operator)
+
+    def wake(self, execution, operator):
+        with self.state_lock:
+            if operator.scheduled or operator.finished:
+                return
+            operator.scheduled = True
+        self.submit(execution.execution_id, operator)
+
+    def park_until_done(self, execution, operator, future):
+        #frees the executor slot until future is resolved, returns True if it already is
+        with self.state_lock:
+            if future.done():
+                return True
+            operator.scheduled = False
+        future.add_done_callback(lambda _: self.wake(execution, operator))
+        return False
+
+    def run_operator(self, key):
+        #drain the operator's inbox, then complete it once every input channel has ended
+        execution_id, op_id = key
+        execution = self.executions.get(execution_id)
+        if execution is None:
+            return
+        operator = execution.operators[op_id]
+        if operator.finished:
+            return
+        if operator.queued_at is not None:
+            tracing.record("queued", self.lane, operator.queued_at, tracing.now(), execution=execution_id, operator=op_id, worker=self.port)
+            operator.queued_at = None
+        with tracing.span("execute", self.lane, execution=execution_id, operator=op_id, worker=self.port):
+            started = time.perf_counter_ns()
+            finished = self.process_inputs(execution, operator)
+            operator.statistics.data_processing_time += time.perf_counter_ns() - started
+        if finished:
+            with tracing.span("complete", self.lane, execution=execution_id, operator=op_id, worker=self.port):
+                self.complete_operator(execution, operator)
+
+    def fail_operator(self, key, error):
+        #an operator that raised runs no more, it leaves the executor and gets nothing scheduled anymore
+        execution_id, op_id = key
+        with self.state_lock:
+            execution = self.executions.get(execution_id)
+            operator = execution.operators.get(op_id) if execution is not None else None
+            if operator is None:
+                return
+            operator.finished = True
+            operator.scheduled = False
+            operator.inbox.clear()
+            operator.pending_output = None
+        print(f"Worker {self.port} failed to run {op_id} of execution {execution_id}: {error}")
+        #the execution can't complete without the operator, the controller fails it and cancels it everywhere
+        self.send_to_worker(self.controller, OperatorFailed(execution_id, self.host, self.port, op_id, f"{type(error).__name__}: {error}"))
+
+    def process_inputs(self, execution, operator):
+        #returns True once the operator has processed its last input and sent all of its output
+        #the operator leaves the executor whenever its output has to wait for credits, False is returned then
         while True:
-            if self.execution_ready:
-                print(f"Worker {self.port} started execution")
-                result = ExecutionResult(self.host, self.port, self.operator_id, "Dummy Result")
-                print(f"Worker {self.port} finished execution")
-                for targetOpID in self.downstreams:
-                    target_worker = self.operator_worker_mapping[targetOpID]
-                    message = pickle.dumps(result)
-                    response = self.send_to_worker(target_worker, message)
-                break
+            if operator.finished:
+                #cancelled while it ran
+                return False
+            if not self.drain_output(execution, operator):
+                return False
+            if operator.finishing:
+                return True
+
+            with self.state_lock:
+                if operator.inbox:
+                    channel, tuples, sender = operator.inbox.popleft()
+                elif operator.inputs_finished():
+                    operator.finishing = True
+                    channel = None
+                else:
+                    operator.scheduled = False
+                    if tracing.is_enabled():
+                        operator.waiting_since = tracing.now()
+                    return False
+
+            if channel is None:
+                print(f"Worker {self.port} finishing {operator.op_id}")
+                operator.pending_output = pending(self.finish_operator(operator))
+            elif tuples is None:
+                operator.finished_channels.add(channel)
             else:
-                time.sleep(0.1)
-        self.running = False
+                operator.statistics.input_rows += len(tuples)
+                if operator.input_digest is not None:
+                    operator.input_digest.update(channel, tuples)
+                operator.pending_output = pending(operator.executor.process(operator.input_channels[channel], tuples))
+                operator.pending_batch = (channel, sender)
+
+    def complete_operator(self, execution, operator):
+        execution_id, op_id = execution.execution_id, operator.op_id
+        print(f"Worker {self.port} finished execution of {op_id}")
+        started = time.perf_counter_ns()
+        if operator.partial_output is not None:
+            #the final chunk goes out on the same channel ahead of the completion
+            operator.partial_output.close()
+        if operator.store_result_as:
+            #stored before completion is reported, the next execution may already reuse it
+            execution.result_store.put(operator.store_result_as, operator.stored_output)
+        if execution.checkpoints is not None:
+            #a resumed execution starts from the operators with a checkpoint, so it is completed before completion is reported
+            execution.checkpoints.complete(execution_id, op_id, operator.checkpoint_seq, operator.checkpoint_batch)
+        with self.state_lock:
+            #credit grants add to the same statistics from the channel thread
+            operator.statistics.control_processing_time += time.perf_counter_ns() - started
+            operator.statistics.finish()
+            completed = OperatorCompleted(execution_id, self.host, self.port, op_id, operator.statistics.snapshot())
+        self.send_to_worker(self.controller, completed, operator)
+        with self.state_lock:
+            operator.finished = True
+            operator.scheduled = False
+            execution.completed_operators.add(op_id)
+            if len(execution.completed_operators) == len(execution.operators) and self.executions.pop(execution_id, None):
+                self.completed_metrics[execution_id] = self.flow_control_metrics(execution)
+                if len(self.completed_metrics) > COMPLETED_METRICS_KEPT:
+                    self.completed_metrics.popitem(last=False)
+                print(f"Worker {self.port} completed its part of execution {execution_id}")
+
+    def finish_operator(self, operator):
+        #cacheable operators are looked up by the hash of their type, properties and inputs
+        if operator.input_digest is None:
+            return operator.executor.finish()
+        key = operator.input_digest.key(operator.op_type, operator.properties)
+        output = self.cache.get(key)
+        if output is not None:
+            print(f"Worker {self.port} reused the cached result of {operator.op_id}")
+            if operator.partial_output is not None:
+                #nothing was streamed, sessions watching the operator get the cached output whole as its final chunk
+                operator.partial_output.close(operator.executor.streamed_text(output))
+            return output
+        output = operator.executor.finish()
+        if isinstance(output, Future):
+            def store(done):
+                if done.exception() is None:
+                    self.cache.put(key, list(done.result()))
+            output.add_done_callback(store)
+            return output
+        output = list(output)
+        self.cache.put(key, output)
+        return output
+
+    def drain_output(self, execution, operator):
+        #pull the pending output tuples through the buffers into the outbox and send what the credits allow
+        #returns False when the operator has to wait for credits, it is then no longer scheduled
+        while True:
+            if not self.send_outbox(execution, operator):
+                return False
+            if operator.pending_output is None:
+                return True
+            if isinstance(operator.pending_output, Future):
+                if not self.park_until_done(execution, operator, operator.pending_output):
+                    return False
+                operator.pending_output = iter(operator.pending_output.result())
+
+            tuple = next(operator.pending_output, StopIteration)
+            if tuple is not StopIteration:
+                operator.statistics.output_rows += 1
+                if operator.stored_output is not None:
+                    operator.stored_output.append(tuple)
+                if operator.checkpoint_batch is not None:
+                    operator.checkpoint_batch.append(tuple)
+                    if len(operator.checkpoint_batch) >= execution.batch_size:
+                        execution.checkpoints.append(operator.execution_id, operator.op_id, operator.checkpoint_seq, operator.checkpoint_batch)
+                        operator.checkpoint_seq += 1
+                        operator.checkpoint_batch = []
+                ports = operator.output_buffers if operator.partitioning is None else operator.partitioning.route(tuple)
+                for port in ports:
+                    buffer = operator.output_buffers[port]
+                    buffer.append(tuple)
+                    if len(buffer) >= execution.batch_size:
+                        self.flush(operator, port)
+                continue
+
+            operator.pending_output = None
+            if operator.pending_batch is not None:
+                self.return_credit(execution, operator, *operator.pending_batch)
+                operator.pending_batch = None
+            if operator.finishing:
+                for port in operator.output_links:
+                    self.flush(operator, port)
+                    operator.outbox[port].append(EndOfStream(operator.execution_id, self.host, self.port, operator.op_id, port))
+
+    def flush(self, operator, port):
+        batch = operator.output_buffers[port]
+        if not batch:
+            return
+        operator.output_buffers[port] = []
+        result = ExecutionResult(operator.execution_id, self.host, self.port, operator.op_id, port, operator.output_seq[port], batch)
+        operator.output_seq[port] += 1
+        operator.outbox[port].append(result)
+
+    def send_outbox(self, execution, operator):
+        for port, outbox in operator.outbox.items():
+            while outbox:
+                message = outbox[0]
+                if isinstance(message, ExecutionResult):
+                    with self.state_lock:
+                        if not operator.credits.try_take(port, operator.output_links[port]):
+                            operator.scheduled = False
+                            return False
+                outbox.popleft()
+                self.send_downstream(execution, operator, port, message)
+        return True
+
+    def return_credit(self, execution, operator, channel, sender):
+        #the batch from channel is processed, its producer may send another one
+        if not execution.credits:
+            return
+        source_op_id, source_port = channel
+        if sender is None:
+            self.grant_credits(execution.execution_id, source_op_id, source_port, operator.op_id, 1)
+        else:
+            #fire and forget, the producer may already have finished and its worker stopped listening
+            grant = CreditGrant(execution.execution_id, self.host, self.port, source_op_id, source_port, operator.op_id, 1)
+            future = self.channels.send(worker_endpoint(sender), grant)
+            future.add_done_callback(self.channels.forget)
+
+    def send_chunk(self, operator, seq, text, final):
+        #fire and forget, like credit grants, chunks are only progress and the executor must not wait for them
+        if not self.running:
+            return
+        chunk = OperatorOutputChunk(operator.execution_id, self.host, self.port, operator.op_id, seq, text, final)
+        future = self.channels.send(worker_endpoint(self.controller), chunk)
+        future.add_done_callback(self.channels.forget)
+
+    def send_downstream(self, execution, operator, port, message):
+        #local downstream operators get the message in memory, remote workers get one copy each
+        channel = (operator.op_id, port)
+        remote_workers = {}
+        for targetOpID in operator.output_links[port]:
+            if targetOpID in execution.operators:
+                self.deliver(execution, targetOpID, (channel, message.result if isinstance(message, ExecutionResult) else None, None))
+            else:
+                target_worker = execution.operator_worker_mapping[targetOpID]
+                remote_workers[worker_endpoint(target_worker)] = target_worker
+        #encoded once for every worker outside this process, workers of this process get the message itself
+        encoded = None
+        #workers on this host that get a large message through one shared segment
+        shared = []
+        for endpoint, target_worker in remote_workers.items():
+            #a cancelled operator stops sending, its consumers are gone or cancelled too
+            if operator.finished:
+                return
+            if self.channels.route(endpoint) == "direct":
+                with tracing.span("send", self.lane, execution=execution.execution_id, operator=operator.op_id, worker=self.port,
+                                  target=target_worker["port"]):
+                    response = self.send_to_worker(target_worker, message, operator)
+                continue
+            if encoded is None:
+                with tracing.span("serialise", self.lane, execution=execution.execution_id, operator=operator.op_id, worker=self.port):
+                    encoded = codec.encode(message)
+            if self.shared_memory_threshold and len(encoded) >= self.shared_memory_threshold and target_worker["host"] == self.host:
+                shared.append(target_worker)
+                continue
+            with tracing.span("send", self.lane, execution=execution.execution_id, operator=operator.op_id, worker=self.port,
+                              target=target_worker["port"], bytes=len(encoded)):
+                response = self.send_to_worker(target_worker, encoded, operator)
+        if shared:
+            with tracing.span("send", self.lane, execution=execution.execution_id, operator=operator.op_id, worker=self.port,
+                              targets=len(shared), bytes=len(encoded), shared_memory=True):
+                self.send_through_shared_memory(execution, operator, shared, encoded)
+
+    def send_through_shared_memory(self, execution, operator, targets, encoded):
+        #written once for all targets, each decodes it before acknowledging the handle, so it is released per reply
+        backend, segment = self.segments.write(encoded, len(targets), execution.execution_id)
+        handle = SharedMemoryHandle(segment, len(encoded), backend)
+        futures = [(target, self.channels.send(worker_endpoint(target), handle)) for target in targets]
+        for target, future in futures:
+            #a reader that timed out may still be decoding the segment, it must not be reused for the next batch
+            acked = False
+            try:
+                reply = self.wait_for_reply(future, operator)
+                if reply.startswith(NACK_PREFIX):
+                    raise RuntimeError(reply[len(NACK_PREFIX):].decode())
+                acked = True
+            except Exception as e:
+                print(f"Worker {self.port} failed to reach Worker {target['port']}: {e}")
+            finally:
+                self.channels.forget(future)
+                self.segments.release(backend, segment, reusable=acked)
+
+    def get_flow_control_metrics(self, execution_id):
+        """Credit state of every outgoing edge and the peak inbox of every operator of an execution hosted here"""
+        with self.state_lock:
+            if execution_id in self.executions:
+                return self.flow_control_metrics(self.executions[execution_id])
+            return self.completed_metrics.get(execution_id, {})
+
+    def flow_control_metrics(self, execution):
+        return {
+            op_id: {"peak_inbox": operator.peak_inbox, "edges": operator.credits.metrics()}
+            for op_id, operator in execution.operators.items()
+        }
+
+    def get_shared_memory_metrics(self):
+        """Segments this worker wrote for workers on its host, and how many of them are not released yet"""
+        return self.segments.metrics()
+
+    def get_cache_metrics(self):
+        """Hit rate and size of this worker's result cache, None when caching is off"""
+        return self.cache.metrics() if self.cache is not None else None
 
     def on_stop(self):
-        self.socket.close()
+        self.running = False
+        self.stopped.set()
+        for reporter in (self.heartbeat, self.statistics_reporter):
+            if reporter.is_alive():
+                reporter.join()
+        if self.deregister:
+            try:
+                self.channels.request(worker_endpoint(self.controller), WorkerDeregistration(self.host, self.port), HEARTBEAT_CONFIG["interval"])
+            except Exception:
+                pass
+        if self.listener is not threading.current_thread():
+            self.listener.join()
+        self.scheduler.close()
+        #nothing sends anymore, readers that haven't acknowledged a segment by now never will
+        self.segments.release_all()
+        for store in self.checkpoint_stores.values():
+            store.close()
+        self.channels.close()
+        self.server.close()
         self.context.term()
 
 
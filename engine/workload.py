@@ -0,0 +1,133 @@
+import os,sys
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.dirname(CURRENT_DIR))
+
+import collections
+import random
+
+from model.texera.TexeraWorkflow import TexeraWorkflow
+
+# Synthetic workflows for benchmarks, in the logical plan format TexeraWorkflow is built from.
+
+
+def operator(op_id, op_type="Chat", **properties):
+    return {
+        **properties,
+        "operatorID": op_id,
+        "operatorType": op_type,
+        "inputPorts": [{"portID": "input-0", "displayName": "", "allowMultiInputs": True, "isDynamicPort": False, "dependencies": []}],
+        "outputPorts": [{"portID": "output-0", "displayName": "", "allowMultiInputs": False, "isDynamicPort": False}],
+    }
+
+
+def link(source_op_id, target_op_id):
+    return {
+        "fromOpId": source_op_id,
+        "fromPortId": {"id": 0, "internal": False},
+        "toOpId": target_op_id,
+        "toPortId": {"id": 0, "internal": False},
+    }
+
+
+def logical_plan(operators, links):
+    return {"operators": operators, "links": links, "opsToReuseResult": [], "opsToViewResult": []}
+
+
+def chain_plan(size, op_type="Chat", **properties):
+    operators = [operator(f"{op_type}-operator-{i}", op_type, **properties) for i in range(size)]
+    links = [link(operators[i]["operatorID"], operators[i + 1]["operatorID"]) for i in range(size - 1)]
+    return logical_plan(operators, links)
+
+
+def fanout_plan(width, op_type="Chat", **properties):
+    """One source feeding width independent operators"""
+    operators = [operator(f"{op_type}-operator-{i}", op_type, **properties) for i in range(width + 1)]
+    links = [link(operators[0]["operatorID"], operators[i]["operatorID"]) for i in range(1, width + 1)]
+    return logical_plan(operators, links)
+
+
+def diamond_plan(width, op_type="Chat", **properties):
+    """One source fanning out to width operators, which all join into one sink"""
+    operators = [operator(f"{op_type}-operator-{i}", op_type, **properties) for i in range(width + 2)]
+    source, sink = operators[0]["operatorID"], operators[-1]["operatorID"]
+    links = []
+    for branch in operators[1:-1]:
+        links.append(link(source, branch["operatorID"]))
+        links.append(link(branch["operatorID"], sink))
+    return logical_plan(operators, links)
+
+
+def tree_plan(size, branching=2, op_type="Chat", **properties):
+    """size operators in a tree below one source, every operator feeding up to branching children"""
+    operators = [operator(f"{op_type}-operator-{i}", op_type, **properties) for i in range(size)]
+    links = [link(operators[(i - 1) // branching]["operatorID"], operators[i]["operatorID"]) for i in range(1, size)]
+    return logical_plan(operators, links)
+
+
+def branches_plan(width, max_depth, seed=0, skew=1.0, op_type="Chat", **properties):
+    """
+    One source feeding width chains of 1 to max_depth operators each, skew above 1 makes most chains
+    short and a few long. The same seed always gives the same lengths.
+    """
+    rng = random.Random(seed)
+    source = operator("source", op_type, **properties)
+    operators, links = [source], []
+    for branch in range(width):
+        previous = source
+        for i in range(1 + round((max_depth - 1) * rng.random() ** skew)):
+            current = operator(f"branch-{branch}-operator-{i}", op_type, **properties)
+            operators.append(current)
+            links.append(link(previous["operatorID"], current["operatorID"]))
+            previous = current
+    return logical_plan(operators, links)
+
+
+def random_dag_plan(size, max_inputs=3, window=32, source_probability=0.05, seed=0, op_type="Chat", **properties):
+    """
+    size operators in topological order, each one either a source or reading from 1 to max_inputs of
+    the window operators before it. The same seed always gives the same plan.
+    """
+    rng = random.Random(seed)
+    operators = [operator(f"{op_type}-operator-{i}", op_type, **properties) for i in range(size)]
+    links = []
+    for i in range(1, size):
+        if rng.random() < source_probability:
+            continue
+        candidates = range(max(0, i - window), i)
+        for source in rng.sample(candidates, rng.randint(1, min(max_inputs, len(candidates)))):
+            links.append(link(operators[source]["operatorID"], operators[i]["operatorID"]))
+    return logical_plan(operators, links)
+
+
+SHAPES = {
+    "chain": lambda size, seed: chain_plan(size, "MockMap"),
+    "fanout": lambda size, seed: fanout_plan(size - 1, "MockMap"),
+    "tree": lambda size, seed: tree_plan(size, op_type="MockMap"),
+    "diamond": lambda size, seed: diamond_plan(size - 2, "MockMap"),
+    "random": lambda size, seed: random_dag_plan(size, seed=seed, op_type="MockMap"),
+}
+
+
+def synthetic_plan(shape, size, rows=1, tuple_cost=0, tuple_work=0, seed=0):
+    """
+    A plan of size mock operators in one of SHAPES. Operators without inputs become MockSources of
+    rows tuples, operators with one input MockMaps and operators joining several inputs MockReduces
+    emitting rows tuples, so the tuples per operator stay the same however many paths reach it.
+    """
+    plan = SHAPES[shape](size, seed)
+    inputs = collections.Counter(link["toOpId"] for link in plan["links"])
+    for op in plan["operators"]:
+        op.update(tupleCost=tuple_cost, tupleWork=tuple_work)
+        if inputs[op["operatorID"]] == 0:
+            op.update(operatorType="MockSource", rows=rows)
+        elif inputs[op["operatorID"]] > 1:
+            op.update(operatorType="MockReduce", rows=rows)
+    return plan
+
+
+def chain_workflow(size, op_type="Chat", **properties):
+    return TexeraWorkflow(chain_plan(size, op_type, **properties), workflow_title=f"chain-{size}")
+
+
+def to_workflow(plan, title=""):
+    return TexeraWorkflow(plan, workflow_title=title)
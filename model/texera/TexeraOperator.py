@@ -5,14 +5,24 @@ from model.Operator import Operator
 from model.texera.TexeraPort import TexeraPort
 
 
+# keys of an operator dict that describe the operator itself rather than its properties
+STRUCTURAL_KEYS = {
+    'operatorID', 'operatorType', 'operatorVersion', 'operatorProperties', 'inputPorts', 'outputPorts',
+    'showAdvanced', 'isDisabled', 'customDisplayName', 'dynamicInputPorts', 'dynamicOutputPorts', 'viewResult',
+}
+
+
 class TexeraOperator(Operator):
     def __init__(self, operator_dict: dict, port_indexed_input_schemas: List['DataSchema'] = [], error: str = ""):
-        # TODO: change the property fetching
         self.operator_id = operator_dict.get('operatorID', '')
         self.operator_type = operator_dict.get('operatorType', '')
         self.operator_version = operator_dict.get('operatorVersion', '')
+        # the logical plan flattens the operator properties into the operator dict, so everything
+        # that isn't part of the operator's structure is a property
         self.operator_properties = {
-            "question": operator_dict.get('question')}
+            "question": operator_dict.get('question'),
+            **operator_dict.get('operatorProperties', {}),
+            **{key: value for key, value in operator_dict.items() if key not in STRUCTURAL_KEYS}}
 
         # a mapping from port id to port
         self.input_ports: Dict[str, 'TexeraPort'] = {
@@ -1,11 +1,16 @@
 import asyncio
 import json
 import logging
+import pickle
+import re
 from datetime import datetime
+import zmq
+import zmq.asyncio
 from fastapi import WebSocket, WebSocketDisconnect
 from pydantic import BaseModel
 from typing import Dict, Optional, List, Union
 
+from engine.config import CONTROLLER_CONFIG
 from model.texera.TexeraWorkflow import TexeraWorkflow
 
 logging.basicConfig(level=logging.INFO)
@@ -100,6 +105,15 @@ class PaginatedResultEvent(TexeraWebSocketEvent):
     schema: List[dict]
 
 
+class OperatorOutputChunkEvent(TexeraWebSocketEvent):
+    """Partial output of an operator, the chunks of an operator concatenated in order are its whole output"""
+    type: str = "OperatorOutputChunkEvent"
+    executionId: str
+    operatorId: str
+    chunk: str
+    final: bool
+
+
 class ModifyLogicResponse(TexeraWebSocketEvent):
     type: str = "ModifyLogicResponse"
     opId: str
@@ -111,6 +125,8 @@ class ModifyLogicResponse(TexeraWebSocketEvent):
 class SessionState:
     def __init__(self, websocket: WebSocket):
         self.websocket = websocket
+        # tasks forwarding the partial output and statistics of the executions this session started
+        self.output_tasks: List[asyncio.Task] = []
 
     async def send(self, message: dict):
         """Sends a raw JSON message over WebSocket."""
@@ -146,7 +162,10 @@ async def websocket_endpoint(websocket: WebSocket):
 
     except WebSocketDisconnect:
         logging.info(f"WebSocket connection closed: {session_id}")
-        session_state.pop(session_id, None)
+        session = session_state.pop(session_id, None)
+        if session:
+            for task in session.output_tasks:
+                task.cancel()
     except Exception as e:
         logging.error(f"Error handling WebSocket message: {e}")
 
@@ -172,23 +191,121 @@ async def handle_websocket_request(session_id: str, request_type: str, request_d
         request = WorkflowExecuteRequest(**request_data)
         workflow = TexeraWorkflow(request.logicalPlan)
 
-        # TODO: 1. serialize the workflow as string(or other type) to be able to send it to the controller
+        # subscribe before submitting, the first chunks may be published before the controller replies
+        events = subscribe_to_controller_events()
+        try:
+            reply = await submit_to_controller(workflow)
+        except Exception:
+            events.close()
+            raise
+        started = re.fullmatch(r"Execution (\w+) starts", reply)
+        if not started:
+            events.close()
+            return workflow_error_event("Execution failed to start", reply)
+
+        session = session_state[session_id]
+        task = asyncio.create_task(forward_execution_events(session, events, started.group(1)))
+        session.output_tasks.append(task)
+        task.add_done_callback(session.output_tasks.remove)
         return {
             "type": "WorkflowExecutionStarted",
             "executionName": request.executionName,
-            "engineVersion": request.engineVersion
+            "engineVersion": request.engineVersion,
+            "executionId": started.group(1)
         }
 
+    return workflow_error_event("Unknown request type", f"Request type {request_type} is not recognized")
+
+
+def workflow_error_event(message: str, details: str, error_type: str = "COMPILATION_ERROR"):
     return {
         "type": "WorkflowErrorEvent",
         "fatalErrors": [
             {
-                "message": "Unknown request type",
-                "details": f"Request type {request_type} is not recognized",
+                "message": message,
+                "details": details,
                 "operatorId": "unknown",
                 "workerId": "unknown",
-                "error_type": "COMPILATION_ERROR",
+                "error_type": error_type,
                 "timestamp": {"nanos": 0, "seconds": int(datetime.utcnow().timestamp())}
             }
         ]
     }
+
+
+# -------------------- Controller Connection --------------------
+
+zmq_context = zmq.asyncio.Context()
+
+
+async def submit_to_controller(workflow: TexeraWorkflow) -> str:
+    """Sends the workflow to the controller, returns its reply"""
+    socket = zmq_context.socket(zmq.REQ)
+    socket.setsockopt(zmq.LINGER, 0)
+    socket.connect(f"tcp://{CONTROLLER_CONFIG['host']}:{CONTROLLER_CONFIG['port']}")
+    try:
+        await socket.send(pickle.dumps(workflow))
+        return (await socket.recv()).decode()
+    finally:
+        socket.close()
+
+
+def subscribe_to_controller_events():
+    """SUB socket receiving every event the controller publishes, (execution id, json event) each"""
+    socket = zmq_context.socket(zmq.SUB)
+    socket.setsockopt(zmq.LINGER, 0)
+    socket.connect(f"tcp://{CONTROLLER_CONFIG['host']}:{CONTROLLER_CONFIG['event_port']}")
+    socket.setsockopt(zmq.SUBSCRIBE, b"")
+    return socket
+
+
+async def forward_execution_events(session: SessionState, events, execution_id: str):
+    """Sends the partial output and operator statistics of an execution to the session until the execution completes or fails"""
+    try:
+        completed = False
+        error = None
+        while not completed and error is None:
+            # everything that arrived while the last event was sent goes out together, one chunk
+            # event per operator and the latest statistics, so a slow browser gets fewer events
+            received = [await events.recv_multipart()]
+            while True:
+                try:
+                    received.append(events.recv_multipart(zmq.NOBLOCK).result())
+                except zmq.Again:
+                    break
+
+            chunks: Dict[str, List[str]] = {}
+            final = set()
+            statistics: Dict[str, dict] = {}
+            for topic, payload in received:
+                if topic.decode() != execution_id:
+                    continue
+                event = json.loads(payload)
+                if event["type"] == "ExecutionCompleted":
+                    completed = True
+                elif event["type"] == "ExecutionFailed":
+                    error = event["error"]
+                elif event["type"] == "OperatorOutputChunk":
+                    chunks.setdefault(event["operatorId"], []).append(event["chunk"])
+                    if event["final"]:
+                        final.add(event["operatorId"])
+                elif event["type"] == "OperatorStatisticsUpdate":
+                    statistics.update(event["operatorStatistics"])
+
+            for operator_id, texts in chunks.items():
+                await session.send_event(OperatorOutputChunkEvent(
+                    executionId=execution_id,
+                    operatorId=operator_id,
+                    chunk="".join(texts),
+                    final=operator_id in final
+                ))
+            if statistics:
+                await session.send_event(OperatorStatisticsUpdateEvent(operatorStatistics={
+                    operator_id: OperatorAggregatedMetrics(**metrics) for operator_id, metrics in statistics.items()
+                }))
+            if error is not None:
+                await session.send_event(WorkflowErrorEvent(**workflow_error_event("Execution failed", error, "EXECUTION_FAILURE")))
+    except Exception as e:
+        logging.error(f"Failed to forward events of execution {execution_id}: {e}")
+    finally:
+        events.close()